@@ -0,0 +1,175 @@
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+
+
+# Extension and opener of each codec artifacts can be compressed with
+ARTIFACT_CODECS = {
+    "gzip": (".gz", gzip.open),
+    "lzma": (".xz", lzma.open),
+    "bz2": (".bz2", bz2.open),
+}
+
+# Kinds of files in a data folder that are compressed once they are finished (checkpoints are already compressed)
+ARTIFACT_EXTENSIONS = [".bit", ".ft", ".pkl", ".tcl"]
+
+# Artifacts are only written compressed once set_artifact_codec has been called
+artifact_codec = None
+
+
+def set_artifact_codec(codec):
+    """
+    Compress artifacts written from now on with a codec
+
+    Parameters
+    ----------
+    codec : str
+        One of ARTIFACT_CODECS, or "none" to write artifacts uncompressed
+    """
+    global artifact_codec
+    if codec != "none" and codec not in ARTIFACT_CODECS:
+        raise ValueError("Unknown artifact codec " + codec + ", expected none or one of " + ", ".join(ARTIFACT_CODECS))
+    artifact_codec = None if codec == "none" else codec
+
+
+def artifact_name(file_name):
+    """
+    Name of an artifact without the extension of the codec it is compressed with: "0.DSP_L.pips.bit.gz" -> "0.DSP_L.pips.bit"
+    """
+    for ext, opener in ARTIFACT_CODECS.values():
+        if file_name.endswith(ext):
+            return file_name[:-len(ext)]
+    return file_name
+
+
+def artifact_codec_of(file_name):
+    """
+    Codec a file on disk is compressed with, or None
+    """
+    for codec, (ext, opener) in ARTIFACT_CODECS.items():
+        if file_name.endswith(ext):
+            return codec
+    return None
+
+
+def find_artifact(file_name):
+    """
+    Name of the file an artifact is stored in - the artifact itself or a compressed copy of it - or None if there is neither
+    """
+    if os.path.exists(file_name):
+        return file_name
+    for ext, opener in ARTIFACT_CODECS.values():
+        if os.path.exists(file_name + ext):
+            return file_name + ext
+    return None
+
+
+def artifact_exists(file_name):
+    """
+    Whether an artifact is on disk, compressed or not
+    """
+    return find_artifact(file_name) is not None
+
+
+def list_artifacts(folder):
+    """
+    Sorted names of the files in a folder, with compressed artifacts listed by their uncompressed name
+    """
+    return sorted(set(artifact_name(x) for x in os.listdir(folder)))
+
+
+def open_artifact(file_name, mode="r"):
+    """
+    Open an artifact, compressed or not, by its uncompressed name
+
+    Reading streams the decompressed contents of whichever copy of the artifact is on disk.  Writing compresses with
+    the codec set by set_artifact_codec, and removes any other copy of the artifact so a stale copy is never read.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the artifact without a codec extension
+    mode : str
+        "r", "rb", "w" or "wb"
+
+    Returns
+    -------
+    file
+    """
+    if "r" in mode:
+        found = find_artifact(file_name)
+        if found is None:
+            raise FileNotFoundError(file_name)
+        codec = artifact_codec_of(found)
+        if codec is None:
+            return open(found, mode)
+        return ARTIFACT_CODECS[codec][1](found, mode if "b" in mode else mode + "t")
+    for x in [file_name] + [file_name + ext for ext, opener in ARTIFACT_CODECS.values()]:
+        if os.path.exists(x):
+            os.remove(x)
+    if artifact_codec is None:
+        return open(file_name, mode)
+    ext, opener = ARTIFACT_CODECS[artifact_codec]
+    return opener(file_name + ext, mode if "b" in mode else mode + "t")
+
+
+def compress_artifact(file_name, codec=None):
+    """
+    Compress a finished artifact in place: "x.bit" is replaced by "x.bit.gz"
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the uncompressed artifact
+    codec : str
+        One of ARTIFACT_CODECS, the codec set by set_artifact_codec by default
+
+    Returns
+    -------
+    str
+        Name of the compressed artifact
+    """
+    ext, opener = ARTIFACT_CODECS[codec or artifact_codec]
+    tmp_name = file_name + ext + "." + str(os.getpid())
+    with open(file_name, "rb") as fi, opener(tmp_name, "wb") as fo:
+        shutil.copyfileobj(fi, fo, 2**20)
+    os.replace(tmp_name, file_name + ext)
+    os.remove(file_name)
+    return file_name + ext
+
+
+def compress_artifacts(folder, codec=None):
+    """
+    Compress every uncompressed artifact in a data folder (see ARTIFACT_EXTENSIONS)
+
+    Only call once nothing is writing to the folder any more.  Tilegrid (.tile) specimens are left uncompressed.
+    Does nothing if no codec is given and none has been set with set_artifact_codec.
+    """
+    if (codec or artifact_codec) is None:
+        return
+    for file in sorted(os.listdir(folder)):
+        if os.path.splitext(file)[1] in ARTIFACT_EXTENSIONS and ".tile." not in file:
+            compress_artifact(os.path.join(folder, file), codec)
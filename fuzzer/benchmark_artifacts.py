@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+# Measures the I/O versus CPU trade-off of compressing the artifacts of a fuzzer data folder (see --artifact_codec).
+#
+# For every codec the artifacts of the folder are compressed into a scratch folder, and then read back the way the
+# analysis reads them.  The size on disk, the time to compress and the time to read are reported, along with an
+# estimate of the read time over a link of the given bandwidth (the bytes that have to come over the link plus the
+# time spent decompressing them).  Reads are from the page cache, so the measured read time is the CPU cost.
+
+# Typical usage:
+#    python3 benchmark_artifacts.py artix7/xc7a100ticsg324-1L/data/0000 --family=artix7 --bandwidth=50
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from artifacts import ARTIFACT_EXTENSIONS, artifact_name, compress_artifacts, list_artifacts, open_artifact
+from bit_parser import read_frames
+
+
+def read_folder(folder, family):
+    """
+    Read every artifact of a folder through open_artifact, parsing bitstreams if a family is given
+
+    Returns
+    -------
+    int
+        Number of uncompressed bytes read
+    """
+    total = 0
+    for file in list_artifacts(folder):
+        if os.path.splitext(file)[1] not in ARTIFACT_EXTENSIONS:
+            continue
+        if file.endswith(".bit") and family is not None:
+            addrs, frames = read_frames(os.path.join(folder, file), family)
+            total += frames.nbytes
+        else:
+            with open_artifact(os.path.join(folder, file), "rb") as f:
+                total += len(f.read())
+    return total
+
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(folder, x)) for x in os.listdir(folder)
+               if os.path.splitext(artifact_name(x))[1] in ARTIFACT_EXTENSIONS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare artifact codecs on a fuzzer data folder")
+    parser.add_argument("folder")                                  # Data folder to measure, e.g. artix7/xc7a100ticsg324-1L/data/0000
+    parser.add_argument("--family", default=None)                  # Also parse the bitstreams of the folder for this family
+    parser.add_argument("--codecs", default="none,gzip,lzma,bz2")  # Codecs to compare
+    parser.add_argument("--bandwidth", default=100, type=float)    # MB/s of the storage the data folders live on, for the estimate
+    args = parser.parse_args()
+
+    # Ratios are relative to the first codec, the uncompressed artifacts by default
+    print("%-6s %12s %8s %12s %10s %16s" % ("codec", "bytes", "ratio", "compress s", "read s", "est. read s"))
+    base_size = None
+    for codec in args.codecs.split(","):
+        scratch = tempfile.mkdtemp()
+        try:
+            for file in os.listdir(args.folder):
+                if os.path.splitext(artifact_name(file))[1] in ARTIFACT_EXTENSIONS:
+                    shutil.copy(os.path.join(args.folder, file), scratch)
+            t0 = time.time()
+            if codec != "none":
+                compress_artifacts(scratch, codec)
+            t1 = time.time()
+            read_folder(scratch, args.family)
+            t2 = time.time()
+            size = folder_size(scratch)
+            if base_size is None:
+                base_size = size
+            print("%-6s %12d %8.2f %12.2f %10.2f %16.2f" % (codec, size, base_size / max(size, 1), t1 - t0, t2 - t1,
+                                                            size / (args.bandwidth * 2**20) + t2 - t1))
+        finally:
+            shutil.rmtree(scratch)
+
+
+if __name__ == "__main__":
+    main()
@@ -42,13 +42,19 @@ parser.add_argument('--part',default="xcku025-ffva1156-2-e")              # Sele
 parser.add_argument('--keep_files',default=1)                           # 1: Keep all files generated. 0: Only keep final output
 parser.add_argument('--benchmark_path',default="../benchmark/xc7a100/")    # Path to folder of .dcp benchmarks
 parser.add_argument('--update_tile',default="NONE")                     # Updating just a single YRAY tile def
+parser.add_argument('--decode_cache',default=1024)                      # Size in MB of the cache of decoded bitstreams, 0: no cache
+parser.add_argument('--parallel',default=8)                             # Number of processes large and multi-SLR bitstreams are decoded in
 args = parser.parse_args()
 
 os.chdir(args.family + "/" + args.part + "/")
 from bit_parser import print_frame
-from bit_parser import parse_bitstream
+from bit_parser import iter_tile_bits
+from bit_parser import load_ownership
+from bit_parser import load_device_frame_counts
+from bit_parser import set_decode_cache
 from bit2phy import feature_test
 from bit2phy import parse_tile2
+from bit2phy import convert_db_bits
 from data_analysis import parse_feature_file
 from data_analysis import save_pkl_obj
 from data_analysis import load_pkl_obj
@@ -73,6 +79,9 @@ os.chdir(args.family + "/" + args.part + "/")
 fj = open("vivado_db/tilegrid.json")
 tilegrid = json.load(fj) 
 fj.close()
+load_device_frame_counts("vivado_db/tilegrid.json", args.family, tilegrid)
+ownership = load_ownership("vivado_db/tilegrid.json", args.family, tilegrid)
+set_decode_cache("decode_cache", int(args.decode_cache) * 2**20)
 os.makedirs("benchmark_data/", exist_ok=True)
 
 def run_benchmark_fuzzer_p1(file_name):
@@ -118,9 +127,6 @@ def run_benchmark_fuzzer_p2(file_name):
                 tile_type = file.split(".")[0]
                 temp_feature_dict = parse_feature_file(f,"0",tile_type)
                 f.close()
-                f = open(bitstream_name, "rb")
-                tile_bit_dict = parse_bitstream(f, args.family, tilegrid, tile_type, "0")
-                f.close()
                 tile_feature_dict[tile_type] = {}
                 for x in temp_feature_dict:
                     tile_feature_dict[tile_type][x] = temp_feature_dict[x]
@@ -138,19 +144,19 @@ def run_benchmark_fuzzer_p2(file_name):
         phy_feature_dict = output["YRAY"]
 
 
-    # Call bit to phy
-    for tile_type in tile_list:
-        if args.update_tile == "NONE" or tile_type == args.update_tile:
-            fj = open("db/db." +tile_type + ".json", "r")
-            database = json.load(fj)
-            fj.close()
-            f = open(bitstream_name, "rb")
-            tile_data_dict = parse_bitstream(f, args.family, tilegrid, tile_type, "0")
-            f.close()
-            phy_feature_dict[tile_type] = {}
-            for tile in sorted(tile_data_dict):
-                if len(tile_data_dict[tile]) != 0:
-                    phy_feature_dict[tile_type][tile] = parse_tile2(database, tile,tile_data_dict,tile_type)
+    # Call bit to phy - the bitstream is decoded once for all of the tile types, a tile at a time
+    tile_types = [x for x in tile_list if args.update_tile == "NONE" or x == args.update_tile]
+    databases = {}
+    for tile_type in tile_types:
+        fj = open("db/db." +tile_type + ".json", "r")
+        databases[tile_type] = convert_db_bits(json.load(fj))
+        fj.close()
+        phy_feature_dict[tile_type] = {}
+    for T, config_bus, tile_data in iter_tile_bits(bitstream_name, args.family, tilegrid, ownership, tile_types, int(args.parallel)):
+        if len(tile_data) != 0:
+            tile_type = tilegrid[T]["TYPE"]
+            tile = config_bus[0:3] + ".0." + T
+            phy_feature_dict[tile_type][tile] = parse_tile2(databases[tile_type], tile, {tile: tile_data}, tile_type)
             
 
     # Delete all generated files - save space when doing this for every benchmark
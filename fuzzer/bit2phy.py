@@ -29,7 +29,10 @@ import argparse
 import random
 import numpy as np
 from bit_parser import print_frame
-from bit_parser import parse_bitstream
+from bit_parser import iter_tile_bits
+from bit_parser import load_ownership
+from bit_parser import load_device_frame_counts
+from bit_parser import bit_str, parse_bit_str
 from multiprocessing import Pool
 import pickle
 from time import sleep
@@ -40,13 +43,31 @@ from time import sleep
 ##================================================================================##
 
 
+def convert_db_bits(d):
+    """
+    Replace the "frame_bit" strings of the bit rules in a db with bit ids (see bit_parser.bit_id), in place
+
+    Returns
+    -------
+    dict
+        The db, d
+    """
+    for key, value in d.items():
+        if key in ["VALUE", "SITE_PIP_VALUE"] and type(value) is dict:
+            for val in value:
+                value[val] = [[parse_bit_str(B) for B in eq] for eq in value[val]]
+        elif key == "BITS" and type(value) is list:
+            d[key] = [[parse_bit_str(B) for B in eq] for eq in value]
+        elif type(value) is dict:
+            convert_db_bits(value)
+    return d
+
 def test_bits(valv,tile_data):
     for eq in valv:
         found_eq = 1
         for B in eq:
-            if "!" in B:
-                B_not = B.replace("!","")
-                if B_not in tile_data:
+            if B < 0:
+                if ~B in tile_data:
                     found_eq = 0
                     break
             else:
@@ -79,6 +100,7 @@ def feature_test(props, tile, loc, value,tile_data_dict):
 
 def parse_tile2(d, t,tile_data_dict,tile_type):
     features = []
+    tile_data_dict = {t: set(tile_data_dict[t])}
     for i, iv in d["SITE_INDEX"].items():
         for site, sitev in iv["SITE_TYPE"].items():
             for bel, belv in sitev["BEL"].items():
@@ -135,36 +157,40 @@ def main():
     parser.add_argument("--part_name", default="xc7a100ticsg324-1L")
     parser.add_argument("--path_to_db_folder", default="../byu_db/")
     parser.add_argument("--path_to_tilegrid", default="../byu_db/tilegrid.json")
+    parser.add_argument("--parallel", default=8, type=int)    # Number of processes large and multi-SLR bitstreams are decoded in
 
     args = parser.parse_args()
 
     fs = open(args.path_to_tilegrid, "r")
     tilegrid = json.load(fs)
+    load_device_frame_counts(args.path_to_tilegrid, args.family, tilegrid)
 
+    db_files = {}
     for x in glob.glob(args.path_to_db_folder + "db.*.json"):
         tile_type = os.path.basename(x).split(".")[1]
         if args.tile is not None and args.tile != tile_type:
             continue
+        db_files[tile_type] = x
 
+    databases = {}
+    for tile_type, x in db_files.items():
         fj = open(x, "r")
-        database = json.load(fj)
+        databases[tile_type] = convert_db_bits(json.load(fj))
         fj.close()
-        f = open(args.bit_file, "rb")
-        tile_data_dict = parse_bitstream(f, args.family, tilegrid, tile_type, "0")
-        f.close()
 
+    # Decode the bitstream once for all of the tile types, a tile at a time so memory stays flat on large parts
+    for T, config_bus, tile_data in iter_tile_bits(args.bit_file, args.family, tilegrid,
+                                                   load_ownership(args.path_to_tilegrid, args.family, tilegrid),
+                                                   list(db_files), args.parallel):
+        if len(tile_data) == 0:
+            continue
+        tile_type = tilegrid[T]["TYPE"]
+        key = config_bus[0:3] + ".0." + T
         if args.dumpdict:
-            print(f"\nBits for tile type: {tile_type}")
-            for key, val in tile_data_dict.items():
-                if len(val) != 0:
-                    val.sort()
-                    print(f"  {key}: {val}")
-            print()
-
-        for tile in sorted(tile_data_dict):
-            if len(tile_data_dict[tile]) != 0:
-                print("## ", tile, " ##")
-                parse_tile2(database, tile,tile_type)
+            print(f"  {key}: {[bit_str(b) for b in sorted(tile_data)]}")
+        print("## ", key, " ##")
+        for F in parse_tile2(databases[tile_type], key, {key: tile_data}, tile_type):
+            print(F)
     fs.close()
 
 #main()
@@ -0,0 +1,208 @@
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+import numpy as np
+
+from bit_parser import get_frame_format, open_bitstream, decode_frames
+
+
+##================================================================================##
+##                          DIFF THE FRAMES OF SPECIMENS                          ##
+##================================================================================##
+
+
+class FrameSet():
+    """
+    Frames of a set of specimen bitstreams on a common axis of frame addresses, with every distinct frame kept once
+
+    Specimens of a fuzz run only differ in a few frames, so a specimen is a row of ids into a shared table of
+    frames.  Two specimens differ at an address exactly when their ids differ there, and the bits that differ are
+    the bits of the XOR of the two frames.
+
+    Attributes
+    ----------
+    names : [ str ]
+        Name of each specimen
+    addrs : np.ndarray (int64)
+        Sorted SLR-qualified address of every frame written by any of the specimens
+    ids : np.ndarray (int32)
+        Row in payloads of the frame of each specimen (rows) at each address (columns).  A frame a specimen doesn't
+        write is all zeros.
+    payloads : np.ndarray
+        2D array of the distinct frames, as returned by read_frames
+    varying : np.ndarray (int64)
+        Columns of ids where the specimens don't all have the same frame - no two specimens differ anywhere else
+    word_size : int
+        Number of bytes in each word in frame
+    """
+    def __init__(self, names, addrs, ids, payloads, word_size):
+        self.names = names
+        self.addrs = addrs
+        self.ids = ids
+        self.payloads = payloads
+        self.word_size = word_size
+        self.varying = np.flatnonzero((ids != ids[:1]).any(axis=0))
+
+
+def load_frame_set(files, family, frame_counts=None, names=None):
+    """
+    Read the frames of a set of specimen bitstreams into a FrameSet
+
+    Only one specimen is held in memory at a time.  The frames of each specimen are compared to those of the first
+    specimen, and only the frames that differ from it are looked up in (and added to) the table of distinct frames.
+
+    Parameters
+    ----------
+    files : [ file, str or BitstreamFile ]
+        Specimen bitstreams (see bit_parser.open_bitstream)
+    family : str
+        FPGA architecture family
+    frame_counts : { int : int }
+        Number of frames in each column, see bit_parser.get_frame_counts
+    names : [ str ]
+        Name of each specimen, the file names by default
+
+    Returns
+    -------
+    FrameSet
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    if names is None:
+        names = [f if isinstance(f, str) else f.name for f in files]
+    addrs = [np.zeros(0, dtype=np.int64)]
+    for f in files:
+        bit_file = open_bitstream(f, family, frame_counts)
+        addrs.append(bit_file.addrs)
+        if bit_file is not f:
+            bit_file.close()
+    addrs = np.unique(np.concatenate(addrs))
+    ids = np.zeros((len(files), len(addrs)), dtype=np.int32)
+
+    ref = None
+    payloads = []
+    payload_ids = {}
+    for n, f in enumerate(files):
+        bit_file = open_bitstream(f, family, frame_counts)
+        frames = np.zeros((len(addrs), write_count), dtype=">u" + str(word_size))
+        frames[np.searchsorted(addrs, bit_file.addrs)] = bit_file.frames()
+        if bit_file is not f:
+            bit_file.close()
+        if ref is None:
+            ref = frames
+            rows = np.arange(len(addrs))
+        else:
+            # Frames the specimen shares with the first specimen share its ids
+            same = (frames == ref).all(axis=1)
+            ids[n, same] = ids[0, same]
+            rows = np.flatnonzero(~same)
+        for r in rows.tolist():
+            key = frames[r].tobytes()
+            if key not in payload_ids:
+                payload_ids[key] = len(payloads)
+                payloads.append(frames[r].copy())
+            ids[n, r] = payload_ids[key]
+    if len(payloads) == 0:
+        payloads = np.zeros((0, write_count), dtype=">u" + str(word_size))
+    else:
+        payloads = np.array(payloads)
+    return FrameSet(names, addrs, ids, payloads, word_size)
+
+
+def changed_frames(frame_set, a, b):
+    """
+    Addresses of the frames that differ between two specimens
+
+    Parameters
+    ----------
+    frame_set : FrameSet
+    a, b : int
+        Specimens to compare, as rows of frame_set.ids
+
+    Returns
+    -------
+    np.ndarray (int64)
+        Sorted addresses
+    """
+    cols = frame_set.varying[frame_set.ids[a, frame_set.varying] != frame_set.ids[b, frame_set.varying]]
+    return frame_set.addrs[cols]
+
+
+def diff_frames(frame_set, a, b):
+    """
+    Bits that differ between two specimens
+
+    Returns
+    -------
+    addrs : np.ndarray (int64)
+        Sorted address of each frame that differs
+    (frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Bits turned on in the XOR of the frames at addrs, as returned by bit_parser.decode_frames
+    """
+    cols = frame_set.varying[frame_set.ids[a, frame_set.varying] != frame_set.ids[b, frame_set.varying]]
+    xor = frame_set.payloads[frame_set.ids[a, cols]] ^ frame_set.payloads[frame_set.ids[b, cols]]
+    return (frame_set.addrs[cols],) + decode_frames(xor, frame_set.word_size)
+
+
+def diff_reference(frame_set, ref=0):
+    """
+    Bits that differ between every specimen and a reference specimen
+
+    Returns
+    -------
+    specimens : np.ndarray (int64)
+        Specimen (row of frame_set.ids) of each frame that differs from the reference
+    addrs : np.ndarray (int64)
+        Address of each frame that differs from the reference, sorted by specimen and then address
+    (frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Bits that differ from the reference, as returned by bit_parser.decode_frames - frame_idx indexes specimens and addrs
+    """
+    ids = frame_set.ids[:, frame_set.varying]
+    specimens, cols = np.nonzero(ids != ids[ref])
+    cols = frame_set.varying[cols]
+    xor = frame_set.payloads[frame_set.ids[specimens, cols]] ^ frame_set.payloads[frame_set.ids[ref, cols]]
+    return (specimens, frame_set.addrs[cols]) + decode_frames(xor, frame_set.word_size)
+
+
+def diff_all_pairs(frame_set):
+    """
+    Frames that differ between every pair of specimens
+
+    Only the varying columns of the ids are compared, one specimen against all of the later ones at a time, so
+    all the pairs of a few hundred specimens are compared in well under a second.  The bits of a pair are found
+    with diff_frames.
+
+    Returns
+    -------
+    (a, b) : ( np.ndarray, np.ndarray )
+        Specimens of each pair (a < b) and frame that differs, sorted by a, then b, then address
+    addrs : np.ndarray (int64)
+        Address of each frame that differs
+    """
+    ids = frame_set.ids[:, frame_set.varying]
+    a, b, cols = [], [], []
+    for i in range(len(ids) - 1):
+        j, c = np.nonzero(ids[i+1:] != ids[i])
+        a.append(np.full(len(j), i))
+        b.append(j + i + 1)
+        cols.append(c)
+    if len(a) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    return np.concatenate(a), np.concatenate(b), frame_set.addrs[frame_set.varying[np.concatenate(cols)]]
@@ -21,6 +21,858 @@
 # or recommendations expressed in this material are those of the author(s) and 
 # do not necessarily reflect the views of the Office of Naval Research.
 
+import fcntl
+import hashlib
+import json
+import mmap
+import os
+import zlib
+from bisect import bisect_left, bisect_right
+from multiprocessing import Pool
+
+import numpy as np
+
+from artifacts import ARTIFACT_CODECS, artifact_name, artifact_codec_of, find_artifact
+
+
+def get_frame_format(family):
+    """
+    Get the single frame write instruction and frame layout for a family
+
+    Parameters
+    ----------
+    family : str
+        FPGA architecture family, Ex.: "artix7", "kintexu", "kintexuplus"
+
+    Returns
+    -------
+    (write_instr, write_count, word_size)
+        The FDRI write instruction, the number of words following it, and the number of bytes per word
+    """
+    if "uplus" in family:
+        write_instr = 0x3000405D
+        write_count = 186
+        word_size = 2
+    elif "u" in family:
+        write_instr = 0x3000407B
+        write_count = 123
+        word_size = 4
+    else:
+        write_instr = 0x30004065
+        write_count = 101
+        word_size = 4
+    return write_instr, write_count, word_size
+
+
+# (bit position, width) of each field of a frame address, for each frame address register layout.  The SLR is not
+# part of the FAR, the parser puts it above the FAR (slr << 32 | FAR) to keep the address spaces of SLRs apart.
+FAR_FIELDS = {
+    "series7":    {"slr": (32, 8), "block": (23, 3), "top": (22, 1), "row": (17, 5), "column": (7, 10), "minor": (0, 7)},
+    "ultrascale": {"slr": (32, 8), "block": (23, 3), "top": (22, 0), "row": (17, 6), "column": (7, 10), "minor": (0, 7)},
+    "uplus":      {"slr": (32, 8), "block": (24, 3), "top": (24, 0), "row": (18, 6), "column": (8, 10), "minor": (0, 8)},
+}
+
+
+def far_layout(family):
+    """
+    Frame address register layout of a family, a key of FAR_FIELDS
+    """
+    if "uplus" in family:
+        return "uplus"
+    elif "u" in family:
+        return "ultrascale"
+    return "series7"
+
+
+_far_masks = {}
+
+def far_mask(family, *fields):
+    """
+    Mask of the bits of some frame address fields, Ex.: far_mask("artix7", "minor") -> 0x7F
+    """
+    if (family, fields) not in _far_masks:
+        layout = FAR_FIELDS[far_layout(family)]
+        mask = 0
+        for field in fields:
+            shift, width = layout[field]
+            mask |= ((1 << width) - 1) << shift
+        _far_masks[(family, fields)] = mask
+    return _far_masks[(family, fields)]
+
+
+def decode_far(addrs, family):
+    """
+    Split frame addresses into their fields
+
+    Parameters
+    ----------
+    addrs : np.ndarray or int
+        SLR-qualified frame addresses
+    family : str
+        FPGA architecture family
+
+    Returns
+    -------
+    { str : np.ndarray or int }
+        Value of each field of FAR_FIELDS for every address, Ex.: decode_far(addrs, family)["column"]
+    """
+    if isinstance(addrs, np.ndarray):
+        addrs = addrs.astype(np.int64)
+    return {field: addrs >> shift & ((1 << width) - 1) for field, (shift, width) in FAR_FIELDS[far_layout(family)].items()}
+
+
+def encode_far(family, block=0, top=0, row=0, column=0, minor=0, slr=0):
+    """
+    Build frame addresses from their fields, the inverse of decode_far
+
+    Fields can be ints or arrays.  Fields the layout of the family doesn't have (top on UltraScale) must be 0.
+    """
+    layout = FAR_FIELDS[far_layout(family)]
+    addr = 0
+    for field, value in [("slr", slr), ("block", block), ("top", top), ("row", row), ("column", column), ("minor", minor)]:
+        shift, width = layout[field]
+        addr = addr | (value & ((1 << width) - 1)) << shift
+    return addr
+
+
+def column_base(addrs, family):
+    """
+    Base (minor 0) frame address of the column of frame addresses, the key of get_frame_counts
+    """
+    return addrs & ~far_mask(family, "minor")
+
+
+def bit_id(frame, bit):
+    """
+    Packed integer id of a bit within a tile, frame << 16 | bit
+
+    The negation of a bit ("!27_253" in the db) is ~bit_id(27, 253), so negated bits are always negative.
+    """
+    return frame << 16 | bit
+
+
+def bit_str(b):
+    """
+    "frame_bit" string of a bit id, as written in the db: bit_id(27, 253) -> "27_253", ~bit_id(27, 253) -> "!27_253"
+    """
+    if b < 0:
+        return "!" + bit_str(~b)
+    return str(b >> 16) + "_" + str(b & 0xFFFF)
+
+
+def parse_bit_str(s):
+    """
+    Bit id of a "frame_bit" string from the db, the inverse of bit_str
+    """
+    if s.startswith("!"):
+        return ~parse_bit_str(s[1:])
+    frame, bit = s.split("_")
+    return int(frame) << 16 | int(bit)
+
+
+# Configuration registers addressed by type 1 packets (the same on 7 series, ultrascale and ultrascale+)
+CRC_REG = 0x00
+FAR_REG = 0x01
+FDRI_REG = 0x02
+CMD_REG = 0x04
+MFWR_REG = 0x0A
+DESYNC_CMD = 0x0D
+SYNC_WORD = b"\xaa\x99\x55\x66"
+SYNC = 0xAA995566
+
+# Bump whenever the layout or meaning of the .fidx.npz sidecar files changes
+FRAME_INDEX_VERSION = 4
+
+
+def index_file_name(file_name):
+    """
+    Name of the frame index sidecar of a bitstream: "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.bit" -> "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.fidx.npz"
+
+    The sidecar deliberately does not contain ".bit" so that it isn't picked up by the code looking for bitstreams in a data folder.
+    """
+    file_name = artifact_name(file_name)
+    if file_name.endswith(".bit"):
+        file_name = file_name[:-4]
+    return file_name + ".fidx.npz"
+
+
+_frame_counts_cache = (None, None)
+
+def get_frame_counts(tilegrid):
+    """
+    Number of frames in every column of the device
+
+    Only needed to follow FAR auto-increment through multi-frame writes, which jump from the last minor address
+    of a column to the next column.  The counts of the device bitstream are used once load_device_frame_counts has
+    loaded them for this tilegrid.  Otherwise they come from the tilegrid, which has no count for the columns of
+    tiles it has no frames for (frames == -1): a multi-frame write reaching one of those is a decoding error.
+
+    Returns
+    -------
+    { int : int }
+        Number of frames in the column, keyed by the SLR-qualified base (minor 0) frame address of the column
+    """
+    global _frame_counts_cache
+    if tilegrid is None:
+        return None
+    if _frame_counts_cache[0] is tilegrid:
+        return _frame_counts_cache[1]
+    frame_counts = {}
+    for T in tilegrid:
+        for config_bus, tile_info in tilegrid[T].get("bits", {}).items():
+            if tile_info["frames"] == -1:
+                continue
+            base = int(tile_info["baseaddr"], 16) | tilegrid[T].get("SLR", 0) << 32
+            frame_counts[base] = max(frame_counts.get(base, 0), tile_info["frames"])
+    _frame_counts_cache = (tilegrid, frame_counts)
+    return frame_counts
+
+
+DEVICE_BITSTREAM = "device.bit"
+
+def load_device_frame_counts(tilegrid_file, family, tilegrid):
+    """
+    Number of frames in every column of the device, read from the bitstream of the empty device next to the tilegrid
+
+    get_db.tcl writes the bitstream (DEVICE_BITSTREAM) with per-frame CRC, so every frame address in it is explicit
+    and no frame counts are needed to decode it.  It configures every frame of the device, so each column has as
+    many frames as its largest minor address + 1.  The counts replace those of the tilegrid in get_frame_counts.
+
+    Parameters
+    ----------
+    tilegrid_file : str
+        Path to tilegrid.json
+    family : str
+        FPGA architecture family
+    tilegrid : dict
+        Contents of tilegrid_file
+
+    Returns
+    -------
+    { int : int }
+        Number of frames in the column, keyed by the SLR-qualified base frame address of the column.  None if
+        there is no device bitstream, in which case get_frame_counts keeps using the tilegrid.
+    """
+    global _frame_counts_cache
+    bit_name = os.path.join(os.path.dirname(tilegrid_file), DEVICE_BITSTREAM)
+    if not os.path.exists(bit_name):
+        print("No " + bit_name + ", the frame counts of multi-frame writes come from the tilegrid")
+        return None
+    with open(bit_name, "rb") as f:
+        addrs, offsets = build_frame_index(f.read(), family)
+    minor_mask = far_mask(family, "minor")
+    frame_counts = {}
+    for addr in addrs.tolist():
+        base = addr & ~minor_mask
+        frame_counts[base] = max(frame_counts.get(base, 0), (addr & minor_mask) + 1)
+    _frame_counts_cache = (tilegrid, frame_counts)
+    return frame_counts
+
+
+_frame_ranges_cache = {}
+
+def get_frame_ranges(tilegrid, tile_types):
+    """
+    Frame address ranges configuring the tiles of some tile types
+
+    Returns
+    -------
+    (starts, stops) : ( np.ndarray, np.ndarray )
+        Sorted, non-overlapping ranges [start, stop) of SLR-qualified frame addresses
+    """
+    cache_key = tuple(sorted(tile_types))
+    if cache_key in _frame_ranges_cache and _frame_ranges_cache[cache_key][0] is tilegrid:
+        return _frame_ranges_cache[cache_key][1]
+    ranges = set()
+    for T in tilegrid:
+        if tilegrid[T]["TYPE"] in tile_types:
+            for config_bus, tile_info in tilegrid[T].get("bits", {}).items():
+                frames = tile_info["frames"]
+                if frames == -1:
+                    frames = 100 # Same default as get_tile_bits
+                base = int(tile_info["baseaddr"], 16) | tilegrid[T].get("SLR", 0) << 32
+                ranges.add((base, base + frames))
+    starts, stops = [], []
+    for start, stop in sorted(ranges):
+        if starts and start <= stops[-1]:
+            stops[-1] = max(stops[-1], stop)
+        else:
+            starts.append(start)
+            stops.append(stop)
+    frame_ranges = (np.array(starts, dtype=np.int64), np.array(stops, dtype=np.int64))
+    _frame_ranges_cache[cache_key] = (tilegrid, frame_ranges)
+    return frame_ranges
+
+
+def frame_counts_key(frame_counts):
+    """
+    Checksum of a frame count table, stored in the frame index so that it is rebuilt if the table changes
+    """
+    if not frame_counts:
+        return 0
+    return zlib.crc32(np.array(sorted(frame_counts.items()), dtype=np.int64).tobytes())
+
+
+# Number of padding frames a multi-frame write has at the end of every row.  run_packets checks that the padding
+# frames are blank and that every write ends on its last frame, so a bitstream that doesn't follow this is an error
+# rather than frames filed under the wrong addresses.
+ROW_PAD_FRAMES = 2
+
+
+def next_frame_address(addr, family, frame_counts, columns):
+    """
+    Frame address that FAR auto-increments to after a frame is written at addr
+
+    Raises ValueError if the column of addr has no frame count, as the address after its last frame isn't known.
+
+    Returns
+    -------
+    (int, int)
+        Next frame address (None past the last column of the device) and the number of padding frames
+        written before it - a multi-frame write pads ROW_PAD_FRAMES frames at the end of every row
+    """
+    minor_mask = far_mask(family, "minor")
+    base = addr & ~minor_mask
+    if not frame_counts or base not in frame_counts:
+        raise ValueError("FAR auto-increment reaches frame address %08X, in a column with no frame count (see load_device_frame_counts)" % addr)
+    if (addr & minor_mask) + 1 < frame_counts[base]:
+        return addr + 1, 0
+    i = bisect_right(columns, base)
+    if i == len(columns):
+        return None, ROW_PAD_FRAMES
+    if (columns[i] ^ addr) & ~far_mask(family, "column", "minor"):
+        return columns[i], ROW_PAD_FRAMES
+    return columns[i], 0
+
+
+def run_packets(words, pos, limit, family, frame_counts, nested):
+    """
+    Run the configuration packets of one configuration stream (one SLR), see build_frame_index
+
+    Parameters
+    ----------
+    words : np.ndarray
+        32 bit words of the bitstream
+    pos : int
+        Word just after the sync word of the stream
+    limit : int
+        Word the stream can't run past
+    family : str
+        FPGA architecture family
+    frame_counts : { int : int }
+        Number of frames in each column of the SLR, keyed by the base frame address of the column
+    nested : [ (int, int) ]
+        The (first word, limit) of every configuration stream found in the payload of a packet is appended to it.
+        These are the streams that the SLR passes on to the next SLRs.
+
+    Returns
+    -------
+    addrs : [ int ]
+        Frame address of each frame written
+    positions : [ int ]
+        Word at which the data of each frame starts
+    pos : int
+        Word at which the stream stopped
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    frame_len = write_count * word_size // 4
+    columns = sorted(frame_counts) if frame_counts else []
+
+    def write_to(pos, reg):
+        # Is there a type 1 write to reg at pos
+        return pos < limit and int(words[pos]) >> 27 == 0x6 and (int(words[pos]) >> 13) & 0x1F == reg
+
+    def check_far(far, far_error):
+        if far is None:
+            raise ValueError(far_error or "Frames written past the last column of the device")
+
+    addrs = []
+    positions = []
+    far = 0
+    # Why far isn't known, when it is None
+    far_error = None
+    last_frame = None
+    reg = None
+    while pos < limit:
+        header = int(words[pos])
+        packet_type = header >> 29
+        opcode = (header >> 27) & 0x3
+        if packet_type == 1:
+            reg = (header >> 13) & 0x1F
+            count = header & 0x7FF
+        elif packet_type == 2:
+            count = header & 0x7FFFFFF
+        else:
+            # Dummy/padding words
+            pos += 1
+            continue
+        pos += 1
+        end = min(pos + count, limit)
+        if opcode != 2 or reg is None:
+            pos = end
+            continue
+
+        if reg == FAR_REG and count > 0:
+            far = int(words[pos])
+            far_error = None
+        elif reg == CMD_REG and count > 0 and int(words[pos]) == DESYNC_CMD:
+            pos = end
+            break
+        elif reg == FDRI_REG:
+            n_frames = (end - pos) // frame_len
+            if n_frames == 1 and write_to(end, FAR_REG) and write_to(end + 2, CRC_REG):
+                # Per-frame CRC: the frame address follows the frame
+                far = int(words[end + 1])
+                addrs.append(far)
+                positions.append(pos)
+                last_frame = pos
+                pos = end + 2
+                continue
+            if n_frames == 1:
+                check_far(far, far_error)
+                addrs.append(far)
+                positions.append(pos)
+                last_frame = pos
+                # FAR is usually written again before the next frame, so an unknown next address is only an error
+                # if it is used
+                try:
+                    far, pad = next_frame_address(far, family, frame_counts, columns)
+                except ValueError as e:
+                    far, far_error = None, str(e)
+            # The last frame of a multi-frame write is a pad frame that flushes the frame buffer
+            frame_pos = pos
+            while n_frames > 1 and frame_pos + frame_len < end:
+                check_far(far, far_error)
+                addrs.append(far)
+                positions.append(frame_pos)
+                last_frame = frame_pos
+                far, pad = next_frame_address(far, family, frame_counts, columns)
+                frame_pos += frame_len
+                if pad > 0:
+                    if frame_pos + frame_len * pad >= end or words[frame_pos:frame_pos + frame_len * pad].any():
+                        raise ValueError("The %d row padding frames at word %d aren't there or aren't blank: the frame counts don't match the bitstream" % (pad, frame_pos))
+                    frame_pos += frame_len * pad
+            if n_frames > 1 and frame_pos + frame_len != end:
+                raise ValueError("Multi-frame write at word %d doesn't end on its last frame: the frame counts don't match the bitstream" % pos)
+        elif reg == MFWR_REG and last_frame is not None:
+            check_far(far, far_error)
+            addrs.append(far)
+            positions.append(last_frame)
+        elif reg != CRC_REG and end - pos > 16:
+            # A large write to any other register carrying a sync word is the stream of another SLR
+            for i in np.flatnonzero(words[pos:pos+16] == SYNC).tolist():
+                nested.append((pos + i + 1, end))
+                break
+        pos = end
+    return addrs, positions, pos
+
+
+def slr_frame_counts(frame_counts, slr):
+    """
+    Frame counts of the columns of one SLR, keyed by frame address without the SLR (see get_frame_counts)
+    """
+    if frame_counts is None:
+        return None
+    return {base & 0xFFFFFFFF: count for base, count in frame_counts.items() if base >> 32 == slr}
+
+
+def build_frame_index(data, family, frame_counts=None):
+    """
+    Run the configuration packets of a bitstream and build an index from frame address to frame data
+
+    Type 1 and type 2 packets are decoded, tracking writes to the FAR, FDRI and MFWR registers:
+      - An FDRI write writes its frames starting at FAR, which auto-increments after every frame.  The last frame of
+        a multi-frame write is a pad frame, as are the ROW_PAD_FRAMES frames at the end of every row.
+      - A single-frame FDRI write followed by a FAR write and a CRC write belongs to the address written to FAR
+        after it.  This is the layout of per-frame CRC bitstreams (BITSTREAM.GENERAL.PERFRAMECRC).
+      - An MFWR write copies the last (non-pad) frame written to FDRI to FAR.  Compressed bitstreams (BITSTREAM.GENERAL.COMPRESS)
+        write repeated frames this way.
+    A configuration stream starts at a sync word and stops at the DESYNC command.  Bitstreams of multi-SLR parts have
+    one stream per SLR, either one after the other or carried in the payload of a packet of the previous SLR's stream.
+    SLRs are numbered in the order their streams start in the file, which is the order configuration is passed down
+    the SLRs (the CONFIG_ORDER_INDEX of the SLR).  Every SLR has its own frame address space, so frame addresses
+    are qualified with the SLR: slr << 32 | FAR.  When an address is written more than once the first write is kept.
+
+    Parameters
+    ----------
+    data : bytes or mmap
+        Contents of the bitstream
+    family : str
+        FPGA architecture family
+    frame_counts : { int : int }
+        Number of frames in each column, see get_frame_counts.  Without it (or past a column it has no count for)
+        a multi-frame write can't be followed and raises ValueError, as do row padding frames that aren't blank.
+
+    Returns
+    -------
+    addrs : np.ndarray (int64)
+        SLR-qualified frame address of each frame, in the order the frames were first written
+    offsets : np.ndarray (int64)
+        Byte offset in data of the first word of each frame
+    """
+    start = data.find(SYNC_WORD)
+    if start == -1:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Every stream is word-aligned with the first one
+    align = start % 4
+    words = np.frombuffer(data, dtype=">u4", count=(len(data) - align) // 4, offset=align)
+    n_words = len(words)
+
+    # Streams still to be run, as (first word, limit, nested in another stream), in file order
+    streams = [((start - align) // 4 + 1, n_words, False)]
+    addrs = []
+    positions = []
+    slr = 0
+    while streams:
+        pos, limit, is_nested = streams.pop(0)
+        nested = []
+        slr_addrs, slr_positions, pos = run_packets(words, pos, limit, family, slr_frame_counts(frame_counts, slr), nested)
+        addrs += [slr << 32 | a for a in slr_addrs]
+        positions += slr_positions
+        slr += 1
+        if not is_nested:
+            top_end = pos
+        streams = sorted(streams + [(p, l, True) for p, l in nested])
+        if not streams:
+            # Look for the stream of the next SLR after the last one that wasn't nested
+            next_start = data.find(SYNC_WORD, top_end*4 + align)
+            while next_start != -1 and next_start % 4 != align:
+                next_start = data.find(SYNC_WORD, next_start + 1)
+            if next_start != -1:
+                streams.append(((next_start - align) // 4 + 1, n_words, False))
+
+    addrs = np.array(addrs, dtype=np.int64)
+    positions = np.array(positions, dtype=np.int64)
+    first = np.sort(np.unique(addrs, return_index=True)[1])
+    return addrs[first], align + positions[first] * 4
+
+
+def gather_frames(data, offsets, word_size, write_count):
+    """
+    2D array of the words of the frames whose data starts at the given byte offsets of data
+    """
+    dtype = np.dtype(">u" + str(word_size))
+    if len(offsets) == 0:
+        return np.zeros((0, write_count), dtype=dtype)
+    # Every frame starts a whole number of 32 bit words after the sync word, so all offsets share the same alignment
+    base = int(offsets[0]) % word_size
+    units = np.frombuffer(data, dtype=dtype, count=(len(data) - base) // word_size, offset=base)
+    return units[((offsets - base) // word_size)[:, None] + np.arange(write_count)]
+
+
+class BitstreamFile():
+    """
+    Memory-mapped bitstream with an index from frame address to the byte offset of the frame data
+
+    The index is saved next to the bitstream (see index_file_name) and reused for as long as the bitstream is unchanged,
+    so a bitstream is only scanned once no matter how many times it is parsed.  A compressed bitstream (see
+    artifacts.compress_artifact) is decompressed into memory instead of being mapped.
+
+    Attributes
+    ----------
+    addrs : np.ndarray (int64)
+        SLR-qualified frame address (see build_frame_index) of each frame, in the order the frames were first written
+    offsets : np.ndarray (int64)
+        Byte offset of the data of each frame
+    word_size : int
+        Number of bytes in each word in frame
+    """
+    def __init__(self, file_name, family, frame_counts=None):
+        self.file_name = file_name
+        self.family = family
+        self.frame_counts = frame_counts
+        write_instr, self.write_count, self.word_size = get_frame_format(family)
+        self.dtype = np.dtype(">u" + str(self.word_size))
+        self.mapped = artifact_codec_of(file_name) is None
+        if self.mapped:
+            self._file = open(file_name, "rb")
+            self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            with ARTIFACT_CODECS[artifact_codec_of(file_name)][1](file_name, "rb") as fc:
+                self.data = fc.read()
+        self.addrs, self.offsets = self.load_index()
+        self.frame_pos = {a: i for i, a in enumerate(self.addrs.tolist())}
+
+    def load_index(self):
+        stat = os.stat(self.file_name)
+        key = np.array([FRAME_INDEX_VERSION, self.word_size, stat.st_size, stat.st_mtime_ns,
+                        frame_counts_key(self.frame_counts)], dtype=np.int64)
+        idx_name = index_file_name(self.file_name)
+        if os.path.exists(idx_name):
+            try:
+                with np.load(idx_name) as idx:
+                    if np.array_equal(idx["key"], key):
+                        return idx["addrs"], idx["offsets"]
+            except (OSError, ValueError, KeyError):
+                pass
+        addrs, offsets = build_frame_index(self.data, self.family, self.frame_counts)
+        try:
+            tmp_name = idx_name + "." + str(os.getpid())
+            with open(tmp_name, "wb") as fi:
+                np.savez(fi, key=key, addrs=addrs, offsets=offsets)
+            os.replace(tmp_name, idx_name)
+        except OSError:
+            pass
+        return addrs, offsets
+
+    def frame(self, addr):
+        """
+        Words of the frame at addr (zero-copy view into the file), or None if the frame isn't in the bitstream
+        """
+        if addr not in self.frame_pos:
+            return None
+        return np.frombuffer(self.data, dtype=self.dtype, count=self.write_count, offset=int(self.offsets[self.frame_pos[addr]]))
+
+    def frames(self, rows=None):
+        """
+        2D array of the words of the frames at the given rows of addrs (all frames by default)
+        """
+        offsets = self.offsets if rows is None else self.offsets[rows]
+        return gather_frames(self.data, offsets, self.word_size, self.write_count)
+
+    def digest(self):
+        """
+        SHA-1 (hex) of the bitstream contents
+        """
+        return hashlib.sha1(self.data).hexdigest()
+
+    def close(self):
+        if not self.mapped:
+            return
+        try:
+            self.data.close()
+        except BufferError:
+            # Views handed out by frame() are still alive, the map is released with them
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Bump whenever the layout or meaning of the frame store or its manifests changes
+FRAME_STORE_VERSION = 1
+FRAME_STORE_DIR = "frame_store"
+
+# Map from the SHA-1 of each frame payload to its slot, for each frame store this process has ingested into
+_frame_store_index = {}
+
+
+def manifest_file_name(file_name):
+    """
+    Name of the frame store manifest of a bitstream: "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.bit" -> "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.fman.npz"
+
+    Like the frame index sidecar, the manifest doesn't contain ".bit".
+    """
+    file_name = artifact_name(file_name)
+    if file_name.endswith(".bit"):
+        file_name = file_name[:-4]
+    return file_name + ".fman.npz"
+
+
+def bitstream_exists(file_name):
+    """
+    Whether a bitstream is on disk, either as the bitstream itself (compressed or not) or ingested into a frame store
+    (see ingest_bitstream)
+    """
+    return find_artifact(file_name) is not None or os.path.exists(manifest_file_name(file_name))
+
+
+def load_store_index(store_dir):
+    """
+    Map from the SHA-1 of each frame payload of a frame store to its slot, including frames added by other processes
+
+    Only call with the store locked.
+    """
+    index = _frame_store_index.setdefault(store_dir, {})
+    with open(os.path.join(store_dir, "frames.sha1"), "ab+") as fh:
+        if fh.seek(0, os.SEEK_END) < len(index) * 20:
+            # The store was removed and started again
+            index.clear()
+        fh.seek(len(index) * 20)
+        new = fh.read()
+    for i in range(len(new) // 20):
+        index[new[i*20:(i+1)*20]] = len(index)
+    return index
+
+
+def ingest_bitstream(file_name, family, frame_counts=None, remove=True):
+    """
+    Move a bitstream into the frame store of its folder
+
+    The store keeps every distinct frame payload once, in the order they were first seen (frame_store/frames.bin),
+    along with the SHA-1 of each payload (frame_store/frames.sha1).  The bitstream is replaced by a manifest (see
+    manifest_file_name) with the address and the store slot of each of its frames.  The specimens of a fuzz run only
+    differ in a handful of frames, so the store grows by a few frames per specimen rather than by a device image.
+
+    Parameters
+    ----------
+    file_name : str
+        Name of the bitstream
+    family : str
+        FPGA architecture family
+    frame_counts : { int : int }
+        Number of frames in each column, see get_frame_counts.  The frames are indexed once, at ingest.
+    remove : bool
+        Remove the bitstream (and its frame index sidecar) once it is in the store
+
+    Returns
+    -------
+    str
+        Name of the manifest
+    """
+    store_dir = os.path.join(os.path.dirname(file_name), FRAME_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    with BitstreamFile(find_artifact(file_name) or file_name, family, frame_counts) as bit_file:
+        addrs, frames, digest = bit_file.addrs, bit_file.frames(), bit_file.digest()
+    frame_bytes = frames.shape[1] * frames.itemsize
+    payloads, inverse = np.unique(np.ascontiguousarray(frames).view("V" + str(frame_bytes)).ravel(), return_inverse=True)
+    hashes = [hashlib.sha1(x.tobytes()).digest() for x in payloads]
+
+    with open(os.path.join(store_dir, "lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        index = load_store_index(store_dir)
+        new = [i for i, h in enumerate(hashes) if h not in index]
+        if new:
+            # Written at the slot after the last hash, so a partly written earlier payload is overwritten
+            count = len(index)
+            for name, data, size in [("frames.bin", payloads[new].tobytes(), frame_bytes),
+                                     ("frames.sha1", b"".join(hashes[i] for i in new), 20)]:
+                with open(os.open(os.path.join(store_dir, name), os.O_RDWR | os.O_CREAT, 0o644), "r+b") as fs:
+                    fs.truncate(count * size)
+                    fs.seek(count * size)
+                    fs.write(data)
+            for i in new:
+                index[hashes[i]] = len(index)
+    slots = np.array([index[h] for h in hashes], dtype=np.uint32)[inverse.ravel()]
+
+    man_name = manifest_file_name(file_name)
+    tmp_name = man_name + "." + str(os.getpid())
+    with open(tmp_name, "wb") as fm:
+        np.savez_compressed(fm, key=np.array([FRAME_STORE_VERSION, frame_bytes], dtype=np.int64),
+                            digest=np.array(digest), addrs=addrs, slots=slots)
+    os.replace(tmp_name, man_name)
+    if remove:
+        os.remove(bit_file.file_name)
+        if os.path.exists(index_file_name(file_name)):
+            os.remove(index_file_name(file_name))
+    return man_name
+
+
+class StoredBitstream(BitstreamFile):
+    """
+    Bitstream ingested into a frame store (see ingest_bitstream), read through its manifest
+
+    The frames are read straight from the payload file of the store, which is mapped like a bitstream, so a
+    StoredBitstream can be used wherever a BitstreamFile is.
+
+    Attributes
+    ----------
+    file_name : str
+        Payload file of the store, the frame data is at offsets in it
+    addrs : np.ndarray (int64)
+        SLR-qualified frame address of each frame, as indexed at ingest
+    offsets : np.ndarray (int64)
+        Byte offset of the data of each frame in the payload file
+    word_size : int
+        Number of bytes in each word in frame
+    """
+    def __init__(self, manifest_name, family):
+        self.manifest_name = manifest_name
+        self.family = family
+        write_instr, self.write_count, self.word_size = get_frame_format(family)
+        self.dtype = np.dtype(">u" + str(self.word_size))
+        frame_bytes = self.write_count * self.word_size
+        with np.load(manifest_name) as manifest:
+            key, self.addrs, slots = manifest["key"], manifest["addrs"], manifest["slots"]
+            self._digest = str(manifest["digest"])
+        if key[0] != FRAME_STORE_VERSION or key[1] != frame_bytes:
+            raise ValueError(manifest_name + " is not a " + family + " frame store manifest of version " + str(FRAME_STORE_VERSION))
+        self.file_name = os.path.join(os.path.dirname(manifest_name), FRAME_STORE_DIR, "frames.bin")
+        self.offsets = slots.astype(np.int64) * frame_bytes
+        self.mapped = True
+        self._file = open(self.file_name, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.frame_pos = {a: i for i, a in enumerate(self.addrs.tolist())}
+
+    def digest(self):
+        """
+        SHA-1 (hex) of the contents of the bitstream that was ingested, so decode cache entries outlive the ingest
+        """
+        return self._digest
+
+
+def open_bitstream(f, family, frame_counts=None):
+    """
+    Get a BitstreamFile for an opened bitstream file, a file name, or an existing BitstreamFile
+
+    Compressed bitstreams are found by their uncompressed name, and bitstreams that have been ingested into a frame
+    store are read from the store.
+    """
+    if isinstance(f, BitstreamFile):
+        return f
+    file_name = f if isinstance(f, str) else f.name
+    if file_name.endswith(".fman.npz"):
+        return StoredBitstream(file_name, family)
+    found = find_artifact(file_name)
+    if found is None and os.path.exists(manifest_file_name(file_name)):
+        return StoredBitstream(manifest_file_name(file_name), family)
+    return BitstreamFile(found or file_name, family, frame_counts)
+
+
+def read_frames(f, family, frame_counts=None):
+    """
+    Read every frame written in a bitstream into a NumPy array
+
+    Parameters
+    ----------
+    f : file, str or BitstreamFile
+        Opened bitstream file (binary mode), or its name
+    family : str
+        FPGA architecture family
+    frame_counts : { int : int }
+        Number of frames in each column, see get_frame_counts
+
+    Returns
+    -------
+    addrs : np.ndarray (int64)
+        SLR-qualified frame address (see build_frame_index) of each frame, in the order the frames were first written
+    frames : np.ndarray
+        2D array of frame words, one row per address - uint32 words, or uint16 for ultrascale+
+    """
+    bit_file = open_bitstream(f, family, frame_counts)
+    addrs, frames = bit_file.addrs, bit_file.frames()
+    if bit_file is not f:
+        bit_file.close()
+    return addrs, frames
+
+
+def decode_frames(frames, word_size):
+    """
+    Find every bit turned on in a set of frames
+
+    Parameters
+    ----------
+    frames : np.ndarray
+        2D array of frame words, as returned by read_frames
+    word_size : int
+        Number of bytes in each word in frame
+
+    Returns
+    -------
+    (frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Row in frames, word number and bit number (0 is the MSB of the word) of each bit turned on,
+        ordered by frame, then word, then bit
+    """
+    frame_idx, word = np.nonzero(frames)
+    vals = np.ascontiguousarray(frames[frame_idx, word]).astype(">u" + str(word_size))
+    row, bit = np.nonzero(np.unpackbits(vals.view(np.uint8).reshape(-1, word_size), axis=1))
+    return frame_idx[row], word[row], bit
+
+
 def print_frame (frame, addr,word_size):
     """
     Create list of frame bits turned on
@@ -40,181 +892,762 @@ def print_frame (frame, addr,word_size):
         List of bits that are turned on within frame, given as (wordNum, bit)
     """
     global bitstream_addr
-    frame_data = []
-    #print(addr,len(frame))
-    #print(frame)
-    for i in range(len(frame)):
-        if frame[i] != 0:
-            #print(bin(frame[i]))
-            val = bin(frame[i])
-            val = val.replace("\n","")
-            val = val.replace("0b","")
-            val = val.zfill(word_size*8)
-            #print("VAL",val)
-            for j in range(word_size*8):
-                if val[j] == '1':   
-                    frame_data.append((i,j))
-                    #print(i,j)
-            
-    #print(hex(addr) ,frame_data)
+    _, word, bit = decode_frames(np.array([frame], dtype=np.uint64), word_size)
     bitstream_addr.append(addr)
-    return frame_data
+    return list(zip(word.tolist(), bit.tolist()))
 
 
 def print_frame_usp (frame, addr,word_size):
     global bitstream_addr
     frame_data = []
-    #print(addr,len(frame))
-    #print(frame)
-    for i in range(len(frame)):
-        if frame[i] != 0:
-            #print(bin(frame[i]))
-            val = bin(frame[i])
-            val = val.replace("\n","")
-            val = val.replace("0b","")
-            val = val.zfill(word_size*8)
-            #print("VAL",val)
-            #for j in range(word_size*8):
-            #    if val[j] == '1':   
-            #frame_data.append((i,hex(int(val,2))))
-            frame_data.append((i,val))
-            #        #print(i,j)
-            
-    #print(hex(addr) ,frame_data)
+    for i in np.flatnonzero(frame).tolist():
+        frame_data.append((i,bin(frame[i])[2:].zfill(word_size*8)))
     bitstream_addr.append(addr)
     return frame_data
 
 
+def usp_word_offset(word, offset, words, parity):
+    """
+    Map a (16 bit) word of an ultrascale+ frame to a word offset within a tile
 
-def parse_bitstream(f, family, tilegrid,tile_type,specimen):
-    global bitstream_addr
-    bitstream_addr = []
-    if "uplus" in family:
-        write_instr = 0x3000405D
-        write_count = 186
-        word_size = 2
-    elif "u" in family:
-        write_instr = 0x3000407B
-        write_count = 123
-        word_size = 4
+    Ultrascale+ has a bit-twiddling operation that occurs on every pair of tiles within a column
+
+    Returns
+    -------
+    int
+        Word offset within the tile, or None if the word doesn't belong to the tile
+    """
+    if parity == "even":
+        if (offset <= word < offset+words-1):
+            return word-offset
+        elif word == offset+words:
+            return word-offset-1
+        return None
+    if (offset+1 <= word < offset+words) or word == offset-1:
+        word_offset = word-offset
     else:
-        write_instr = 0x30004065
-        write_count = 101
-        word_size = 4
-    
-    bitstream = {}
-    b = f.read(1)
-    while (b != 0xaa):
-        b = f.read(1)
-        b = int.from_bytes(b, 'big')
-    f.read(3)
-    count = 0
-    while (1):
-        count += 1
-        frame = []
-        inst = f.read(4)
-        if not inst:
+        return None
+    if word_offset % 2 == 0:
+        word_offset -= 2
+    else:
+        word_offset += 2
+    if word == offset+words-2:
+        word_offset = word-offset+1
+    return word_offset
+
+
+# Bump whenever the layout or meaning of the decode cache files changes
+DECODE_CACHE_VERSION = 3
+
+# Decoded bitstreams are only cached once set_decode_cache has been called
+decode_cache_dir = None
+decode_cache_size = 0
+
+
+def set_decode_cache(path, max_bytes):
+    """
+    Cache the bits decoded from bitstreams in a folder
+
+    Cache entries are keyed by the contents of the bitstream, the family and the tilegrid, so a bitstream that
+    has already been decoded is never decoded again.  When the folder grows past max_bytes the least recently
+    used entries are removed.
+
+    Parameters
+    ----------
+    path : str
+        Folder to keep the cache in
+    max_bytes : int
+        Maximum size of the cache, 0 turns the cache off
+    """
+    global decode_cache_dir, decode_cache_size
+    decode_cache_dir = path if max_bytes > 0 else None
+    decode_cache_size = max_bytes
+    if decode_cache_dir is not None:
+        os.makedirs(decode_cache_dir, exist_ok=True)
+
+
+def decode_cache_file_name(f, family, frame_counts, frame_ranges):
+    """
+    Cache file of a bitstream: the SHA-1 of the bitstream contents, the family, the frame counts of the tilegrid
+    and the frame ranges that were decoded
+    """
+    if isinstance(f, BitstreamFile):
+        digest = f.digest()
+    else:
+        file_name = f if isinstance(f, str) else f.name
+        if os.path.exists(file_name):
+            sha = hashlib.sha1()
+            with open(file_name, "rb") as fb:
+                for block in iter(lambda: fb.read(1 << 20), b""):
+                    sha.update(block)
+            digest = sha.hexdigest()
+        else:
+            # Compressed, or ingested into a frame store - the digest is still that of the bitstream itself
+            with open_bitstream(file_name, family) as bit_file:
+                digest = bit_file.digest()
+    ranges_key = 0
+    if frame_ranges is not None:
+        ranges_key = zlib.crc32(np.concatenate(frame_ranges).tobytes())
+    key = "%s.%s.%08x.%08x.%d" % (digest, family, frame_counts_key(frame_counts), ranges_key, DECODE_CACHE_VERSION)
+    return os.path.join(decode_cache_dir, key + ".npz")
+
+
+def evict_decode_cache():
+    """
+    Remove the least recently used decode cache entries until the cache fits in decode_cache_size
+    """
+    entries = []
+    for x in os.scandir(decode_cache_dir):
+        if x.name.endswith(".npz"):
+            try:
+                stat = x.stat()
+            except OSError:
+                # Removed by another process evicting at the same time
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, x.path))
+    total = sum(x[1] for x in entries)
+    for mtime, size, path in sorted(entries):
+        if total <= decode_cache_size:
             break
-        inst = int.from_bytes(inst, 'big')
-        frame_str = ""
-        if (inst == write_instr):
-            for i in range(write_count):
-                inst = int.from_bytes(f.read(word_size), 'big')
-                frame.append(inst)
-            #addr_comm = int.from_bytes(f.read(4), 'big')
-            f.read(4)
-            addr = int.from_bytes(f.read(4), 'big')
-            #f.read(8)
-            #crc_comm = int.from_bytes(f.read(4), 'big')
-            #crc = int.from_bytes(f.read(4), 'big')   
-            #0x82017f []
-            #0xc2017f []
-            if addr not in bitstream:
-                if "uplus" in family:
-                    bitstream[addr] = print_frame_usp(frame, addr,word_size)
-                else:
-                    bitstream[addr] = print_frame(frame, addr,word_size)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        total -= size
+
+
+# Smallest number of frames worth handing to a worker process
+DECODE_CHUNK_FRAMES = 2048
+
+
+def decode_chunk(args):
+    """
+    Find every bit turned on in a chunk of the frames of a bitstream - run in a worker process by decode_bits
+
+    The worker maps the bitstream itself, so the frame data is shared through the page cache rather than copied
+    to the worker.  Only the offsets of the chunk's frames are sent.
+
+    Returns
+    -------
+    (frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Bits turned on, as returned by decode_frames, with frame_idx counting from the first frame of the chunk
+    """
+    file_name, word_size, write_count, offsets = args
+    with open(file_name, "rb") as fb:
+        with mmap.mmap(fb.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            frames = gather_frames(data, offsets, word_size, write_count)
+            return decode_frames(frames, word_size)
+
+
+def decode_bits(f, family, tilegrid=None, processes=1, tile_types=None):
+    """
+    Find every bit turned on in a bitstream, using the decode cache if it is on (see set_decode_cache)
+
+    Parameters
+    ----------
+    f : file, str or BitstreamFile
+        Opened bitstream file (binary mode), or its name
+    family : str
+        FPGA architecture family
+    tilegrid : dict
+        Device tilegrid, used to follow multi-frame writes (see get_frame_counts)
+    processes : int
+        Number of processes to decode the frames in.  Large bitstreams (and multi-SLR ones) are split into chunks
+        of frames, which are decoded in parallel.
+    tile_types : [ str ]
+        Only decode the frames that configure tiles of these tile types (see get_frame_ranges), all frames by default
+
+    Returns
+    -------
+    addrs : np.ndarray (int64)
+        SLR-qualified frame address of each frame with bits turned on, in the order the frames were first written
+    (frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Bits turned on, as returned by decode_frames for addrs
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    frame_counts = get_frame_counts(tilegrid)
+    frame_ranges = None
+    if tile_types is not None:
+        frame_ranges = get_frame_ranges(tilegrid, tile_types)
+    cache_name = None
+    if decode_cache_dir is not None:
+        cache_name = decode_cache_file_name(f, family, frame_counts, frame_ranges)
+        try:
+            with np.load(cache_name) as cached:
+                decoded = cached["addrs"], cached["frame_idx"], cached["word"], cached["bit"]
+            # Touched so that eviction removes the least recently used entries first
+            os.utime(cache_name)
+            return decoded
+        except (OSError, ValueError, KeyError):
+            pass
 
+    bit_file = open_bitstream(f, family, frame_counts)
+    addrs = bit_file.addrs
+    if frame_ranges is None:
+        rows = np.arange(len(addrs))
+    else:
+        # Frames outside of the ranges are skipped without being read
+        starts, stops = frame_ranges
+        idx = np.searchsorted(starts, addrs, side="right") - 1
+        rows = np.flatnonzero((idx >= 0) & (addrs < stops[np.maximum(idx, 0)]))
+    # At least one chunk per SLR, and no more chunks than processes
+    n_slrs = len(np.unique(decode_far(addrs[rows], family)["slr"]))
+    n_chunks = min(processes, max(n_slrs, len(rows) // DECODE_CHUNK_FRAMES))
+    # Workers map the bitstream file, a compressed bitstream is decoded from the copy decompressed in memory
+    if n_chunks > 1 and bit_file.mapped:
+        bounds = np.linspace(0, len(rows), n_chunks+1).astype(np.int64)
+        chunks = [(bit_file.file_name, word_size, write_count, bit_file.offsets[rows[bounds[i]:bounds[i+1]]]) for i in range(n_chunks)]
+        with Pool(processes=n_chunks) as pool:
+            decoded = pool.map(decode_chunk, chunks)
+        # Chunks are in frame order, so the merged bits stay ordered by frame
+        frame_idx = np.concatenate([x[0] + bounds[i] for i, x in enumerate(decoded)])
+        word = np.concatenate([x[1] for x in decoded])
+        bit = np.concatenate([x[2] for x in decoded])
+    else:
+        frame_idx, word, bit = decode_frames(bit_file.frames(rows), word_size)
+    if bit_file is not f:
+        bit_file.close()
+    used, frame_idx = np.unique(frame_idx, return_inverse=True)
+    addrs = addrs[rows[used]]
+    frame_idx = frame_idx.astype(np.uint32)
+    word = word.astype(np.uint16)
+    bit = bit.astype(np.uint8)
+
+    if cache_name is not None:
+        write_decode_cache(cache_name, addrs, frame_idx, word, bit)
+    return addrs, frame_idx, word, bit
+
+
+def write_decode_cache(cache_name, addrs, frame_idx, word, bit):
+    """
+    Add decoded bits (as returned by decode_bits) to the decode cache
+    """
+    try:
+        tmp_name = cache_name + "." + str(os.getpid())
+        with open(tmp_name, "wb") as fc:
+            np.savez(fc, addrs=addrs, frame_idx=frame_idx, word=word, bit=bit)
+        os.replace(tmp_name, cache_name)
+        evict_decode_cache()
+    except OSError:
+        pass
 
 
+def bits_by_frame(addrs, frame_idx, word, bit, word_bits):
+    """
+    Group decoded bits by frame
+
+    Returns
+    -------
+    { int : ( [ int ], [ int ] ) }
+        Words and bit offsets (counting from the LSB of the word) of every bit turned on, keyed by frame address.
+        Frames with no bits turned on are left out.
+    """
+    bitstream = {}
+    addr_list = addrs.tolist()
+    bounds = np.searchsorted(frame_idx, np.arange(len(addrs)+1)).tolist()
+    word_list = word.tolist()
+    bit_list = (word_bits - 1 - bit.astype(np.int64)).tolist()
+    for i in np.unique(frame_idx).tolist():
+        bitstream[addr_list[i]] = (word_list[bounds[i]:bounds[i+1]], bit_list[bounds[i]:bounds[i+1]])
+    return bitstream
+
+
+def decode_bitstream(f, family, tilegrid, processes=1, tile_types=None):
+    """
+    Find every bit turned on in a bitstream, grouped by frame (see bits_by_frame)
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    return bits_by_frame(*decode_bits(f, family, tilegrid, processes, tile_types), word_size*8)
+
+
+def get_tile_bits(bitstream, family, tile, tile_info):
+    """
+    Bits turned on in one configuration bus of a tile
+
+    Parameters
+    ----------
+    bitstream : { int : ( [ int ], [ int ] ) }
+        Decoded bitstream, as returned by decode_bitstream
+    family : str
+        FPGA architecture family
+    tile : dict
+        Tilegrid entry of the tile
+    tile_info : dict
+        Entry of the configuration bus in tile["bits"]
+
+    Returns
+    -------
+    [ int ]
+        Bits turned on in the tile, given as bit ids (see bit_id)
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    word_bits = word_size*8
+    offset = tile_info['offset']
+    words = tile_info['words']
+    frames = tile_info['frames']
+    if frames == -1:
+        frames = 100 # If the frame count wasn't solved for, any value close to the minor address max will work
+            # since the "if Baseaddress+i in bitstream:" will catch it - 7 Series/ultra [6:0], ultra+ [7:0]
+    Baseaddress = int(tile_info['baseaddr'],16) | tile.get("SLR", 0) << 32
+    parity = "even"
+    mod_term = tile["HEIGHT"] / 3 * 2
+    if tile['Y'] % mod_term != 0:
+        parity = "odd"
+    tile_data = []
+    for i in range(frames):
+        if Baseaddress+i in bitstream:
+            w, b = bitstream[Baseaddress+i]
+            if "uplus" in family:
+                lo = bisect_left(w, offset-1)
+                hi = bisect_right(w, offset+words)
+                for j in range(lo, hi):
+                    word_offset = usp_word_offset(w[j], offset, words, parity)
+                    if word_offset is not None:
+                        tile_data.append(bit_id(i, word_offset*word_bits + b[j]))
+            else:
+                lo = bisect_left(w, offset)
+                hi = bisect_left(w, offset+words)
+                tile_data += [i << 16 | (w[j]-offset)*word_bits + b[j] for j in range(lo, hi)]
+    return tile_data
+
+
+# Bump whenever the layout or meaning of the .ownership.npz files changes
+OWNERSHIP_VERSION = 2
+CONFIG_BUSES = ["CLB_IO_CLK","BLOCK_RAM"]
+
+
+def ownership_file_name(tilegrid_file):
+    """
+    Name of the ownership map cached next to a tilegrid: "vivado_db/tilegrid.json" -> "vivado_db/tilegrid.ownership.npz"
+    """
+    if tilegrid_file.endswith(".json"):
+        tilegrid_file = tilegrid_file[:-5]
+    return tilegrid_file + ".ownership.npz"
+
+
+def build_ownership(tilegrid, family):
+    """
+    Map every configuration word of the device to the tiles that own it
+
+    Each configuration bus of a tile is a "slot".  Words can be owned by more than one slot (INT_L and CLBLL_L tiles
+    share frames, for example), so the map is a sorted multi-map from (frame address, word) to (slot, minor, local word).
+    The ultrascale+ word twiddling is applied when the map is built.
+
+    Parameters
+    ----------
+    tilegrid : dict
+        Device tilegrid
+    family : str
+        FPGA architecture family
+
+    Returns
+    -------
+    { str : np.ndarray }
+        keys - SLR-qualified frame address << 16 | word, sorted
+        slot, minor, local_word - owner of each key
+        slot_tile, slot_type, slot_bus - tile name, tile type and index into CONFIG_BUSES of each slot, in tilegrid order
+    """
+    keys, slot, minor, local_word = [], [], [], []
+    slot_tile, slot_type, slot_bus = [], [], []
+    for T in tilegrid:
+        if 'bits' not in tilegrid[T]:
+            continue
+        for bus_idx, config_bus in enumerate(CONFIG_BUSES):
+            if config_bus not in tilegrid[T]['bits']:
+                continue
+            tile_info = tilegrid[T]['bits'][config_bus]
+            offset = tile_info['offset']
+            words = tile_info['words']
+            frames = tile_info['frames']
+            if frames == -1:
+                frames = 100 # Same default as get_tile_bits
+            if "uplus" in family:
+                parity = "even"
+                mod_term = tilegrid[T]["HEIGHT"] / 3 * 2
+                if tilegrid[T]['Y'] % mod_term != 0:
+                    parity = "odd"
+                phys, local = [], []
+                for w in range(max(offset-1, 0), offset+words+1):
+                    word_offset = usp_word_offset(w, offset, words, parity)
+                    if word_offset is not None:
+                        phys.append(w)
+                        local.append(word_offset)
+                phys, local = np.array(phys, dtype=np.int64), np.array(local, dtype=np.int32)
+            else:
+                phys = np.arange(offset, offset+words, dtype=np.int64)
+                local = np.arange(words, dtype=np.int32)
+            frame_addrs = (int(tile_info['baseaddr'],16) | tilegrid[T].get("SLR", 0) << 32) + np.arange(frames, dtype=np.int64)
+            keys.append(((frame_addrs << 16)[:, None] | phys).ravel())
+            slot.append(np.full(frames*len(phys), len(slot_tile), dtype=np.int32))
+            minor.append(np.repeat(np.arange(frames, dtype=np.int16), len(phys)))
+            local_word.append(np.tile(local, frames))
+            slot_tile.append(T)
+            slot_type.append(tilegrid[T]["TYPE"])
+            slot_bus.append(bus_idx)
+
+    if len(keys) == 0:
+        keys, slot, minor, local_word = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int32)], \
+            [np.zeros(0, dtype=np.int16)], [np.zeros(0, dtype=np.int32)]
+    keys = np.concatenate(keys)
+    order = np.argsort(keys, kind="stable")
+    return {
+        "keys": keys[order],
+        "slot": np.concatenate(slot)[order],
+        "minor": np.concatenate(minor)[order],
+        "local_word": np.concatenate(local_word)[order],
+        "slot_tile": np.array(slot_tile, dtype=str),
+        "slot_type": np.array(slot_type, dtype=str),
+        "slot_bus": np.array(slot_bus, dtype=np.int8),
+    }
+
+
+_ownership_cache = {}
+
+def load_ownership(tilegrid_file, family, tilegrid=None):
+    """
+    Get the ownership map (see build_ownership) of the tilegrid in tilegrid_file
+
+    The map is cached next to the tilegrid (see ownership_file_name) and rebuilt whenever the tilegrid file changes.
+
+    Parameters
+    ----------
+    tilegrid_file : str
+        Path to tilegrid.json
+    family : str
+        FPGA architecture family
+    tilegrid : dict
+        Contents of tilegrid_file, if they are already loaded
+
+    Returns
+    -------
+    { str : np.ndarray }
+        Ownership map
+    """
+    stat = os.stat(tilegrid_file)
+    write_instr, write_count, word_size = get_frame_format(family)
+    key = np.array([OWNERSHIP_VERSION, word_size, "uplus" in family, stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+    cache_key = (os.path.abspath(tilegrid_file), tuple(key.tolist()))
+    if cache_key in _ownership_cache:
+        return _ownership_cache[cache_key]
+
+    ownership = None
+    own_name = ownership_file_name(tilegrid_file)
+    if os.path.exists(own_name):
+        try:
+            with np.load(own_name) as own:
+                if np.array_equal(own["key"], key):
+                    ownership = {x: own[x] for x in own.files if x != "key"}
+        except (OSError, ValueError, KeyError):
+            pass
+    if ownership is None:
+        if tilegrid is None:
+            with open(tilegrid_file) as fj:
+                tilegrid = json.load(fj)
+        ownership = build_ownership(tilegrid, family)
+        try:
+            tmp_name = own_name + "." + str(os.getpid())
+            with open(tmp_name, "wb") as fo:
+                np.savez(fo, key=key, **ownership)
+            os.replace(tmp_name, own_name)
+        except OSError:
+            pass
+    _ownership_cache[cache_key] = ownership
+    return ownership
+
+
+def scatter_bits(ownership, addrs, frame_idx, word, bit, word_bits, slots):
+    """
+    Assign decoded bits to the tiles that own them
+
+    Parameters
+    ----------
+    ownership : { str : np.ndarray }
+        Ownership map, see build_ownership
+    addrs : np.ndarray
+        Frame address of each frame
+    frame_idx, word, bit : np.ndarray
+        Decoded bits, as returned by decode_frames
+    word_bits : int
+        Number of bits in each word
+    slots : np.ndarray (bool)
+        Which slots of the ownership map to keep
+
+    Returns
+    -------
+    (slot, minor, local_bit) : ( np.ndarray, np.ndarray, np.ndarray )
+        Owner and bit offset within the owner of every bit, ordered by slot, then minor, then word and bit in the frame
+    """
+    own_keys = ownership["keys"]
+    keys = (addrs[frame_idx].astype(np.int64) << 16) | word
+    lo = np.searchsorted(own_keys, keys, side="left")
+    count = np.searchsorted(own_keys, keys, side="right") - lo
+    hit = np.repeat(np.arange(len(keys)), count)
+    entry = np.repeat(lo - (np.cumsum(count) - count), count) + np.arange(len(hit))
+    slot = ownership["slot"][entry]
+    keep = slots[slot]
+    hit, entry, slot = hit[keep], entry[keep], slot[keep]
+    minor = ownership["minor"][entry].astype(np.int64)
+    local_bit = ownership["local_word"][entry].astype(np.int64)*word_bits + (word_bits - 1 - bit[hit].astype(np.int64))
+    order = np.lexsort((bit[hit], word[hit], minor, slot))
+    return slot[order], minor[order], local_bit[order]
+
+
+def parse_bitstream_all(f, family, tilegrid, tile_types, specimen, ownership=None, processes=1):
+    """
+    Decode a bitstream once and get the bits of every tile of several tile types
+
+    Parameters
+    ----------
+    f : file, str or BitstreamFile
+        Opened bitstream file (binary mode), or its name
+    family : str
+        FPGA architecture family
+    tilegrid : dict
+        Device tilegrid
+    tile_types : [ str ]
+        Tile types to get the bits of
+    specimen : str
+        Specimen name used in the keys of the tile bit dictionaries
+    ownership : { str : np.ndarray }
+        Ownership map of tilegrid (see load_ownership).  Scattering the bits with it avoids walking the tilegrid.
+    processes : int
+        Number of processes to decode the frames in, see decode_bits
+
+    Returns
+    -------
+    { str : { str : [ int ] } }
+        tile_bit_dict of each tile type (as returned by parse_bitstream), keyed by tile type
+    """
+    type_bit_dict = {tile_type: {} for tile_type in tile_types}
+    if ownership is not None:
+        write_instr, write_count, word_size = get_frame_format(family)
+        addrs, frame_idx, word, bit = decode_bits(f, family, tilegrid, processes, tile_types)
+        slots = np.isin(ownership["slot_type"], list(tile_types))
+        slot, minor, local_bit = scatter_bits(ownership, addrs, frame_idx, word, bit, word_size*8, slots)
+        bounds = np.searchsorted(slot, np.arange(len(slots)+1)).tolist()
+        ids = (minor << 16 | local_bit).tolist()
+        slot_tile, slot_type, slot_bus = ownership["slot_tile"].tolist(), ownership["slot_type"].tolist(), ownership["slot_bus"].tolist()
+        for i in np.flatnonzero(slots).tolist():
+            tile_data = ids[bounds[i]:bounds[i+1]]
+            type_bit_dict[slot_type[i]][CONFIG_BUSES[slot_bus[i]][0:3]+"."+specimen+"."+slot_tile[i]] = tile_data
+        return type_bit_dict
+
+    bitstream = decode_bitstream(f, family, tilegrid, processes, tile_types)
+    for T in tilegrid:
+        if tilegrid[T]["TYPE"] in type_bit_dict:
+            if 'bits' in tilegrid[T]:
+                tile_bit_dict = type_bit_dict[tilegrid[T]["TYPE"]]
+                for config_bus in CONFIG_BUSES:
+                    if config_bus in tilegrid[T]['bits']:
+                        tile_data = get_tile_bits(bitstream, family, tilegrid[T], tilegrid[T]['bits'][config_bus])
+                        tile_bit_dict[config_bus[0:3]+"."+specimen+"."+T] = tile_data
+    return type_bit_dict
+
+
+_slot_last_cache = (None, None)
+
+def slot_last_addrs(ownership):
+    """
+    Highest frame address each slot of an ownership map has bits in
+
+    Returns
+    -------
+    np.ndarray (int64)
+        Frame address of each slot, -1 for slots without bits
+    """
+    global _slot_last_cache
+    if _slot_last_cache[0] is ownership["keys"]:
+        return _slot_last_cache[1]
+    last = np.full(len(ownership["slot_tile"]), -1, dtype=np.int64)
+    # Keys are sorted, so the last entry of a slot is the one with the highest address
+    slots, idx = np.unique(ownership["slot"][::-1], return_index=True)
+    last[slots] = ownership["keys"][len(ownership["keys"]) - 1 - idx] >> 16
+    _slot_last_cache = (ownership["keys"], last)
+    return last
+
+
+def iter_tile_bits(f, family, tilegrid, ownership, tile_types=None, processes=1, chunk_frames=DECODE_CHUNK_FRAMES):
+    """
+    Decode a bitstream a chunk of frames at a time, yielding the bits of each tile as soon as all of its frames are decoded
+
+    Frames are decoded in address order, and a tile is yielded once the highest frame address it has bits in has
+    been decoded, so only the bits of the tiles whose columns are partly decoded are held at any time - memory
+    stays flat however large the device is.  The decode cache (see decode_bits) is used the same way as by
+    decode_bits - on a miss only the compact arrays of decoded bits are kept, to add them to the cache at the end.
+
+    Parameters
+    ----------
+    f : file, str or BitstreamFile
+        Opened bitstream file (binary mode), or its name
+    family : str
+        FPGA architecture family
+    tilegrid : dict
+        Device tilegrid
+    ownership : { str : np.ndarray }
+        Ownership map of tilegrid, see load_ownership
+    tile_types : [ str ]
+        Only decode the frames of tiles of these tile types and yield those tiles, all tiles by default
+    processes : int
+        Number of processes to decode the chunks in, each worker maps the bitstream itself (see decode_chunk)
+    chunk_frames : int
+        Number of frames decoded at a time
+
+    Yields
+    ------
+    (tile, config_bus, tile_data) : ( str, str, [ int ] )
+        Tile name, configuration bus (one of CONFIG_BUSES) and bit ids turned on (as in the tile_bit_dict of
+        parse_bitstream_all) of every tile of tile_types, including tiles with no bits turned on
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    if tile_types is None:
+        slots = np.ones(len(ownership["slot_tile"]), dtype=bool)
+    else:
+        slots = np.isin(ownership["slot_type"], list(tile_types))
+    last = slot_last_addrs(ownership)
+    # Slots in the order they are complete
+    done_order = np.flatnonzero(slots)[np.argsort(last[slots], kind="stable")]
+    done_last = last[done_order]
+    slot_tile, slot_bus = ownership["slot_tile"], ownership["slot_bus"]
+
+    frame_counts = get_frame_counts(tilegrid)
+    frame_ranges = None if tile_types is None else get_frame_ranges(tilegrid, tile_types)
+    cache_name = None
+    cached = None
+    if decode_cache_dir is not None:
+        cache_name = decode_cache_file_name(f, family, frame_counts, frame_ranges)
+        try:
+            with np.load(cache_name) as c:
+                cached = c["addrs"], c["frame_idx"], c["word"], c["bit"]
+            os.utime(cache_name)
+        except (OSError, ValueError, KeyError):
+            pass
+    # Chunks decoded on a cache miss, to add them to the cache at the end
+    misses = []
+
+    bit_file = None
+    pool = None
+    try:
+        if cached is not None:
+            decoded = iter_cached_chunks(*cached, chunk_frames)
+        else:
+            bit_file = open_bitstream(f, family, frame_counts)
+            addrs = bit_file.addrs
+            rows = np.argsort(addrs, kind="stable")
+            if frame_ranges is not None:
+                starts, stops = frame_ranges
+                idx = np.searchsorted(starts, addrs[rows], side="right") - 1
+                rows = rows[(idx >= 0) & (addrs[rows] < stops[np.maximum(idx, 0)])]
+            chunks = [rows[i:i+chunk_frames] for i in range(0, len(rows), chunk_frames)]
+            if processes > 1 and len(chunks) > 1 and bit_file.mapped:
+                pool = Pool(processes=processes)
+                bits = pool.imap(decode_chunk, [(bit_file.file_name, word_size, write_count, bit_file.offsets[c]) for c in chunks])
+            else:
+                bits = (decode_frames(bit_file.frames(c), word_size) for c in chunks)
+            decoded = ((addrs[c],) + x for c, x in zip(chunks, bits))
+
+        pending = {}
+        n_done = 0
+        for chunk_addrs, frame_idx, word, bit in decoded:
+            if cached is None and cache_name is not None:
+                misses.append((chunk_addrs, frame_idx, word, bit))
+            slot, minor, local_bit = scatter_bits(ownership, chunk_addrs, frame_idx, word, bit, word_size*8, slots)
+            ids = minor << 16 | local_bit
+            firsts = np.flatnonzero(np.diff(slot, prepend=-1))
+            for s, piece in zip(slot[firsts].tolist(), np.split(ids, firsts[1:])):
+                pending.setdefault(s, []).append(piece)
+            n = int(np.searchsorted(done_last, chunk_addrs[-1], side="right"))
+            for s in done_order[n_done:n].tolist():
+                yield slot_tile[s], CONFIG_BUSES[slot_bus[s]], np.concatenate(pending.pop(s)).tolist() if s in pending else []
+            n_done = n
+        for s in done_order[n_done:].tolist():
+            yield slot_tile[s], CONFIG_BUSES[slot_bus[s]], np.concatenate(pending.pop(s)).tolist() if s in pending else []
+        if cached is None and cache_name is not None:
+            write_decode_cache(cache_name, *merge_decoded_chunks(bit_file.addrs, misses))
+    finally:
+        if pool is not None:
+            pool.terminate()
+        if bit_file is not None and bit_file is not f:
+            bit_file.close()
+
+
+def merge_decoded_chunks(all_addrs, chunks):
+    """
+    Merge the chunks decoded by iter_tile_bits into the layout of decode_bits, frames in the order they were first written
+
+    Parameters
+    ----------
+    all_addrs : np.ndarray (int64)
+        Address of every frame of the bitstream, in the order the frames were first written
+    chunks : [ (addrs, frame_idx, word, bit) ]
+        Frame addresses of each chunk and the bits decoded from them, with frame_idx counting from the first frame of the chunk
+    """
+    offsets = np.cumsum([0] + [len(x[0]) for x in chunks[:-1]])
+    addrs = np.concatenate([x[0] for x in chunks] + [np.zeros(0, dtype=np.int64)])
+    frame_idx = np.concatenate([x[1] + offsets[i] for i, x in enumerate(chunks)] + [np.zeros(0, dtype=np.int64)])
+    word = np.concatenate([x[2] for x in chunks] + [np.zeros(0, dtype=np.uint16)])
+    bit = np.concatenate([x[3] for x in chunks] + [np.zeros(0, dtype=np.uint8)])
+    used, frame_idx = np.unique(frame_idx, return_inverse=True)
+    # Order of the used frames in the bitstream
+    position = np.searchsorted(all_addrs[np.argsort(all_addrs, kind="stable")], addrs[used])
+    position = np.argsort(all_addrs, kind="stable")[position]
+    order = np.argsort(position, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    frame_idx = rank[frame_idx]
+    bit_order = np.argsort(frame_idx, kind="stable")
+    return (addrs[used][order], frame_idx[bit_order].astype(np.uint32), word[bit_order].astype(np.uint16),
+            bit[bit_order].astype(np.uint8))
+
+
+def iter_cached_chunks(addrs, frame_idx, word, bit, chunk_frames):
+    """
+    Split bits from the decode cache (see decode_bits) into chunks of frames in address order, for iter_tile_bits
+
+    Yields
+    ------
+    (addrs, frame_idx, word, bit) : ( np.ndarray, np.ndarray, np.ndarray, np.ndarray )
+        Frame addresses of the chunk, and the bits of those frames with frame_idx counting from the first frame of the chunk
+    """
+    order = np.argsort(addrs, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    # Bits reordered by the position of their frame in address order, keeping their order within a frame
+    rank = rank[frame_idx]
+    bit_order = np.argsort(rank, kind="stable")
+    rank, word, bit = rank[bit_order], word[bit_order], bit[bit_order]
+    for i in range(0, len(order), chunk_frames):
+        lo, hi = np.searchsorted(rank, [i, i+chunk_frames]).tolist()
+        yield addrs[order[i:i+chunk_frames]], rank[lo:hi] - i, word[lo:hi], bit[lo:hi]
+
+
+def parse_bitstream(f, family, tilegrid,tile_type,specimen,ownership=None):
+    if tilegrid is not None:
+        return parse_bitstream_all(f, family, tilegrid, [tile_type], specimen, ownership)[tile_type]
+    global bitstream_addr
+    write_instr, write_count, word_size = get_frame_format(family)
+    word_bits = word_size*8
+    addrs, frames = read_frames(f, family)
+    bitstream_addr = addrs.tolist()
+    frame_idx, word, bit = decode_frames(frames, word_size)
+    bitstream = bits_by_frame(addrs, frame_idx, word, bit, word_bits)
     tile_bit_dict = {}
     frame_dict = {}
-    if tilegrid is not None:
-        for T in tilegrid:
-            if tilegrid[T]["TYPE"] == tile_type:
-                if 'bits' in tilegrid[T]:
-                    for config_bus in ["CLB_IO_CLK","BLOCK_RAM"]:
-                        if config_bus in tilegrid[T]['bits']:
-                            tile_info = tilegrid[T]['bits'][config_bus]
-                            offset = tile_info['offset']
-                            words = tile_info['words']
-                            frames = tile_info['frames']
-                            if frames == -1:
-                                frames = 100 # If the frame count wasn't solved for, any value close to the minor address max will work
-                                    # since the "if Baseaddress+i in bitstream:" will catch it - 7 Series/ultra [6:0], ultra+ [7:0]
-                            Baseaddress = int(tile_info['baseaddr'],16)
-                            parity = "even"
-                            mod_term = tilegrid[T]["HEIGHT"] / 3 * 2
-                            #print(tilegrid[T]['Y'],mod_term )
-                            if tilegrid[T]['Y'] % mod_term != 0:
-                                parity = "odd"
-                                #print("ODD",tilegrid[T]['Y'])
-                            tile_data = []
-                            if "uplus" in family:
-                                # ultrascale+ has a bit-twiddling operation that occurs on every pair of tiles within a column
-                                for i in range(frames):
-                                    if Baseaddress+i in bitstream:
-                                        #print("DATA:",bitstream[Baseaddress+i])
-                                        if parity == "even":
-                                            for j in bitstream[Baseaddress+i]:
-                                                if (offset <= j[0] < offset+words-1):
-                                                    word_offset = j[0]-offset
-                                                elif j[0] == offset+words:
-                                                    word_offset = j[0]-offset-1
-                                                else:
-                                                    continue
-                                                for b in range(word_size*8):
-                                                    if j[1][b] == '1':   
-                                                        bit_offset = (word_offset*word_size*8) + (word_size*8 - b - 1)
-                                                        bit_str = str(i) + "_" + str(bit_offset)
-                                                        tile_data += [bit_str]
-                                        else:
-                                            for j in bitstream[Baseaddress+i]:
-                                                if (offset+1 <= j[0] < offset+words) or j[0] == offset-1:
-                                                    word_offset = j[0]-offset
-                                                else:
-                                                    continue
-                                                if word_offset % 2 == 0:
-                                                    word_offset -= 2
-                                                else:
-                                                    word_offset += 2
-                                                if j[0] == offset+words-2:
-                                                    word_offset = j[0]-offset+1
-                                                for b in range(word_size*8):
-                                                    if j[1][b] == '1':   
-                                                        bit_offset = (word_offset*word_size*8) + (word_size*8 - b - 1)
-                                                        bit_str = str(i) + "_" + str(bit_offset)
-                                                        tile_data += [bit_str]
-                            else:
-                                for i in range(frames):
-                                    if Baseaddress+i in bitstream:
-                                        #print("DATA:",bitstream[Baseaddress+i])
-                                        for j in bitstream[Baseaddress+i]:
-                                            if (offset <= j[0] < offset+words):
-                                                word_offset = ((j[0] - offset)*word_size*8) + (word_size*8 - j[1] - 1)
-                                                bit_str = str(i) + "_" + str(word_offset)
-                                                tile_data += [bit_str]
-                            tile_bit_dict[config_bus[0:3]+"."+specimen+"."+T] = tile_data
-        return tile_bit_dict
-    else: # Return just the base address with bits
-        for addr in bitstream:
-            base_addr = addr & 0xFFFFFF80
-            frame = addr & 0x7F
-            if base_addr not in tile_bit_dict:
-                tile_bit_dict[base_addr] = []
-                frame_dict[base_addr] = 0
-            if frame > frame_dict[base_addr]:
-                frame_dict[base_addr] = frame
-            for x in bitstream[addr]:
-                tile_bit_dict[base_addr] += [str(frame) + "_" + str(x)]
-        return tile_bit_dict, frame_dict
+    # Return just the base address with bits
+    base_addrs = column_base(addrs, family).tolist()
+    minors = decode_far(addrs, family)["minor"].tolist()
+    for i, addr in enumerate(bitstream_addr):
+        base_addr = base_addrs[i]
+        frame = minors[i]
+        if base_addr not in tile_bit_dict:
+            tile_bit_dict[base_addr] = []
+            frame_dict[base_addr] = 0
+        if frame > frame_dict[base_addr]:
+            frame_dict[base_addr] = frame
+        w, b = bitstream.get(addr, ([], []))
+        if "uplus" in family:
+            frame_data = [(x, bin(frames[i][x])[2:].zfill(word_bits)) for x in sorted(set(w))]
+        else:
+            frame_data = zip(w, (word_bits - 1 - x for x in b))
+        for x in frame_data:
+            tile_bit_dict[base_addr] += [str(frame) + "_" + str(x)]
+    return tile_bit_dict, frame_dict
@@ -22,22 +22,31 @@
 import json
 import os
 import argparse
+import re
 import sys
 import random
 import pickle
+import zlib
+import numpy as np
+from itertools import chain, groupby
+from operator import itemgetter
 #from bit_parser import print_frame
-from bit_parser import parse_bitstream
+from bit_parser import iter_tile_bits
+from bit_parser import load_ownership
+from bit_parser import set_decode_cache
+from bit_parser import ingest_bitstream
+from bit_parser import get_frame_counts
+from bit_parser import load_device_frame_counts
+from bit_parser import frame_counts_key, FRAME_INDEX_VERSION, DECODE_CACHE_VERSION, OWNERSHIP_VERSION
+from artifacts import artifact_exists, list_artifacts, open_artifact
+from bit_parser import bit_str, parse_bit_str
+from lut_equation import lut_init_from_equation, vivado_to_lut_equation, check_lut_equations, LUT_EQUATION_CASES
+from specimen_store import append_specimen, open_specimen_store, prepare_specimen_store, stored_specimens
+from functools import lru_cache
+from multiprocessing import Pool, current_process
 
-from jpype.types import *
 #import data_generator as dg
 
-from com.xilinx.rapidwright.device import Device
-from com.xilinx.rapidwright.device import Series
-from com.xilinx.rapidwright.design import Design
-from com.xilinx.rapidwright.design import Unisim
-from com.xilinx.rapidwright.design.tools import LUTTools
-luttools = LUTTools()
-
 ##==========================================##
 ##            DIFF ANALYSIS                 ##
 ##==========================================##
@@ -45,17 +54,120 @@ luttools = LUTTools()
 
 def load_pkl_obj(file_name):
     pkl_obj = {}
-    if os.path.exists(file_name):
-        with open(file_name, 'rb') as handle:
+    if artifact_exists(file_name):
+        with open_artifact(file_name, 'rb') as handle:
             pkl_obj = pickle.load(handle)
     return pkl_obj
 
 
 def save_pkl_obj(file_name, pkl_obj):
-    with open(file_name, 'wb') as handle:
+    with open_artifact(file_name, 'wb') as handle:
         pickle.dump(pkl_obj, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
 
+##==========================================##
+##            ANALYSIS STATE                ##
+##==========================================##
+
+
+# Bump whenever the contents or meaning of the analysis state change
+ANALYSIS_STATE_VERSION = 1
+ANALYSIS_STATE_DIR = "analysis_state"
+
+# State of the analysis of the run, carried over from one analysis to the next so only the tiles appended to the
+# specimen store since are folded in (see load_analysis_state)
+analysis_state = {}
+# Property rules (get_bits) of the last analysis, keyed by ( feature numbers, values ): ( bit set, { value : rules } )
+last_rules = {}
+# Keys of the tiles appended to the store since the last analysis
+new_tiles = set()
+
+
+def analysis_state_key():
+    """
+    What the state of an analysis was computed for: a state is only carried over to an analysis with the same key
+    """
+    return (tile_type, int(args.pips), args.family, tuple(specimen_store_key()))
+
+
+# Bump whenever parse_specimen changes what it stores for a specimen
+PARSED_SPECIMEN_VERSION = 1
+
+def specimen_store_key():
+    """
+    What the rows of the specimen store are parsed with: the versions of the parsers and of the bit decoder, the
+    family, the tilegrid file and the frame counts.  The store is parsed again when it changes (see
+    specimen_store.prepare_specimen_store).
+    """
+    stat = os.stat("vivado_db/tilegrid.json")
+    return [PARSED_SPECIMEN_VERSION, FRAME_INDEX_VERSION, DECODE_CACHE_VERSION, OWNERSHIP_VERSION,
+            zlib.crc32(args.family.encode()), stat.st_size, stat.st_mtime_ns, frame_counts_key(get_frame_counts(tilegrid))]
+
+
+def analysis_state_name():
+    return os.path.join("data", fuzz_path, ANALYSIS_STATE_DIR, tile_type + ".pkl")
+
+
+def load_analysis_state(store):
+    """
+    Load the state of the last analysis of the run into analysis_state, or start a new one
+
+    The state of the last analysis is only used if it was computed with the same analysis_state_key and from a
+    prefix of the tile rows of the store, and --full isn't set.
+
+    Keys of analysis_state
+    ----------------------
+    rows : int
+        Number of tile rows of the store the state was computed from
+    last_tile : str
+        Key of the last of those rows, to tell the store apart from one that was removed and parsed again
+    feature_ids, bit_ids : np.ndarray (int64)
+        Store ids of the features and of the bits, numbered in the order they are first seen (see condense_data)
+    always_on : { featureNum : setOfBits }
+        Bits on in every tile of each feature (see sensitivity_analysis)
+    rules : { ( featureNums, values ) : ( bitSet, { value : setOfRules } ) }
+        Rules of each property (see get_bits)
+    """
+    global analysis_state, last_rules, new_tiles
+    state = None
+    file_name = analysis_state_name()
+    if int(args.full) != 1 and os.path.exists(file_name):
+        with open(file_name, "rb") as handle:
+            state = pickle.load(handle)
+        rows = state.get("rows", 0)
+        if state.get("version") != ANALYSIS_STATE_VERSION or state.get("key") != analysis_state_key():
+            state = None
+        elif rows > len(store.tiles) or (rows > 0 and store.tiles[rows-1] != state["last_tile"]):
+            state = None
+    if state is None:
+        print("FULL ANALYSIS")
+        state = {"rows": 0, "last_tile": None, "feature_ids": np.zeros(0, dtype=np.int64),
+                 "bit_ids": np.zeros(0, dtype=np.int64), "always_on": {}, "rules": {}}
+    else:
+        print("FOLDING IN", len(store.tiles) - state["rows"], "OF", len(store.tiles), "TILES")
+    last_rules = state["rules"]
+    state["rules"] = {}
+    new_tiles = set(store.tiles[state["rows"]:])
+    analysis_state = state
+
+
+def save_analysis_state(store):
+    """
+    Save analysis_state as the state of the analysis of every tile row of the store
+    """
+    analysis_state["version"] = ANALYSIS_STATE_VERSION
+    analysis_state["key"] = analysis_state_key()
+    analysis_state["rows"] = len(store.tiles)
+    analysis_state["last_tile"] = store.tiles[-1] if store.tiles else None
+    file_name = analysis_state_name()
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+    # Written under another name first, so an interrupted save leaves the last state as it was
+    tmp_name = file_name + "." + str(os.getpid())
+    with open(tmp_name, "wb") as handle:
+        pickle.dump(analysis_state, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_name, file_name)
+
+
 def print_dict(dict_obj, f):
     if f == None:
         for F in dict_obj:
@@ -65,9 +177,26 @@ def print_dict(dict_obj, f):
             # for x in dict_obj[F]:
             print(F, dict_obj[F], file=f)
 
+def check_lut_equation_cases():
+    """
+    Check the pure Python LUT equation evaluator (lut_equation.py) against RapidWright's LUTTools
+
+    fuzzer.py starts the JVM, so every fuzzer run compares lut_equation.LUT_EQUATION_CASES with LUTTools before any
+    equation is turned into an INIT value, and stops with a ValueError if one doesn't match.
+    """
+    try:
+        from com.xilinx.rapidwright.design.tools import LUTTools
+    except ImportError:
+        print("RapidWright isn't loaded, LUT equations aren't checked against LUTTools")
+        return
+    mismatches = check_lut_equations(LUTTools(), LUT_EQUATION_CASES)
+    if mismatches:
+        raise ValueError("lut_equation.py doesn't match LUTTools:\n" + "\n".join(mismatches))
+    print("LUT EQUATIONS MATCH LUTTOOLS:", len(LUT_EQUATION_CASES), "cases")
+
+@lru_cache(maxsize=65536)
 def eqn_to_init(eqn):
     #print(eqn)
-    pin_map = {'A6': 'I5', 'A5': 'I4','A4': 'I3','A3': 'I2','A2': 'I1','A1': 'I0'}
     if "(0)" in eqn:
         eqn_str = "64\'h0"
     elif "(1)" in eqn:
@@ -79,20 +208,12 @@ def eqn_to_init(eqn):
         eqn_str = eqn.split("0x")[-1]
         eqn_str = "64\'h" + str(eqn_str)
     elif "O6=" in eqn: 
-        for key in pin_map.keys():
-            eqn = eqn.upper().replace(key, pin_map[key])
-        eqn = eqn.replace("O6=","O=")
-        eqn_str = luttools.getLUTInitFromEquation(eqn,6)
-        eqn_str = str(eqn_str)
+        eqn_str = lut_init_from_equation(vivado_to_lut_equation(eqn), 6)
     elif "O5=0x" in eqn:  
         eqn_str = eqn.split("0x")[-1]
         eqn_str = "32\'h" + str(eqn_str)
     elif "O5" in eqn:  
-        for key in pin_map.keys():
-            eqn = eqn.upper().replace(key, pin_map[key])
-        eqn = eqn.replace("O5=","O=")
-        eqn_str = luttools.getLUTInitFromEquation(eqn,5)
-        eqn_str = str(eqn_str)
+        eqn_str = lut_init_from_equation(vivado_to_lut_equation(eqn), 5)
     elif "64" in eqn:
         #print("Returning eqn str:",eqn)
         eqn_str = eqn
@@ -137,114 +258,231 @@ def parse_feature_file(f, specimen, tile_type):
     """
     print(f)
     tile_feature_dict = {}
-    content = f.readlines()
-    content = [x.strip() for x in content]
-    for line in content:
-        vals = line.split(":", 1)
-        # only grab features for target tile type
-        if tile_type + "_X" in vals[0]:
-            config_bus = "CLB"
-            if tile_type in ["BRAM_L", "BRAM_R", "BRAM"]:
-                vals2 = vals[1].split(":")
+    is_bram = tile_type in ["BRAM_L", "BRAM_R", "BRAM"]
+    # only grab features for target tile type - the other lines are skipped by the regex
+    lines = ft_line_pattern(tile_type).findall(f.read())
+    # The lines of a tile are next to each other, so most of the work is done a tile at a time
+    for tile, tile_lines in groupby(lines, itemgetter(0)):
+        values = list(map(itemgetter(1), tile_lines))
+        buses = ["CLB"]*len(values)
+        if is_bram:
+            for i, value in enumerate(values):
+                vals2 = value.split(":")
                 if len(vals2) == 5:
                     if "RAMB" in vals2[2]:
                         if "INIT" in vals2[3] and vals2[3] not in ["INIT_A", "INIT_B", "EN_SDBITERR_INIT_V6"]:
-                            config_bus = "BLO"
-            if config_bus+"."+specimen+"."+vals[0] not in tile_feature_dict:
-                tile_feature_dict[config_bus+"."+specimen+"."+vals[0]] = []
-            if "EQN" in vals[1]:
-                eqn = vals[1].rsplit(":",1)[-1]
-                init = eqn_to_init(vals[1].rsplit(":",1)[1])
-                vals[1] = vals[1].rsplit(":",1)[0] + ":" + init
-                #print(eqn,init,vals[1])
-            if "\'h" in vals[1]:
-                base, num = vals[1].rsplit(":", 1)
-                count, num = num.split("\'h")
-                num = int(num, 16)
-                mask = 1
-                for i in range(int(count)):
-                    if num & mask:
-                        tile_feature_dict[config_bus+"."+specimen+"."+vals[0]] += [config_bus[0]+":"+base+":["+str(i)+"]"]
-                    else:
-                        tile_feature_dict[config_bus+"."+specimen+"."+vals[0]] += [config_bus[0]+":"+base+":!["+str(i)+"]"]
-                    mask = mask << 1
-            elif "\'b" in vals[1]:
-                base, num = vals[1].rsplit(":", 1)
-                count, num = num.split("\'b")
-                num = int(num, 2)
-                mask = 1
-                for i in range(int(count)):
-                    if num & mask:
-                        tile_feature_dict[config_bus+"."+specimen+"."+vals[0]] += [config_bus[0]+":"+base+":["+str(i)+"]"]
-                    else:
-                        tile_feature_dict[config_bus+"."+specimen+"."+vals[0]] += [config_bus[0]+":"+base+":!["+str(i)+"]"]
-                    mask = mask << 1
-            else:
-                tile_feature_dict[config_bus+"."+specimen +"."+vals[0]] += [config_bus[0]+":"+vals[1]]
+                            buses[i] = "BLO"
+        for config_bus in dict.fromkeys(buses):
+            bus_values = values if "BLO" not in buses else [v for v, b in zip(values, buses) if b == config_bus]
+            cache = _feature_cache.setdefault(config_bus[0], {})
+            features = list(map(cache.get, bus_values))
+            if None in features:
+                features = [x if x is not None else expand_feature(config_bus[0], v) for x, v in zip(features, bus_values)]
+            tile_feature_dict.setdefault(config_bus+"."+specimen+"."+tile, []).extend(chain.from_iterable(features))
 
     # Combine 5LUT and 6LUT properties
     if "CLB" in tile_type or "CLE" in tile_type:
         for T in tile_feature_dict:
-            #print("DATA:",tile_feature_dict[T])
-            tmp = tile_feature_dict[T].copy()
-            for F in tile_feature_dict[T]:
-                if "5LUT" in F and "EQN" in F:
-                    #print("\tHas 5lut:",F)
-                    bus, site, site_type, bel, config, val = F.split(":")
-                    bel6 = bel.replace("5","6")
-                    new_val = ":".join([bus, site, site_type, bel6, config, val])
-                    old_vals = []
-                    if "!" in val:
-                        old_vals.append(":".join([bus, site, site_type, bel6, config, val.replace("!","")]))
-                        old_vals.append(":".join([bus, site, site_type, bel6, config, val]))
-                        old_vals.append(F)
-                    else:
-                        old_vals.append(":".join([bus, site, site_type, bel6, config, "!" + val]))
-                        old_vals.append(":".join([bus, site, site_type, bel6, config, val]))
-                        old_vals.append(F)
-                    #print("VALS:",old_vals,new_val)
-                    for x in old_vals:
-                        if x in tmp:
-                            tmp.remove(x)
-                    if new_val not in tmp:
-                        tmp.append(new_val)
-            tile_feature_dict[T] = tmp.copy()
-            #print("\tNew data:",tile_feature_dict[T])
+            tile_feature_dict[T] = combine_lut_features(tile_feature_dict[T])
     return tile_feature_dict
 
 
-def parse_files():
+# Features of every value of a .ft line that isn't expanded bit by bit, keyed by bus and then value
+_feature_cache = {}
+# Features of each bit of a wide value, keyed by (bus, property, width): one ( "!" feature, feature ) pair per bit
+_bit_feature_cache = {}
+
+
+_ft_line_patterns = {}
+
+def ft_line_pattern(tile_type):
     """
-    Load bitstreams, feature file contents into data structures and then write .pkl files containing both
-    bitstream and feature file info.
+    Regex matching the (stripped) lines of a .ft file whose tile name, before the first ":", contains tile_type + "_X"
+
+    Groups are the tile name and the rest of the line.
     """
-    global fuzz_path
-    file_count = 0
-    fileList = os.listdir("data/" + fuzz_path + "/")
-    for file in sorted(fileList):
-        # Parse just bitstream files
-        if ".tile" not in file and ".bit" in file and ".dcp" not in file:
-            print(file)
-            file_count += 1
+    if tile_type not in _ft_line_patterns:
+        ws = r"[ \t\r\f\v]*"
+        tile = r"([^:\n]*?" + re.escape(tile_type + "_X") + r"[^:\n]*)"
+        _ft_line_patterns[tile_type] = re.compile("^" + ws + tile + r":((?:[^\n]*\S)?)" + ws + "$", re.M)
+    return _ft_line_patterns[tile_type]
+
+
+def intern_feature(F):
+    """
+    The one copy of a feature string this process keeps (sys.intern), so every specimen parsed shares it
+
+    Only saves memory, feature ids are given by the specimen store's vocabulary (see specimen_store.append_specimen).
+    """
+    return sys.intern(F)
+
 
-            # Parse Bitstream
-            if int(args.pips) == 1:
-                specimen, tile_type, pip_ext, ext = file.split(".")
+def expand_feature(bus, value):
+    """
+    Features of the value part of a .ft line ("site:site_type:bel:property:value", or "Tile_Pip:pip")
+
+    LUT equations are converted to INIT values, and hex ('h) and binary ('b) values are expanded into one feature
+    per bit: "bus:property:[i]" for the bits that are set and "bus:property:![i]" for the others.
+
+    Returns
+    -------
+    [ str ]
+        Features, interned (see intern_feature)
+    """
+    if "EQN" in value:
+        head, eqn = value.rsplit(":", 1)
+        value = head + ":" + eqn_to_init(eqn)
+    if "\'h" in value or "\'b" in value:
+        base, num = value.rsplit(":", 1)
+        if "\'h" in value:
+            count, num = num.split("\'h")
+            num = int(num, 16)
+        else:
+            count, num = num.split("\'b")
+            num = int(num, 2)
+        count = int(count)
+        pairs = _bit_feature_cache.get((bus, base, count))
+        if pairs is None:
+            pairs = []
+            for i in range(count):
+                neg = intern_feature(bus+":"+base+":!["+str(i)+"]")
+                pos = intern_feature(bus+":"+base+":["+str(i)+"]")
+                pairs.append({"0": neg, "1": pos})
+            _bit_feature_cache[(bus, base, count)] = pairs
+        # LSB first, as many bits as the value is wide
+        bits = bin(num & ((1 << count) - 1))[2:].zfill(count)[::-1]
+        return [p[b] for p, b in zip(pairs, bits)]
+    cache = _feature_cache.setdefault(bus, {})
+    if value not in cache:
+        cache[value] = [intern_feature(bus+":"+value)]
+    return cache[value]
+
+
+def combine_lut_features(features):
+    """
+    Replace the 5LUT INIT bits of a CLB tile with the matching 6LUT INIT bits, dropping the 6LUT bits they replace
+
+    Returns
+    -------
+    [ str ]
+        The features in their original order, with the 6LUT features that replace 5LUT features appended
+    """
+    if not any("5LUT" in F for F in features):
+        return list(features)
+    tmp = list(features)
+    alive = [True]*len(tmp)
+    # Positions of the live copies of each feature, in list order
+    positions = {}
+    for i, F in enumerate(tmp):
+        positions.setdefault(F, []).append(i)
+    for F in features:
+        if "5LUT" in F and "EQN" in F:
+            bus, site, site_type, bel, config, val = F.split(":")
+            bel6 = bel.replace("5","6")
+            new_val = ":".join([bus, site, site_type, bel6, config, val])
+            old_vals = []
+            if "!" in val:
+                old_vals.append(":".join([bus, site, site_type, bel6, config, val.replace("!","")]))
+                old_vals.append(":".join([bus, site, site_type, bel6, config, val]))
+                old_vals.append(F)
             else:
-                specimen, tile_type, site_index, site_type, bel, primitive, ext = file.split(".")
-            f = open("data/" + fuzz_path + "/" + file, "rb")
-            tile_bit_dict = parse_bitstream(f, args.family, tilegrid, tile_type, fuzz_path + "." + specimen)
-            print("PARSED BIT")
-            f.close()
+                old_vals.append(":".join([bus, site, site_type, bel6, config, "!" + val]))
+                old_vals.append(":".join([bus, site, site_type, bel6, config, val]))
+                old_vals.append(F)
+            for x in old_vals:
+                if positions.get(x):
+                    alive[positions[x].pop(0)] = False
+            if not positions.get(new_val):
+                positions.setdefault(new_val, []).append(len(tmp))
+                tmp.append(new_val)
+                alive.append(True)
+    return [F for F, a in zip(tmp, alive) if a]
+
+
+def parse_specimen(file):
+    """
+    Parse the bitstream and the feature file of a specimen
 
-            # Parse Feature file
-            f = open("data/" + fuzz_path + "/" + file.replace(".bit", '.ft'))
-            tile_feature_dict = parse_feature_file(f, fuzz_path + "." + specimen, tile_type)
-            print("PARSED FEATURE")
-            f.close()
+    Run in the worker processes of parse_files, which inherit the globals of the analysis.
 
-            # Write out pkl file consisting of [ parsedFeatures, bitstreamFeatures ]
-            save_pkl_obj("data/" + fuzz_path + "/" + file.replace("bit","pkl"), [tile_feature_dict, tile_bit_dict])
+    Parameters
+    ----------
+    file : str
+        Name of the specimen's bitstream in the data folder of the run, Ex.: "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.bit"
+
+    Returns
+    -------
+    (file, tile_feature_dict, tile_bit_dict)
+        The features and the bits of each tile of the specimen (see parse_feature_file)
+    """
+    global parsed_count
+    if int(args.pips) == 1:
+        specimen, tile_type, pip_ext, ext = file.split(".")
+    else:
+        specimen, tile_type, site_index, site_type, bel, primitive, ext = file.split(".")
+
+    # Parse Bitstream
+    bit_file_name = "data/" + fuzz_path + "/" + file
+    tile_bit_dict = {}
+    for T, config_bus, tile_data in iter_tile_bits(bit_file_name, args.family, tilegrid, ownership, [tile_type]):
+        tile_bit_dict[config_bus[0:3] + "." + fuzz_path + "." + specimen + "." + T] = tile_data
+
+    # Parse Feature file
+    f = open_artifact("data/" + fuzz_path + "/" + file.replace(".bit", '.ft'))
+    tile_feature_dict = parse_feature_file(f, fuzz_path + "." + specimen, tile_type)
+    f.close()
+    parsed_count += 1
+    print(current_process().name, "PARSED", file, "(" + str(parsed_count), "in this process)")
+    return file, tile_feature_dict, tile_bit_dict
+
+
+# Number of specimens parse_specimen has parsed in this process
+parsed_count = 0
+
+
+def parse_files():
+    """
+    Load bitstreams, feature file contents into data structures and then append both the bitstream and the feature
+    file info to the specimen store of the run (see specimen_store.py).  Specimens already in the store are skipped,
+    unless the store was parsed with another specimen_store_key or --full is set, which parse the run again.
+
+    The specimens are parsed in --parallel processes, and appended to the store by this process in the order of
+    their file names, so the store is the same however many processes parse it.
+    """
+    global fuzz_path
+    files = []
+    seen = set()
+    fileList = list_artifacts("data/" + fuzz_path + "/")
+    prepare_specimen_store("data/" + fuzz_path, specimen_store_key(), int(args.full) == 1)
+    stored = stored_specimens("data/" + fuzz_path)
+    for file in fileList:
+        # Specimens already ingested into the frame store are parsed through their manifest
+        if file.endswith(".fman.npz"):
+            file = file.replace(".fman.npz", ".bit")
+        # Parse just bitstream files
+        if ".tile" not in file and ".bit" in file and ".dcp" not in file and file not in seen:
+            seen.add(file)
+            bit_file_name = "data/" + fuzz_path + "/" + file
+            if int(args.frame_store) == 1 and artifact_exists(bit_file_name):
+                ingest_bitstream(bit_file_name, args.family, get_frame_counts(tilegrid))
+            if file in stored:
+                print(file, "ALREADY STORED")
+                continue
+            files.append(file)
+    files.sort()
+
+    processes = min(max(int(args.parallel), 1), len(files))
+    print("PARSING", len(files), "SPECIMENS IN", processes, "PROCESSES")
+    pool = Pool(processes=processes) if processes > 1 else None
+    try:
+        parsed = pool.imap(parse_specimen, files) if pool is not None else map(parse_specimen, files)
+        for file_count, (file, tile_feature_dict, tile_bit_dict) in enumerate(parsed, 1):
+            # Append [ parsedFeatures, bitstreamFeatures ] to the specimen store
+            append_specimen("data/" + fuzz_path, file, tile_feature_dict, tile_bit_dict)
+            print("STORED", file, "(" + str(file_count) + "/" + str(len(files)) + ")")
+    finally:
+        if pool is not None:
+            pool.terminate()
 
 
 def get_solved_bel_bits(bel_dict,tile_type):
@@ -255,8 +493,8 @@ def get_solved_bel_bits(bel_dict,tile_type):
             tile_bel_dict = json.load(fj) 
             fj.close()
             bel_bits |= get_solved_bel_bits(tile_bel_dict,x)
-        bel_bits |= {"0_48","0_12","0_16","0_44","0_36","0_52","0_56","0_32","0_8","0_16","0_0","0_4","0_20","0_24","0_28"}
-        bel_bits |= {"1_3","1_7","1_19","1_47","1_39","1_51","1_55","1_35","1_15","1_31","1_11", "1_43","1_59","1_27","1_23"}
+        bel_bits |= set(map(parse_bit_str, ["0_48","0_12","0_16","0_44","0_36","0_52","0_56","0_32","0_8","0_16","0_0","0_4","0_20","0_24","0_28"]))
+        bel_bits |= set(map(parse_bit_str, ["1_3","1_7","1_19","1_47","1_39","1_51","1_55","1_35","1_15","1_31","1_11", "1_43","1_59","1_27","1_23"]))
     else:
         bel_bits = set()
         if (type(bel_dict) is dict):
@@ -267,14 +505,23 @@ def get_solved_bel_bits(bel_dict,tile_type):
                     bel_bits |= get_solved_bel_bits(bel_dict[key],tile_type)
         elif (type(bel_dict) is list):
             for x in bel_dict:
-                bel_bits |= set(b.replace("!","") for b in x)
+                bel_bits |= set(parse_bit_str(b.replace("!","")) for b in x)
     return bel_bits
 
 
 
-def condense_data():
+def condense_data(store):
     """
-    Process all the data in all the .pkl files into a different set of data strucutures
+    Process all the data in the specimen store of the run into a different set of data strucutures, in one pass
+
+    Features and bits already numbered by the last analysis (see load_analysis_state) keep their numbers, and the
+    ones first seen in the tiles appended since are numbered after them, which numbers them as a single pass over
+    the whole store would.
+
+    Parameters
+    ----------
+    store : SpecimenStore
+        Specimen store of the run
 
     Returns
     -------
@@ -282,14 +529,14 @@ def condense_data():
         A list of ALL the features turned on across ALL the tiles in ALL the specimens
         [ 'C:1:DSP48E1:CARRYININV:CARRYIN', 'C:Tile_Pip:DSP_R.DSP_IMUX44_0->DSP_1_A22', ...]
     bits : list
-        A list of ALL the bits turned on across ALL the tiles in ALL the specimens
-        [ '27_288', '27_19', 24_219', ...]
+        A list of ALL the bits turned on across ALL the tiles in ALL the specimens, as bit ids (see bit_parser.bit_id)
+        [ 1769760, 1769491, 1573083, ...]       ('27_288', '27_19', '24_219', ...)
     feature_dict: dict
         Mapping from feature name to feature number where feature number corresponds to index in 'features' list.
         { 'C:1:DSP48E1:CARRYININV:CARRYIN': 0, 'C:Tile_Pip:DSP_R.DSP_IMUX44_0->DSP_1_A22': 1, ...}
     bit_dict: dict
-        Mapping from bit name to bit number where bit number corresdponds to index in 'bits' list.
-        { '27_288': 0, '26_43': 1, ... }
+        Mapping from bit id to bit number where bit number corresdponds to index in 'bits' list.
+        { 1769760: 0, 1703979: 1, ... }
     tile_data : dict
         For a given tile, lists all the bits turned on in it and the features configured in it.
         { 'CLB.0005.0.DSP_R_X9Y95' : 
@@ -305,74 +552,134 @@ def condense_data():
         }
     """
     global feature_dict,tile_data_rev
-    fileList = os.listdir("data/" + fuzz_path + "/")
-    features = set()
-    bits = set()
-    data = {}
     tile_data = {}
-    
-    # Create the features and bits data structures (see description in docstring above)
-    for file in sorted(fileList):
-        if ".pkl" in file:
-            tile_feature_dict, tile_bit_dict = load_pkl_obj("data/" + fuzz_path + "/" + file)
-            #print("OUTPUT:",tile_feature_dict)
-            #print("BIT:",tile_bit_dict)
-            for x in tile_feature_dict:
-                features = features | set(tile_feature_dict[x])
-                bits |= set(tile_bit_dict[x])
-
-    # TODO The next 6 lines of code are iterating across sets (which are unordered).
-    # This assumes the enumerate ordering in the for loops will be the same order they end up in 25 lines below 
-    # when they are turned into lists.
-    # Shouldn't the conversion to lists happen before the next 6 lines of code?
-    features = list(features)
-    bits = list(bits)
-    feature_dict = {}
-    bit_dict = {}
+
+    # Create the features and bits data structures (see description in docstring above) in one pass over the
+    # columns of the store, numbering the features and bits in the order they are first seen
+    rows = analysis_state["rows"]
+    feature_ids, feature_nums = extend_first_seen_ids(store.feature_ids, analysis_state["feature_ids"], int(store.feature_ptr[rows]))
+    bit_ids, bit_nums = extend_first_seen_ids(store.bit_ids, analysis_state["bit_ids"], int(store.bit_ptr[rows]))
+    analysis_state["feature_ids"] = feature_ids
+    analysis_state["bit_ids"] = bit_ids
+    features = [store.feature_names[i] for i in feature_ids.tolist()]
+    bits = bit_ids.tolist()
     # Make mappings from feature names to feature numbers
     # E.g. feature_dict['C:1:DSP48E1:CARRYININV:CARRYIN'] = 0, feature_dict['C:Tile_Pip:DSP_R.DSP_IMUX44_0->DSP_1_A22'] = 1, ...
-    for i,f in enumerate(features):
-        feature_dict[f] = i
-    # Make mappings from bit names to bit numbers
-    # E.g. bit_dict['27_288'] = 0, bit_dict['26_43'] = 1, ...
-    for i,b in enumerate(bits):
-        bit_dict[b] = i
+    feature_dict = {f: i for i, f in enumerate(features)}
 
     # Create the tile_data data structure (see description in docstring above)
-    for file in sorted(fileList):
-        if ".pkl" in file:
-            tile_feature_dict, tile_bit_dict = load_pkl_obj("data/" + fuzz_path + "/" + file)
-            for x in tile_feature_dict:
-                #print("\t",x)
-                tile_data[x] = {}
-                tile_data[x]["bits"] = []
-                tile_data[x]["features"] = []
-                for y in tile_feature_dict[x]:
-                    tile_data[x]["features"].append(feature_dict[y])
-                for y in tile_bit_dict[x]:
-                    tile_data[x]["bits"].append(bit_dict[y])
-    #features = list(features)
-    #bits = list(bits)
-
-    # Create the tile_data_rev data structure (see desciption in docstring above)
+    feature_rows = np.split(feature_nums, store.feature_ptr[1:-1])
+    bit_rows = np.split(bit_nums, store.bit_ptr[1:-1])
+    for row, x in enumerate(store.tiles):
+        tile_data[x] = {"bits": bit_rows[row].tolist(), "features": feature_rows[row].tolist()}
+
+    # Create the tile_data_rev data structure (see desciption in docstring above): the tiles of each feature, in
+    # the order of the tiles, from a stable sort of the features of every tile
+    entry_rows = np.repeat(np.arange(len(store.tiles)), np.diff(store.feature_ptr))
+    order = np.argsort(feature_nums, kind="stable")
+    bounds = np.searchsorted(feature_nums[order], np.arange(len(features) + 1))
+    entry_rows = entry_rows[order].tolist()
     tile_data_rev = {}
     for x in range(len(features)):
-        tile_data_rev[x] = []
+        tile_data_rev[x] = [store.tiles[r] for r in entry_rows[bounds[x]:bounds[x+1]]]
 
-    for x in tile_data:   # Ex.: 'CLB.0005.0.DSP_R_X9Y195'
-        for y in tile_data[x]["features"]:
-            tile_data_rev[y] += [x]    
+    return tile_data, features, bits, feature_dict, tile_data_rev
 
-    #for x in tile_data_rev:
-    #    print(x,tile_data_rev[x])
 
-    return tile_data, features, bits, feature_dict, tile_data_rev
+def first_seen_ids(values):
+    """
+    Number the distinct values of an array in the order they are first seen
+
+    Returns
+    -------
+    distinct : np.ndarray
+        The distinct values, in the order they are first seen
+    nums : np.ndarray (int64)
+        Number of each value, its index in distinct
+    """
+    values = np.asarray(values, dtype=np.int64)
+    if len(values) == 0:
+        return values, values
+    lo = values.min()
+    span = values.max() - lo + 1
+    if span > max(len(values), 2**16):
+        distinct, first, inverse = np.unique(values, return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        return distinct[order], rank[inverse.ravel()]
+    # Ids (feature ids of the store, bit ids) are dense enough to index a table of the first position of each value
+    first = np.full(span, len(values), dtype=np.int64)
+    np.minimum.at(first, values - lo, np.arange(len(values)))
+    present = np.flatnonzero(first < len(values))
+    order = present[np.argsort(first[present])]
+    rank = np.empty(span, dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    return order + lo, rank[values - lo]
+
+
+def extend_first_seen_ids(values, seen, start):
+    """
+    first_seen_ids of an array whose first start entries have already been numbered
+
+    Parameters
+    ----------
+    values : np.ndarray
+        Values to number
+    seen : np.ndarray
+        The distinct values of values[:start], in the order they are first seen
+
+    Returns
+    -------
+    distinct : np.ndarray
+        seen, then the values first seen after start, in the order they are first seen
+    nums : np.ndarray (int64)
+        Number of each value, its index in distinct
+    """
+    if len(seen) == 0:
+        return first_seen_ids(values)
+    values = np.asarray(values, dtype=np.int64)
+    added = first_seen_ids(values[start:])[0]
+    distinct = np.concatenate((seen, added[~np.isin(added, seen)]))
+    order = np.argsort(distinct, kind="stable")
+    return distinct, order[np.searchsorted(distinct[order], values)]
+
+
+def list_rows(lists):
+    """
+    Row of each entry of a list of lists, Ex.: list_rows([[7, 8], [], [9]]) -> [0, 0, 2]
+    """
+    return np.repeat(np.arange(len(lists)), [len(x) for x in lists])
+
+
+def packed_matrix(rows, cols, n_rows, n_cols, chunk_bytes=2**25):
+    """
+    Boolean matrix with the (rows[i], cols[i]) entries set, packed 8 columns to a byte as by np.packbits
+
+    Built a chunk of rows at a time, so the unpacked matrix is never held in memory.
+    """
+    packed = np.zeros((n_rows, (n_cols + 7) // 8), dtype=np.uint8)
+    if np.any(rows[1:] < rows[:-1]):
+        order = np.argsort(rows, kind="stable")
+        rows, cols = rows[order], cols[order]
+    step = max(1, chunk_bytes // max(n_cols, 1))
+    for start in range(0, n_rows, step):
+        lo, hi = np.searchsorted(rows, [start, start + step])
+        dense = np.zeros((min(step, n_rows - start), n_cols), dtype=bool)
+        dense[rows[lo:hi] - start, cols[lo:hi]] = True
+        packed[start:start + len(dense)] = np.packbits(dense, axis=1)
+    return packed
 
 
 def sensitivity_analysis(tile_data):
     """
     Create list of bits always ON for each feature.
 
+    The bits of the tiles and the tiles of the features are held as packed bit matrices, so the bits always on for a
+    feature are an AND-reduction over the rows of the tiles it is on in.  Only the tiles appended to the store since
+    the last analysis are reduced, and ANDed into the bits always on for each feature in the earlier tiles, which are
+    kept in analysis_state["always_on"].
+
     Parameters
     ----------
     tile_data : dict
@@ -393,39 +700,37 @@ def sensitivity_analysis(tile_data):
     """
     global tile_type, features, bits, tile_data_rev, args
     solved_feature_dict = {}
-    
-    # 1. foreach feature, initialize solved_feature_dict with first tile's set of bits on for that feature
+    always_on = analysis_state["always_on"]
+    tiles = list(tile_data)[analysis_state["rows"]:]
+    tile_bits = [tile_data[T]["bits"] for T in tiles]
+    tile_features = [tile_data[T]["features"] for T in tiles]
+    # Row T of bit_matrix has the bits on in tile T, row F of feature_matrix has the tiles feature F is on in
+    bit_matrix = packed_matrix(list_rows(tile_bits), np.fromiter(chain.from_iterable(tile_bits), np.int64), len(tiles), len(bits))
+    feature_matrix = packed_matrix(np.fromiter(chain.from_iterable(tile_features), np.int64), list_rows(tile_features), len(features), len(tiles))
+    is_bram = tile_type in ["BRAM_L", "BRAM_R", "BRAM"]
+    if is_bram:
+        tile_bus = np.array([ord(T[0]) for T in tiles])
+
     for F in tile_data_rev:
-        print("INIT",F,features[F],tile_data_rev[F][0],list(bits[b] for b in tile_data[tile_data_rev[F][0]]["bits"]))
-        solved_feature_dict[F] = set(tile_data[tile_data_rev[F][0]]["bits"])
-
-    # 2. Find 'always on' bits by AND-ing rest of bits found when that feature is on
-    if tile_type in ["BRAM_L", "BRAM_R", "BRAM"]:
-        # if it is a bram, the bus needs to match
-        for T in tile_data:
-            bit_set = set(tile_data[T]["bits"])
-            for F in tile_data[T]["features"]:
-                if features[F][0] == T[0]:
-                    solved_feature_dict[F] = solved_feature_dict[F] & bit_set
-    else:
-        for T in tile_data:
-            # Get a set of all bits turned on in a tile.  Ex.: the bits in 'CLB.0005.0.DSP_R_X9Y195'
-            bit_set = set(tile_data[T]["bits"])
-            for F in tile_data[T]["features"]:
-                #if "INT_L.SS6END2->>WW2BEG2" in features[F]:
-                #    print("AND",solved_feature_dict[F],bit_set)
-
-                # Foreach feature, perform AND of new bits with initialized mask from above
-                # When done, this leaves behind all the bits that are ALWAYS on when a particular feature is present
-                solved_feature_dict[F] = solved_feature_dict[F] & bit_set
-    
+        rows = np.flatnonzero(np.unpackbits(feature_matrix[F], count=len(tiles)))
+        if is_bram:
+            # if it is a bram, the bus needs to match - except for the first tile, which the bits start from
+            # (for a feature already in always_on, the first tile was in an earlier analysis)
+            matching = rows[tile_bus[rows] == ord(features[F][0])]
+            rows = matching if F in always_on else np.concatenate((rows[:1], matching))
+        if len(rows) > 0:
+            # AND of the bits of every tile the feature is on in: the bits that are ALWAYS on when the feature is present
+            on = set(np.flatnonzero(np.unpackbits(np.bitwise_and.reduce(bit_matrix[rows], axis=0), count=len(bits))).tolist())
+            always_on[F] = always_on[F] & on if F in always_on else on
+        solved_feature_dict[F] = set(always_on[F])
+
     print("SOLVED FEATURE DICT")
     for x in solved_feature_dict:
         # x is the feature index
         #   features[x] = 'C:0:DSP48E1:DSP48E1:AREG:0'   (name of feature)
         #   solved_feature_dict[x] = {3, 5, 6}     (indices into bits[] of bits always on for feature)
-        #   bits[3:7] = ['26_261', '27_214', '0_227', '26_249']   (bits those map to)
-        print(x, features[x], "\n  ", solved_feature_dict[x], "\n  ", list(bits[b] for b in solved_feature_dict[x]))
+        #   bits[3:7] = bit ids of ['26_261', '27_214', '0_227', '26_249']   (bits those map to)
+        print(x, features[x], "\n  ", solved_feature_dict[x], "\n  ", list(bit_str(bits[b]) for b in solved_feature_dict[x]))
 
     # Return set of bits that are always ON for each feature
     return solved_feature_dict
@@ -436,44 +741,67 @@ def sensitivity_analysis_v2(tile_data):
     Perform the alternate sensitivity analysis.
 
     What is being done is looking for a pair of tiles, T1 and T2, 
-        whose sets of on features only differ by exactly one feature/
-    That is, if feature set T1 - feature set T2 results in one additional feature, 
-        that tells us what bits program the additional feature.
+        whose sets of on features only differ by exactly one feature.
+    That is, if feature set T1 is feature set T2 plus one additional feature (in either order of the tiles),
+        the bits on in T1 and not in T2 tell us what bits program the additional feature.
 
-    TODO: It would seem it should also look for T2 - T1 ?  
-    See issue #18.
+    The pairs are found through an index of the tiles by a signature of their feature set: the XOR of a random
+    64 bit value per feature.  The signature of a feature set minus one of its features is the signature XOR the
+    feature's value, so probing the index once per feature of each tile finds every pair in
+    O(tiles * features per tile), instead of comparing every pair of tiles.
 
     Parameters
     ----------
-    tile_data : _type_
-        _description_
+    tile_data : dict
+        For a given tile, lists all the features turned on in that tile and all the bits turned on in that tile.
+        (see condense_data)
 
     Returns
     -------
-    _type_
-        _description_
+    solved_feature_dict = { feature: set(bit, bit, ...), ... }
+        For each feature found in a pair, the bits on in the tile with the feature and off in the other.  When a
+        feature is found in several pairs, the last pair in tile order (by the earlier and then the later tile of the
+        pair) gives its bits.
     """
     global tile_type, features, solved_feature_dict
     solved_feature_dict = {}
 
-    # BEN - commented out (default not used)
-    # default = list(tile_data.keys())[0]
     # tile_data_keys = [ 'CLB.0005.0.DSP_R_X9Y195', 'CLB.0005.0.DSP_R_X35Y70', ... ]
-    tile_data_keys = list(tile_data.keys())
-    for i in range(len(tile_data_keys)):
-        T1 = tile_data_keys[i]
-        # TODO: Where does "BLO." occur?
-        if "BLO." not in T1:
-            for j in range(i+1, len(tile_data_keys)):
-                T2 = tile_data_keys[j]
-                if "BLO." not in T2:
-                    diff_features = set(tile_data[T1]["features"]) - set(tile_data[T2]["features"])
-                    #print(T1,T2,diff_features)
-                    if len(diff_features) == 1:
-                        diff_bits = set(tile_data[T1]["bits"]) - set(tile_data[T2]["bits"])
-                        for x in diff_features:
-                            solved_feature_dict[x] = diff_bits
-                            print(T1, T2, list(features[x] for x in diff_features), list(bits[x] for x in diff_bits))
+    # TODO: Where does "BLO." occur?
+    tile_data_keys = [T for T in tile_data if "BLO." not in T]
+    feature_sets = [frozenset(tile_data[T]["features"]) for T in tile_data_keys]
+    rng = random.Random(0)
+    salt = {}
+    index = {}
+    signatures = []
+    for i, S in enumerate(feature_sets):
+        sig = 0
+        for F in S:
+            if F not in salt:
+                salt[F] = rng.getrandbits(64)
+            sig ^= salt[F]
+        signatures.append(sig)
+        index.setdefault(sig, []).append(i)
+
+    # First and last pair (earlier tile, later tile, tile with the feature, tile without it) of each feature
+    first_pair = {}
+    last_pair = {}
+    for i, S in enumerate(feature_sets):
+        for F in S:
+            for j in index.get(signatures[i] ^ salt[F], ()):
+                # Signatures can collide, so check the sets themselves
+                if len(feature_sets[j]) == len(S) - 1 and feature_sets[j] < S:
+                    pair = (min(i, j), max(i, j), i, j)
+                    if F not in last_pair:
+                        first_pair[F] = last_pair[F] = pair
+                    first_pair[F] = min(first_pair[F], pair)
+                    last_pair[F] = max(last_pair[F], pair)
+
+    for F in sorted(last_pair, key=first_pair.get):
+        T1, T2 = tile_data_keys[last_pair[F][2]], tile_data_keys[last_pair[F][3]]
+        diff_bits = set(tile_data[T1]["bits"]) - set(tile_data[T2]["bits"])
+        solved_feature_dict[F] = diff_bits
+        print(T1, T2, [features[F]], list(bit_str(bits[x]) for x in diff_bits))
 
     return solved_feature_dict
 
@@ -487,13 +815,13 @@ def remove_lut_bits(solved_feature_dict):
             f = features[F].rsplit(":", 1)[0]
             if "6LUT" in f:
                 lut_bits |= solved_feature_dict[F]
-        print("LUT BITS:",list(bits[x] for x in lut_bits))
+        print("LUT BITS:",list(bit_str(bits[x]) for x in lut_bits))
         for F in solved_feature_dict: 
             f = features[F].rsplit(":", 1)[0]
             if "6LUT" not in f:
-                print("Removing:",features[F],list(bits[x] for x in solved_feature_dict[F]))
+                print("Removing:",features[F],list(bit_str(bits[x]) for x in solved_feature_dict[F]))
                 solved_feature_dict[F] = solved_feature_dict[F] - lut_bits
-                print("Now:",features[F],list(bits[x] for x in solved_feature_dict[F]))
+                print("Now:",features[F],list(bit_str(bits[x]) for x in solved_feature_dict[F]))
         
     return solved_feature_dict
 
@@ -582,7 +910,7 @@ def filter_bits(solved_feature_dict):
         for x in bel_bits:
             if x in bits:
                 bel_bit_idx.add(bits.index(x))
-        print("BEL BITS:",bel_bits)
+        print("BEL BITS:",set(bit_str(x) for x in bel_bits))
         print("BEL BITS:",bel_bit_idx)
         for i in range(len(features)):
             if features[i][0] != "B" and "Tile_Pip" in features[i] and i in solved_feature_dict:
@@ -617,14 +945,14 @@ def filter_bits(solved_feature_dict):
             for f in feature_sets:
                 tmp = set()
                 for b in feature_sets[f]:
-                    if min_frame <= int(bits[b].split("_")[0]) <= max_frame:
+                    if min_frame <= bits[b] >> 16 <= max_frame:
                         tmp.add(b)
                 feature_sets[f] = feature_sets[f]-tmp
 
 
     print("FEATURE SETS:")
     for f in feature_sets:
-        print(f,list(bits[b] for b in feature_sets[f]))
+        print(f,list(bit_str(bits[b]) for b in feature_sets[f]))
     return (feature_sets, possible_values)
     
 
@@ -703,13 +1031,22 @@ def get_bits(tile_data, property_bit_set, featureIndices, propertyPossibleValues
              }
     """
     global tile_data_rev
+    key = (tuple(featureIndices), tuple(propertyPossibleValues))
+    bit_set = frozenset(property_bit_set)
     ret = {}
     for v in propertyPossibleValues:
         ret[v] = set()
+    # The rules of the last analysis still hold if the property has the same bits: only the new tiles can add to them
+    folding = key in last_rules and last_rules[key][0] == bit_set
+    if folding:
+        for k, v in last_rules[key][1].items():
+            ret[k] |= v
     # Go through every feature associated with the propery of interest
     for idx,f in enumerate(featureIndices):  
         # Go through every tile associated with the feature 'f'
         for T in tile_data_rev[f]:
+            if folding and T not in new_tiles:
+                continue
         #if f in tile_data[T]["features"]:
             # Get ALL the bits turned on in this tile
             allTheTileBits = tile_data[T]["bits"]
@@ -718,14 +1055,14 @@ def get_bits(tile_data, property_bit_set, featureIndices, propertyPossibleValues
             #        - they are configuring feature 'f'
             #   - If they are not turned on in this tile, include their negation 
             #        - They must be used to configure another value for this property
-            tmp = [bits[x] if x in allTheTileBits else f"!{bits[x]}" for x in property_bit_set]
+            # Bits are only turned into "frame_bit" strings here, for the db
+            tmp = [bit_str(bits[x]) if x in allTheTileBits else "!" + bit_str(bits[x]) for x in property_bit_set]
             tmp.sort()
             # Add the resulting bits.  If already exists, will not add it a second time.
             ret[propertyPossibleValues[idx]].add(tuple(tmp))
-    for k, v in ret.items():
-        ret[k] = tuple(v)
-    #print(bit_set,features,vals,ret)
-    return ret
+    analysis_state["rules"][key] = (bit_set, ret)
+    # Sorted, so the db is the same whichever order the rules were found in
+    return {k: tuple(sorted(v)) for k, v in ret.items()}
 
 def merge_json(db,bel_dict):
     if (type(bel_dict) is dict):
@@ -867,7 +1204,7 @@ def second_analysis(tile_data, properties, values, solved_feature_dict):
 
 
 def run_data_analysis(in_fuzz_path, in_args):
-    global fuzz_path, args, tile_type, tilegrid, bel_dict, feature_dict
+    global fuzz_path, args, tile_type, tilegrid, ownership, bel_dict, feature_dict
     global bits, features
     global testProp
     tile_type = in_args.tile_type[0]
@@ -879,6 +1216,9 @@ def run_data_analysis(in_fuzz_path, in_args):
     fj = open("vivado_db/tilegrid.json")
     tilegrid = json.load(fj)
     fj.close()
+    load_device_frame_counts("vivado_db/tilegrid.json", args.family, tilegrid)
+    ownership = load_ownership("vivado_db/tilegrid.json", args.family, tilegrid)
+    set_decode_cache("decode_cache", int(args.decode_cache) * 2**20)
     fj = open("vivado_db/bel_dict.json")
     bel_dict = json.load(fj)
     fj.close()
@@ -889,13 +1229,17 @@ def run_data_analysis(in_fuzz_path, in_args):
     #   The word 'property' refers to a BEL property as in: 'C:1:DSP48E1:DSP48E1:ADREG'
     #   The word 'feature' refers to a property:value combo as in 'C:1:DSP48E1:DSP48E1:ADREG:0'
 
-    # 1. Load bitstreams, feature file contents into data structures and then write .pkl files containing both
-    #    bitstream and feature file info.
+    # 1. Load bitstreams, feature file contents into data structures and then append both the bitstream and the
+    #    feature file info to the specimen store of the run.
+    check_lut_equation_cases()
     parse_files()
 
-    # 2. Convert .pkl files into data structures used for data analysis.
-    #    See comments in condense_data() docstrings for details on data structures
-    tile_data, features, bits,feature_dict,tile_data_rev = condense_data()
+    # 2. Convert the specimen store into data structures used for data analysis, carrying over the state of the
+    #    last analysis unless --full is set.
+    #    See comments in condense_data() and load_analysis_state() docstrings for details on data structures
+    store = open_specimen_store("data/" + fuzz_path)
+    load_analysis_state(store)
+    tile_data, features, bits,feature_dict,tile_data_rev = condense_data(store)
 
     # 3. Foreach feature, create list of bits ALWAYS on when that feature is on
     if tile_type in ["INT_L","INT_R","INT"] or int(args.pips) != 1:
@@ -913,11 +1257,21 @@ def run_data_analysis(in_fuzz_path, in_args):
 
     db = add_missing_features(db)
 
-    
-    fj = open("db/db."+tile_type+".json", 'w')
-    json_database = json.dumps(db, indent=2, sort_keys=True)
-    print(json_database, file=fj)
-    fj.close()
+    # Only the affected entries were recomputed, the unchanged ones come from analysis_state.  The file is written whole
+    # when anything in it changed, and not at all otherwise.
+    json_database = json.dumps(db, indent=2, sort_keys=True) + "\n"
+    db_name = "db/db."+tile_type+".json"
+    if os.path.exists(db_name):
+        with open(db_name) as fj:
+            if fj.read() == json_database:
+                json_database = None
+    if json_database is None:
+        print("DB UNCHANGED")
+    else:
+        fj = open(db_name, 'w')
+        fj.write(json_database)
+        fj.close()
+    save_analysis_state(store)
     print("DONE")
     return
 
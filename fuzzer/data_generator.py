@@ -25,6 +25,8 @@ import argparse
 import sys
 import random
 from multiprocessing import Pool
+from artifacts import compress_artifacts, find_artifact
+from bit_parser import read_frames, get_frame_counts, load_device_frame_counts
 
 def data_generator_init():
     """
@@ -140,7 +142,21 @@ def reroute_physical_design():
     print("tcl_drc_ultra_latch",file=ft)
 
 
+# Names of the TCL scripts that already write an uncompressed copy of one of their specimens (see check_compressed_specimens)
+compress_checked = set()
+
 def write_bitstream(file_name):
+    if int(args.compress) == 1:
+        # Tilegrid specimens stay uncompressed - multi-frame writes can only be followed across columns once the tilegrid is known
+        compress = "FALSE" if ".tile." in file_name else "TRUE"
+        if compress == "TRUE" and ft.name not in compress_checked:
+            # The first specimen of each script is also written uncompressed, for check_compressed_specimens
+            compress_checked.add(ft.name)
+            check_path = os.path.join(os.path.dirname(file_name), "compress_check")
+            os.makedirs(check_path, exist_ok=True)
+            print("set_property BITSTREAM.GENERAL.COMPRESS FALSE [current_design]",file=ft)
+            print("catch {[write_bitstream " + check_path + "/" + os.path.basename(file_name) + " -force]}",file=ft)
+        print("set_property BITSTREAM.GENERAL.COMPRESS " + compress + " [current_design]",file=ft)
     if int(args.checkpoints) == 2:
         write_checkpoint(file_name + "backup")
         print("catch {[write_bitstream " + file_name + " -force]}",file=ft)
@@ -165,7 +181,11 @@ def create_site_pip(tile, site_index, site_pip, site_pip_value):
 
 def record_feature_file(file_name):
     global tile_type
-    print("record_device " + file_name + ".ft " + tile_type,file=ft)
+    if args.record == "rapidwright_experimental":
+        # The .ft file is written from this checkpoint by rapid_record.py, once Vivado is done (see record_specimens)
+        write_checkpoint(file_name + ".rec")
+    else:
+        print("record_device " + file_name + ".ft " + tile_type,file=ft)
 
 def create_polarity_selector(count, pin, val, tile,site_index,site_type):
     site = "[lindex [get_sites -of_objects [get_tiles " + tile + "]] " + site_index + "]"
@@ -871,6 +891,57 @@ def randomized_method(checkpoint,tile_list,is_port):
 def run_tcl_script(tcl_file):
     os.system("vivado -mode batch -source data/" + fuzz_path + "/" + tcl_file + " -stack 2000")
 
+def run_recorder(checkpoints):
+    os.system(sys.executable + " ../../rapid_record.py " + tile_type + " " + " ".join(checkpoints))
+
+def record_specimens():
+    """
+    Write the .ft files of the specimen checkpoints (x.rec.dcp) of the run with rapid_record.py, one batch of
+    checkpoints per process.  Only used with --record=rapidwright_experimental.
+    """
+    checkpoints = sorted("data/" + fuzz_path + "/" + x for x in os.listdir("data/" + fuzz_path + "/") if x.endswith(".rec.dcp"))
+    processes = max(int(args.parallel), 1)
+    batches = [checkpoints[i::processes] for i in range(processes) if len(checkpoints[i::processes]) > 0]
+    if len(batches) > 1:
+        pool = Pool(processes=len(batches))
+        pool.map(run_recorder, batches)
+    elif len(batches) == 1:
+        run_recorder(batches[0])
+
+def check_compressed_specimens(folder):
+    """
+    Check that the compressed specimens of a data folder decode to the same frames as their uncompressed copies
+
+    With --compress=1 the first specimen of each TCL script is also written uncompressed (per-frame CRC, so every
+    frame address is explicit) into <folder>/compress_check/.  The compressed specimen is decoded the way the
+    analysis decodes it, following multi-frame writes with the frame counts of the device, and every frame that
+    isn't blank has to match.  Raises ValueError on the first specimen that doesn't, rather than letting the
+    analysis read misfiled frames.
+
+    Parameters
+    ----------
+    folder : str
+        Data folder of the run, e.g. "data/0005/"
+    """
+    check_path = os.path.join(folder, "compress_check") + "/"
+    if not os.path.isdir(check_path):
+        return
+    with open("vivado_db/tilegrid.json") as fj:
+        device_tilegrid = json.load(fj)
+    load_device_frame_counts("vivado_db/tilegrid.json", args.family, device_tilegrid)
+    frame_counts = get_frame_counts(device_tilegrid)
+    for file_name in sorted(os.listdir(check_path)):
+        if not file_name.endswith(".bit") or find_artifact(os.path.join(folder, file_name)) is None:
+            continue
+        specimens = []
+        for bit_file_name, counts in [(check_path + file_name, None), (os.path.join(folder, file_name), frame_counts)]:
+            addrs, frames = read_frames(bit_file_name, args.family, counts)
+            used = frames.any(axis=1)
+            specimens.append(dict(zip(addrs[used].tolist(), (x.tobytes() for x in frames[used]))))
+        if specimens[0] != specimens[1]:
+            raise ValueError("Compressed specimen " + file_name + " doesn't decode to the frames of its uncompressed copy, run without --compress")
+        print("COMPRESSED SPECIMEN OK:", file_name, len(specimens[0]), "frames")
+
 def set_ft(fp):
     """
     Set this module's global 'ft' variable.
@@ -939,3 +1010,9 @@ def run_data_generator(in_fuzz_path,in_args):
                 print("FILE TO RUN:",file.replace(".tile",""))
                 run_tcl_script(file.replace(".tile",""))
                 run_tcl_script(file)
+    if int(args.compress) == 1:
+        check_compressed_specimens("data/" + fuzz_path + "/")
+    if args.record == "rapidwright_experimental":
+        record_specimens()
+    # Every specimen has been written, so the folder's artifacts can be compressed (if --artifact_codec is set)
+    compress_artifacts("data/" + fuzz_path + "/")
@@ -42,6 +42,7 @@ import data_generator as dg
 #from pip_generator import *
 import rapid_tilegrid
 #from tilegrid_solver import *
+from artifacts import set_artifact_codec
 
 
 def make_folders():  
@@ -88,10 +89,17 @@ parser.add_argument('--checkpoint_count',default=1)         # Number of differen
 parser.add_argument('--parallel',default=8)                 # Runs tile in parallel for N number of processes
 parser.add_argument('--pips',default=0)                     # 1: Turns on the pip_fuzzer, 0: turns it off
 parser.add_argument('--pip_iterations',default=0)           # Number of iterations to run the pip fuzzer for
+parser.add_argument('--compress',default=0)                 # 1: Write compressed specimen bitstreams (BITSTREAM.GENERAL.COMPRESS), 0: uncompressed
+parser.add_argument('--decode_cache',default=1024)          # Size in MB of the cache of decoded bitstreams in decode_cache/, 0: no cache
+parser.add_argument('--frame_store',default=0)              # 1: Move specimen bitstreams into a deduplicated frame store (data/NNNN/frame_store/), 0: keep the .bit files
+parser.add_argument('--artifact_codec',default="none")      # Compress finished .bit/.ft/.pkl/.tcl files with gzip, lzma or bz2, none: leave them uncompressed
+parser.add_argument('--record',default="tcl",choices=["tcl","rapidwright_experimental"]) # tcl: Vivado writes each .ft with record_device, rapidwright_experimental: Vivado writes a checkpoint and rapid_record.py writes the .ft (not validated yet)
+parser.add_argument('--full',default=0)                     # 1: Parse every specimen again and recompute the analysis from scratch, 0: parse and fold in only the specimens added since the last analysis
 
 parser.add_argument("--vrbs", action='store_true')
 
 args = parser.parse_args()
+set_artifact_codec(args.artifact_codec)
 is_first_run = 0
 if os.path.exists(args.family + "/" + args.part + "/vivado_db/init.dcp") == False:
     print("Running first time FPGA Family and Part Database generation")
@@ -27,6 +27,7 @@
 #    tilegrid.json
 #    tile_dict.json
 # It also creates an init.dcp file which is used as the starting point for every specimen created by the fuzzers.
+# and device.bit, the bitstream of the empty device that the frame counts of its columns are read from.
 
 
 
@@ -501,6 +502,13 @@ proc create_tilegrid {} {
         puts $::f "\"INT_Y\":$int_y,"
         puts $::f "\"TILE_X\":$tile_x,"
         puts $::f "\"TILE_Y\":$tile_y,"
+        # Position of the tile's SLR in the bitstream - every SLR has its own frame address space
+        set slr [get_slrs -quiet -of_objects $T]
+        if {$slr == ""} {
+            puts $::f "\"SLR\":0,"
+        } else {
+            puts $::f "\"SLR\":[get_property CONFIG_ORDER_INDEX $slr],"
+        }
         if { [lsearch -exact [list "LIOB33" "LIOB33_SING" "RIOB33" "RIOB33_SING"] $tile_type] != -1 } {
             if {$has_unbonded == 1} {
                 puts $::f "\"IS_BONDED\":false,"
@@ -845,6 +853,9 @@ proc get_all_db {} {
     create_database
     close $::f
     open_checkpoint "init.dcp"
+    # Bitstream of the empty device, with a frame address for every frame (PERFRAMECRC, see init).  bit_parser.py
+    # reads the number of frames in every column from it.
+    catch {write_bitstream "device.bit" -force}
     set ::f [open "tilegrid.json" w]
     create_tilegrid
     close $::f
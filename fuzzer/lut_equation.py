@@ -0,0 +1,205 @@
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+import re
+from functools import lru_cache
+
+
+# Vivado names the LUT inputs A1-A6, LUT equations (as in RapidWright's LUTTools) name them I0-I5
+PIN_MAP = {"A6": "I5", "A5": "I4", "A4": "I3", "A3": "I2", "A2": "I1", "A1": "I0"}
+
+# Operators, from the loosest binding to the tightest.  NOT (~ or !) binds tighter than all of them.
+OR_OPS = "+|"
+XOR_OPS = "@^"
+AND_OPS = "*&."
+NOT_OPS = "~!"
+
+_token = re.compile(r"\s*(I\d|[01]|[+|@^*&.~!()])")
+
+
+def vivado_to_lut_equation(eqn):
+    """
+    LUT equation of the EQN property of a Vivado LUT BEL: "O6=(A1*~A2)" -> "O=(I0*~I1)"
+    """
+    eqn = eqn.upper()
+    for key in PIN_MAP:
+        eqn = eqn.replace(key, PIN_MAP[key])
+    return eqn.replace("O6=", "O=").replace("O5=", "O=")
+
+
+@lru_cache(maxsize=None)
+def input_masks(lut_size):
+    """
+    Truth table of each LUT input: bit j of input k's table is bit k of j
+
+    Returns
+    -------
+    ([ int ], int)
+        Table of I0, I1, ... and the table with every bit set
+    """
+    n = 1 << lut_size
+    full = (1 << n) - 1
+    masks = []
+    for k in range(lut_size):
+        # Runs of 2**k zeros then 2**k ones, repeated
+        run = ((1 << (1 << k)) - 1) << (1 << k)
+        period = 1 << (k + 1)
+        masks.append(sum(run << (i * period) for i in range(n // period)) & full)
+    return masks, full
+
+
+def evaluate_equation(eqn, lut_size):
+    """
+    Truth table of a LUT equation
+
+    Every value in the expression is a truth table held in an int, one bit per combination of the inputs, so an
+    operator is evaluated for all 2**lut_size input combinations at once.
+
+    Parameters
+    ----------
+    eqn : str
+        LUT equation, Ex.: "O=(I0*I1)+~I2" - inputs I0-I5, constants 0 and 1, ~ ! NOT, * & . AND, @ ^ XOR, + | OR
+    lut_size : int
+        Number of LUT inputs, 6 for a 64 bit table and 5 for a 32 bit table
+
+    Returns
+    -------
+    int
+        Truth table, bit j is the output for the inputs I0-I5 given by the bits of j
+    """
+    masks, full = input_masks(lut_size)
+    text = eqn.split("=", 1)[-1]
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        m = _token.match(text, pos)
+        if m is None:
+            if text[pos:].strip() == "":
+                break
+            raise ValueError("Bad LUT equation " + eqn + " at " + text[pos:])
+        tokens.append(m.group(1))
+        pos = m.end()
+    tokens.append(None)
+    at = [0]
+
+    def peek():
+        return tokens[at[0]]
+
+    def take():
+        at[0] += 1
+        return tokens[at[0]-1]
+
+    def parse_binary(ops, parse_operand, apply):
+        value = parse_operand()
+        while peek() is not None and peek() in ops:
+            take()
+            value = apply(value, parse_operand())
+        return value
+
+    def parse_or():
+        return parse_binary(OR_OPS, parse_xor, lambda a, b: a | b)
+
+    def parse_xor():
+        return parse_binary(XOR_OPS, parse_and, lambda a, b: a ^ b)
+
+    def parse_and():
+        return parse_binary(AND_OPS, parse_not, lambda a, b: a & b)
+
+    def parse_not():
+        if peek() is not None and peek() in NOT_OPS:
+            take()
+            return full ^ parse_not()
+        token = take()
+        if token == "(":
+            value = parse_or()
+            if take() != ")":
+                raise ValueError("Unbalanced parentheses in LUT equation " + eqn)
+            return value
+        if token == "0":
+            return 0
+        if token == "1":
+            return full
+        if token is not None and token[0] == "I" and int(token[1]) < lut_size:
+            return masks[int(token[1])]
+        raise ValueError("Bad LUT equation " + eqn + ", unexpected " + (token or "end of equation"))
+
+    value = parse_or()
+    if peek() is not None:
+        raise ValueError("Bad LUT equation " + eqn + ", unexpected " + peek())
+    return value
+
+
+@lru_cache(maxsize=65536)
+def lut_init_from_equation(eqn, lut_size):
+    """
+    INIT value of a LUT equation, the pure Python equivalent of LUTTools.getLUTInitFromEquation
+
+    Returns
+    -------
+    str
+        Verilog hex literal, Ex.: lut_init_from_equation("O=I0*I1", 6) -> "64'h8888888888888888"
+    """
+    n = 1 << lut_size
+    return "%d'h%0*X" % (n, n // 4, evaluate_equation(eqn, lut_size))
+
+
+# Equations covering operator precedence (OR < XOR < AND < NOT), every operator alias and 5 input LUTs, with their
+# LUT sizes.  check_lut_equations compares them with LUTTools on every fuzzer run (see data_analysis).
+LUT_EQUATION_CASES = [
+    ("O=I0+I1*I2", 6), ("O=I0*I1+I2", 6), ("O=I0@I1*I2", 6), ("O=I0*I1@I2", 6), ("O=I0+I1@I2", 6),
+    ("O=I0@I1+I2", 6), ("O=~I0*I1", 6), ("O=~I0+I1", 6), ("O=~I0@I1", 6), ("O=~(I0*I1)", 6), ("O=~~I0*I1", 6),
+    ("O=I0+I1@I2*~I3", 6), ("O=(I0+I1)@(I2*I3)", 6), ("O=I5*~I0+I1@I2*I3+I4", 6),
+    ("O=I0&I1|I2^I3", 6), ("O=I0.I1+I2", 6), ("O=!I0.I1", 6), ("O=I0|I1&I2", 6), ("O=I0^I1&I2", 6), ("O=!I0^I1", 6),
+    ("O=I0*I1+I2@I3*~I4", 5), ("O=(I0+I1)*(I2@I4)", 5), ("O=~I4", 5), ("O=I0&I1|I2^!I3.I4", 5), ("O=I4@I3@I2@I1@I0", 5),
+]
+
+
+def check_lut_equations(luttools, eqns):
+    """
+    Compare lut_init_from_equation with RapidWright's LUTTools.getLUTInitFromEquation
+
+    Parameters
+    ----------
+    luttools : LUTTools
+        RapidWright LUTTools object, the JVM has to be running
+    eqns : [ ( str, int ) ]
+        LUT equations ("O=...") and their LUT sizes
+
+    Returns
+    -------
+    [ str ]
+        One line for each equation that gets a different INIT, or that either side can't evaluate
+    """
+    mismatches = []
+    for eqn, lut_size in eqns:
+        try:
+            expected = int(str(luttools.getLUTInitFromEquation(eqn, lut_size)).split("'h")[-1], 16)
+        except Exception as e:
+            mismatches.append("LUTTOOLS ERROR %s %s" % (eqn, e))
+            continue
+        try:
+            got = int(lut_init_from_equation(eqn, lut_size).split("'h")[-1], 16)
+        except ValueError as e:
+            mismatches.append("ERROR %s %s" % (eqn, e))
+            continue
+        if got != expected:
+            mismatches.append("MISMATCH %s %X %X" % (eqn, got, expected))
+    return mismatches
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+# The reverse of bit2phy.py: assemble a bitstream that turns on a set of tile features, using the rules of the db.
+#
+# Typical usage:
+#    python3 phy2bit.py --features features.json --output design.bit
+#        features.json is { tile name : [ feature, ... ] } with features named the way bit2phy.py prints them,
+#        e.g. { "CLBLL_L_X2Y100": [ "C:0:SLICEL:A5FF:FFINIT:INIT1", "C:Tile_Pip:CLBLL_L.CLBLL_L_A->CLBLL_LL_A" ] }
+#    python3 phy2bit.py --roundtrip 10000
+#        Assembles random feature combinations, decodes them again and reports every feature the db can't round trip.
+#        No Vivado is needed, so this is a cheap way to find conflicting or ambiguous rules in a db.
+
+import argparse
+import glob
+import json
+import os
+import random
+
+import numpy as np
+
+from bit_parser import get_frame_format, bit_str, load_ownership, read_frames, build_frame_index, gather_frames
+from bit_parser import get_frame_counts, load_device_frame_counts
+from bit_parser import decode_far, far_mask, decode_frames, scatter_bits, CONFIG_BUSES, SYNC, FAR_REG, CMD_REG, DESYNC_CMD
+from bit2phy import convert_db_bits, test_bits
+
+
+##================================================================================##
+##                                 FEATURE RULES                                  ##
+##================================================================================##
+
+
+def db_feature_rules(d, tile_type):
+    """
+    Flatten a db (with bit ids, see bit2phy.convert_db_bits) into the rule of every feature it has
+
+    Features are named the way bit2phy.parse_tile2 reports them.
+
+    Returns
+    -------
+    { str : [ [ int ] ] }
+        Equations (any one of which turns the feature on) of each feature
+    """
+    rules = {}
+    def add_rules(props, loc, value):
+        for prop, propv in props.items():
+            bus = propv["BUS"][0] if "BUS" in propv else "C"
+            for val, valv in propv[value].items():
+                rules[":".join([bus+":"+loc, prop, val])] = valv
+    for i, iv in d["SITE_INDEX"].items():
+        for site, sitev in iv["SITE_TYPE"].items():
+            for bel, belv in sitev["BEL"].items():
+                add_rules(belv["CONFIG"], ":".join([i, site, bel]), "VALUE")
+            add_rules(sitev["SITE_PIP"], ":".join([i, site]), "SITE_PIP_VALUE")
+    for i, iv in d["TILE_PIP"].items():
+        if "BITS" in iv:
+            rules[":".join(["C", "Tile_Pip", tile_type + "." + i])] = iv["BITS"]
+    return rules
+
+
+def load_db_rules(path_to_db_folder, tile_types=None):
+    """
+    Load the databases in a folder
+
+    Returns
+    -------
+    { str : ( dict, { str : [ [ int ] ] } ) }
+        Database (with bit ids) and feature rules (see db_feature_rules) of each tile type
+    """
+    dbs = {}
+    for x in glob.glob(os.path.join(path_to_db_folder, "db.*.json")):
+        tile_type = os.path.basename(x).split(".")[1]
+        if tile_types is not None and tile_type not in tile_types:
+            continue
+        with open(x) as fj:
+            d = convert_db_bits(json.load(fj))
+        dbs[tile_type] = (d, db_feature_rules(d, tile_type))
+    return dbs
+
+
+def feature_property(feature):
+    """
+    Property set by a feature, features of the same property are alternatives: "C:0:SLICEL:A5FF:FFINIT:INIT1" -> "C:0:SLICEL:A5FF:FFINIT"
+
+    Only real enumerations are alternatives: the values of a BEL property, the inputs of a site mux
+    ("C:0:SLICEL:AFFMUX:XOR") and the tile PIPs driving the same wire.  Every bit of an indexed property
+    ("C:0:SLICEL:A6LUT:EQN:[5]", with "![5]" the same bit off) and every LUT input site PIP ("C:0:SLICEL:A6LUT:A1"
+    ... "A6" are used together) is a property of its own.
+    """
+    if ":Tile_Pip:" in feature:
+        return feature.replace("->>", "->").rsplit("->", 1)[1]
+    prop, value = feature.rsplit(":", 1)
+    if feature.count(":") < 5:
+        # Site PIP: a LUT input or the input of a mux
+        return feature if prop.endswith("LUT") else prop
+    if value.startswith("[") or value.startswith("!["):
+        return prop + ":" + value.lstrip("!")
+    return prop
+
+
+##================================================================================##
+##                              ASSEMBLE THE FRAMES                               ##
+##================================================================================##
+
+
+_encode_index = (None, None)
+
+def get_encode_index(ownership):
+    """
+    Ownership map (see bit_parser.build_ownership) inverted: from (slot, minor, local word) to frame address and word
+
+    Returns
+    -------
+    (owners, keys) : ( np.ndarray, np.ndarray )
+        slot << 40 | minor << 24 | local word of every entry of the map, sorted, and the map key (frame address << 16 | word) of each
+    slot_of : { ( str, int ) : int }
+        Slot of each tile and index into CONFIG_BUSES
+    """
+    global _encode_index
+    if _encode_index[0] is not ownership:
+        owners = ownership["slot"].astype(np.int64) << 40 | ownership["minor"].astype(np.int64) << 24 | ownership["local_word"]
+        order = np.argsort(owners, kind="stable")
+        slot_of = {x: i for i, x in enumerate(zip(ownership["slot_tile"].tolist(), ownership["slot_bus"].tolist()))}
+        _encode_index = (ownership, (owners[order], ownership["keys"][order], slot_of))
+    return _encode_index[1]
+
+
+def assemble_frames(tile_features, dbs, tilegrid, ownership, family, base=None):
+    """
+    Build the configuration frames that turn on a set of tile features
+
+    Every feature is turned on with the first equation of its rule: the bits of the equation are set and its
+    negated bits are cleared.
+
+    Parameters
+    ----------
+    tile_features : { str : [ str ] }
+        Features to turn on in each tile, named the way bit2phy.parse_tile2 reports them
+    dbs : { str : ( dict, { str : [ [ int ] ] } ) }
+        Databases of the tile types, see load_db_rules
+    tilegrid : dict
+        Device tilegrid
+    ownership : { str : np.ndarray }
+        Ownership map of tilegrid, see bit_parser.load_ownership
+    family : str
+        FPGA architecture family
+    base : (np.ndarray, np.ndarray)
+        Frame addresses and frames (see bit_parser.read_frames) to start from, no frames by default
+
+    Returns
+    -------
+    addrs : np.ndarray (int64)
+        Sorted SLR-qualified address of each frame
+    frames : np.ndarray
+        2D array of frame words, one row per address
+    problems : [ str ]
+        Tiles without a db, features without a rule, bits outside of the tile, and bits that one feature sets and
+        another clears
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    word_bits = word_size*8
+    owners, keys, slot_of = get_encode_index(ownership)
+    bus_of = {x[0]: i for i, x in enumerate(CONFIG_BUSES)}
+    problems = []
+
+    # (slot, bit id) -> features that set or clear the bit
+    on, off = {}, {}
+    for T, features in tile_features.items():
+        if T not in tilegrid or tilegrid[T]["TYPE"] not in dbs:
+            problems.append("NO DB: " + T)
+            continue
+        rules = dbs[tilegrid[T]["TYPE"]][1]
+        for F in features:
+            if not rules.get(F) or (T, bus_of.get(F[0])) not in slot_of:
+                problems.append("NO RULE: " + T + " " + F)
+                continue
+            slot = slot_of[(T, bus_of[F[0]])]
+            for B in rules[F][0]:
+                if B < 0:
+                    off.setdefault((slot, ~B), []).append(F)
+                else:
+                    on.setdefault((slot, B), []).append(F)
+    for key in sorted(set(on) & set(off)):
+        problems.append("CONFLICT: " + ownership["slot_tile"][key[0]] + " " + bit_str(key[1]) + " set by " +
+                        str(on[key]) + " cleared by " + str(off[key]))
+
+    # Tile bits -> frame words
+    bits = np.array(list(on) + list(off), dtype=np.int64).reshape(-1, 2)
+    slot, minor, local_bit = bits[:, 0], bits[:, 1] >> 16, bits[:, 1] & 0xFFFF
+    wanted = slot << 40 | minor << 24 | local_bit // word_bits
+    idx = np.minimum(np.searchsorted(owners, wanted), max(len(owners)-1, 0))
+    found = owners[idx] == wanted if len(owners) else np.zeros(len(wanted), dtype=bool)
+    for i in np.flatnonzero(~found).tolist():
+        problems.append("NOT IN TILE: " + ownership["slot_tile"][slot[i]] + " " + bit_str(int(bits[i, 1])))
+    set_on = np.arange(len(bits)) < len(on)
+    key = keys[idx[found]]
+    mask = (1 << (local_bit[found] % word_bits)).astype(">u" + str(word_size))
+    set_on = set_on[found]
+
+    base_addrs, base_frames = base if base is not None else (np.zeros(0, dtype=np.int64), None)
+    addrs = np.unique(np.concatenate([base_addrs, key >> 16]))
+    frames = np.zeros((len(addrs), write_count), dtype=">u" + str(word_size))
+    if len(base_addrs):
+        frames[np.searchsorted(addrs, base_addrs)] = base_frames
+    row = np.searchsorted(addrs, key >> 16)
+    word = key & 0xFFFF
+    np.bitwise_and.at(frames, (row[~set_on], word[~set_on]), ~mask[~set_on])
+    np.bitwise_or.at(frames, (row[set_on], word[set_on]), mask[set_on])
+    return addrs, frames, problems
+
+
+def build_bitstream(addrs, frames, family):
+    """
+    Bitstream (without a header) that writes a set of frames, in a form bit_parser.build_frame_index accepts
+
+    Each frame is written with its own FAR and FDRI writes.  SLRs are written one after the other, each as its own
+    synced configuration stream.
+
+    Returns
+    -------
+    bytes
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    packets = []
+    slrs = decode_far(addrs, family)["slr"]
+    for slr in range(max(slrs.tolist(), default=0) + 1):
+        rows = np.flatnonzero(slrs == slr)
+        words = [0xFFFFFFFF]*8 + [0x000000BB, 0x11220044, 0xFFFFFFFF, 0xFFFFFFFF, SYNC, 0x20000000]
+        packets.append(np.array(words, dtype=">u4").tobytes())
+        for r in rows.tolist():
+            far = int(addrs[r]) & ~far_mask(family, "slr")
+            packets.append(np.array([0x30000001 | FAR_REG << 13, far, write_instr], dtype=">u4").tobytes())
+            packets.append(frames[r].astype(">u" + str(word_size)).tobytes())
+        packets.append(np.array([0x30000001 | CMD_REG << 13, DESYNC_CMD, 0x20000000, 0x20000000], dtype=">u4").tobytes())
+    return b"".join(packets)
+
+
+def decode_tile_bits(data, family, ownership, tiles):
+    """
+    Decode an assembled bitstream (see build_bitstream) in memory and find the bits turned on in some tiles
+
+    Returns
+    -------
+    { ( str, str ) : set }
+        Bit ids turned on in each of tiles, by tile and first letter of the configuration bus ("C" or "B"), ready
+        for bit2phy.test_bits
+    """
+    write_instr, write_count, word_size = get_frame_format(family)
+    addrs, offsets = build_frame_index(data, family)
+    frame_idx, word, bit = decode_frames(gather_frames(data, offsets, word_size, write_count), word_size)
+    slots = np.isin(ownership["slot_tile"], list(tiles))
+    slot, minor, local_bit = scatter_bits(ownership, addrs, frame_idx, word, bit, word_size*8, slots)
+    ids = (minor << 16 | local_bit).tolist()
+    bounds = np.searchsorted(slot, np.arange(len(slots)+1)).tolist()
+    found = {}
+    for i in np.flatnonzero(slots).tolist():
+        key = (ownership["slot_tile"][i], CONFIG_BUSES[ownership["slot_bus"][i]][0])
+        found.setdefault(key, set()).update(ids[bounds[i]:bounds[i+1]])
+    return found
+
+
+##================================================================================##
+##                                   ROUND TRIP                                   ##
+##================================================================================##
+
+
+def random_features(tiles, type_props, tiles_per_design, features_per_tile):
+    """
+    Random tile features: a few of tiles, with one value of a few properties each
+
+    Parameters
+    ----------
+    tiles : [ ( str, str ) ]
+        Tiles to choose from, and their tile types
+    type_props : { str : [ [ str ] ] }
+        The alternative features of each property (see feature_property) of each tile type
+    """
+    tile_features = {}
+    for T, tile_type in random.sample(tiles, min(tiles_per_design, len(tiles))):
+        props = type_props[tile_type]
+        tile_features[T] = [random.choice(x) for x in random.sample(props, min(features_per_tile, len(props)))]
+    return tile_features
+
+
+def roundtrip(dbs, tilegrid, ownership, family, count, tiles_per_design, features_per_tile):
+    """
+    Assemble random feature combinations, decode them again and report the features that don't come back
+
+    A feature that doesn't decode has a rule that conflicts with the rules of the other features of its tile.
+    A decoded feature that is an alternative to an assembled one (another value of the same property) has a rule
+    that is ambiguous with the assembled feature's rule.
+
+    Returns
+    -------
+    { str : int }
+        Number of times each problem was seen
+    """
+    tiles = sorted((T, tilegrid[T]["TYPE"]) for T in tilegrid if tilegrid[T]["TYPE"] in dbs and "bits" in tilegrid[T])
+    type_props = {}
+    alternatives = {}
+    for tile_type, (d, rules) in dbs.items():
+        props = {}
+        # Features without a rule can't be assembled
+        for F in rules:
+            if rules[F]:
+                props.setdefault(feature_property(F), []).append(F)
+        type_props[tile_type] = [props[p] for p in sorted(props)]
+        alternatives[tile_type] = {F: x for x in props.values() for F in x}
+    problems = {}
+    for n in range(count):
+        tile_features = random_features(tiles, type_props, tiles_per_design, features_per_tile)
+        addrs, frames, assemble_problems = assemble_frames(tile_features, dbs, tilegrid, ownership, family)
+        for p in assemble_problems:
+            problems[p] = problems.get(p, 0) + 1
+        found = decode_tile_bits(build_bitstream(addrs, frames, family), family, ownership, tile_features)
+        # Only the values of the assembled properties are tested, the way bit2phy.parse_tile2 tests every feature
+        for T, features in tile_features.items():
+            tile_type = tilegrid[T]["TYPE"]
+            rules = dbs[tile_type][1]
+            for F in features:
+                for A in alternatives[tile_type][F]:
+                    on = test_bits(rules[A], found.get((T, A[0]), ()))
+                    if A == F and not on:
+                        p = "MISSING: " + tile_type + " " + F
+                    elif A != F and on and A not in features:
+                        p = "AMBIGUOUS: " + tile_type + " " + A
+                    else:
+                        continue
+                    problems[p] = problems.get(p, 0) + 1
+        if (n+1) % 1000 == 0:
+            print("Round trips:", n+1, "Problems:", len(problems))
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Assemble a bitstream from tile features, the reverse of bit2phy.py"
+    )
+    parser.add_argument("--features")                                      # JSON file of the features to turn on in each tile
+    parser.add_argument("--output", default="design.bit")                  # Bitstream to write
+    parser.add_argument("--base")                                          # Bitstream to start from, e.g. of an empty design
+    parser.add_argument("--roundtrip", default=0, type=int)               # Number of random feature combinations to round trip through the decoder
+    parser.add_argument("--tiles_per_design", default=8, type=int)        # Tiles in each random combination
+    parser.add_argument("--features_per_tile", default=4, type=int)       # Features in each tile of a random combination
+    parser.add_argument("--seed", default=0, type=int)                    # Seed of the random combinations
+    parser.add_argument("--tile")                                          # Only use the db of this tile type
+    parser.add_argument("--family", default="artix7")
+    parser.add_argument("--path_to_db_folder", default="../byu_db/")
+    parser.add_argument("--path_to_tilegrid", default="../byu_db/tilegrid.json")
+    args = parser.parse_args()
+
+    with open(args.path_to_tilegrid) as fs:
+        tilegrid = json.load(fs)
+    load_device_frame_counts(args.path_to_tilegrid, args.family, tilegrid)
+    ownership = load_ownership(args.path_to_tilegrid, args.family, tilegrid)
+    dbs = load_db_rules(args.path_to_db_folder, None if args.tile is None else [args.tile])
+
+    if args.features is not None:
+        with open(args.features) as fj:
+            tile_features = json.load(fj)
+        base = None if args.base is None else read_frames(args.base, args.family, get_frame_counts(tilegrid))
+        addrs, frames, problems = assemble_frames(tile_features, dbs, tilegrid, ownership, args.family, base)
+        for p in problems:
+            print(p)
+        with open(args.output, "wb") as fb:
+            fb.write(build_bitstream(addrs, frames, args.family))
+        print("Wrote", len(addrs), "frames to", args.output)
+
+    if args.roundtrip > 0:
+        random.seed(args.seed)
+        problems = roundtrip(dbs, tilegrid, ownership, args.family, args.roundtrip, args.tiles_per_design, args.features_per_tile)
+        for p, n in sorted(problems.items(), key=lambda x: -x[1]):
+            print(n, p)
+        print("Round trips:", args.roundtrip, "Problems:", len(problems))
+
+
+if __name__ == "__main__":
+    main()
@@ -27,6 +27,8 @@ import random
 import pickle
 import data_generator as dg
 from data_analysis import parse_feature_file
+from bit_parser import bitstream_exists
+from artifacts import list_artifacts, open_artifact
 
 
 ##================================================================================##
@@ -131,13 +133,13 @@ def create_pip_design():
 
 def check_pip_files():
     global fuzz_path, pip_dict
-    fileList = os.listdir("data/" + fuzz_path + "/")
-    for file in sorted(fileList):
+    fileList = list_artifacts("data/" + fuzz_path + "/")
+    for file in fileList:
         if ".tile" not in file and ".bit" not in file and ".dcp" not in file and ".ft" in file:
-            if os.path.exists("data/" + fuzz_path + "/" + file.replace(".ft", '.bit')):
+            if bitstream_exists("data/" + fuzz_path + "/" + file.replace(".ft", '.bit')):
                 specimen, tile_type, pip_ext, ext = file.split(".")
                 # Parse Feature file
-                f = open("data/" + fuzz_path + "/" + file)
+                f = open_artifact("data/" + fuzz_path + "/" + file)
                 tile_feature_dict = parse_feature_file(f, fuzz_path + "." + specimen, tile_type)
                 print("PARSED FEATURE")
                 f.close()
@@ -205,6 +207,8 @@ def fuzz_pips():
     dg.write_bitstream("data/" + fuzz_path + "/" + str(specimen_number) + "." + tile_type + ".pips.bit")
     specimen_number+=1
     os.system("vivado -mode batch -source data/" + fuzz_path + "/fuzz_pips.tcl")
+    if int(args.compress) == 1:
+        dg.check_compressed_specimens("data/" + fuzz_path + "/")
     
         # parse all feature files
     # repeat with while loop
@@ -32,6 +32,8 @@ import jpype.imports
 from jpype.types import *
 import data_generator as dg
 from data_analysis import parse_feature_file
+from bit_parser import bitstream_exists
+from artifacts import compress_artifacts, list_artifacts, open_artifact
 #jpype.startJVM(classpath=["rapidwright-2021.1.1-standalone-lin64.jar"])
 
 
@@ -839,11 +841,14 @@ def run_pip_generation(tile_list,pip_list):
         ft.close()
         print("\n[LOG]: Running Vivado...", file=sys.stderr)
         os.system("vivado -mode batch -source data/" + fuzz_path + "/fuzz_pips.tcl -stack 2000")
+        if int(args.compress) == 1:
+            dg.check_compressed_specimens("data/" + fuzz_path + "/")
         pips = tile_list[0].getPIPs()
         pip_list = check_pip_files(pips)
 
         print(f"[LOG]: len(pip_list)={len(pip_list)}, iteration={iteration}  {datetime.datetime.now()}", file=sys.stderr)
         os.system(f"cp data/{fuzz_path}/fuzz_pips.tcl data/{fuzz_path}/fuzz_pips_{iteration}.tcl")
+        compress_artifacts("data/" + fuzz_path + "/")
         # There are 3 ways to stop iterating:
         #   a) We disambiguate all the pips in the list of pips
         #   b) We hit our iteration count
@@ -940,14 +945,14 @@ def check_pip_files(pip_list):
     global fuzz_path, pip_dict, bel_dict, pip_set, pipsToDo
     # Step 1: Start with an empty pip_dict and add to it
     pip_dict = {}
-    fileList = os.listdir("data/" + fuzz_path + "/")
-    for file in sorted(fileList):
+    fileList = list_artifacts("data/" + fuzz_path + "/")
+    for file in fileList:
         if ".ft" in file:
             # Look for specimens we have a .ft and .bit for...
-            if os.path.exists("data/" + fuzz_path + "/" + file.replace(".ft", '.bit')):
+            if bitstream_exists("data/" + fuzz_path + "/" + file.replace(".ft", '.bit')):
                 specimen, tile_type, pip_ext, ext = file.split(".")
                 # Parse feature file and build tile_feature_dict
-                f = open("data/" + fuzz_path + "/" + file)
+                f = open_artifact("data/" + fuzz_path + "/" + file)
                 # Build a dict called tile_feature_dict
                 # It has keys such as: CLB.0105.0.INT_L_X20Y25 (one for each tile that has PIPs turned on)
                 #   These are of the form: CONFIGBUS.FUZZ_PATH.SPECIMEN.TILE
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+# Records the .ft feature file of specimen checkpoints with RapidWright, in place of the record_device Tcl proc.
+#
+# EXPERIMENTAL: no comparison with record_device on real specimens has been recorded yet, see validate_rapid_record.py.
+#
+# With --record=rapidwright_experimental the Vivado script of a specimen writes a checkpoint (x.rec.dcp) where record_device
+# would have been called, and once Vivado is done the data generator runs this script on the checkpoints, a batch
+# per process, to write x.ft next to each one.  The checkpoint is removed once its .ft is written.
+
+# Typical usage (from the part folder, e.g. artix7/xc7a100ticsg324-1L):
+#    python3 ../../rapid_record.py DSP_L data/0000/0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.rec.dcp
+
+import argparse
+import json
+import os
+
+import jpype
+import jpype.imports
+from jpype.types import *
+if not jpype.isJVMStarted():
+    jpype.startJVM(classpath=[os.path.join(os.path.dirname(os.path.abspath(__file__)), "rapidwright-2021.2.0-standalone-lin64.jar")])
+
+from com.xilinx.rapidwright.design import Design
+
+
+RECORD_EXT = ".rec.dcp"
+
+
+def lut_physical_table(init, p2l, lut_size):
+    """
+    Truth table of a LUT cell over the physical pins of its BEL
+
+    Parameters
+    ----------
+    init : int
+        INIT of the cell, over its logical pins I0, I1, ...
+    p2l : { str : str }
+        Logical pin of each physical pin the cell uses, Ex.: { "A3": "I0", "A6": "I1" }
+    lut_size : int
+        Number of physical pins of the BEL, 6 for a 6LUT and 5 for a 5LUT
+
+    Returns
+    -------
+    int
+        Truth table, bit j is the output for the physical pins A1, A2, ... given by the bits of j
+    """
+    table = 0
+    for j in range(1 << lut_size):
+        i = 0
+        for phys, logical in p2l.items():
+            if phys[0] == "A" and phys[1:].isdigit() and int(phys[1:]) <= lut_size and logical[:1] == "I":
+                i |= ((j >> (int(phys[1:]) - 1)) & 1) << int(logical[1:])
+        table |= ((init >> i) & 1) << j
+    return table
+
+
+def cell_properties(cell):
+    """
+    { name : value } of the properties of the netlist instance of a cell
+    """
+    props = {}
+    for entry in cell.getEDIFCellInst().getPropertiesMap().entrySet():
+        props[str(entry.getKey())] = str(entry.getValue().getValue())
+    return props
+
+
+# SR configuration of the FF BEL a flip-flop cell is placed on, and the INIT of the cell when it has no INIT property
+# (the default of the primitive), by cell type
+FF_CELLS = {"FDRE": ("SRLOW", "0"), "FDCE": ("SRLOW", "0"), "FDSE": ("SRHIGH", "1"), "FDPE": ("SRHIGH", "1")}
+
+
+def bel_config(cell, bel_name, props):
+    """
+    CONFIG properties that record_device would write for the BEL a cell is placed on
+
+    RapidWright has the netlist properties of the cell and not Vivado's BEL configuration, so only the cells whose
+    BEL configuration follows from their properties are written:
+      - LUT cells: EQN, as the hex truth table of the BEL (see lut_feature)
+      - flip-flop cells (FDRE, FDSE, FDCE, FDPE): INIT as INIT0/INIT1, and SR as SRLOW/SRHIGH from the cell type
+
+    The configuration of other cells (hard blocks such as DSP48E1 and RAMB36E1, carry chains, wide muxes, SRLs and
+    distributed RAMs, ...) isn't known: their parameters aren't written in the format of the BEL configuration.
+
+    Returns
+    -------
+    [ (str, str) ]
+        ( property name, value ) pairs, None if the configuration of the cell's BEL isn't known
+    """
+    cell_type = str(cell.getType())
+    if bel_name.endswith("LUT") and cell_type.startswith("LUT") and "INIT" in props:
+        return [("EQN", lut_feature(cell, bel_name, props))]
+    if cell_type in FF_CELLS:
+        sr, default_init = FF_CELLS[cell_type]
+        init = props["INIT"].split("'b")[-1] if "INIT" in props else default_init
+        return [("INIT", "INIT" + init), ("SR", sr)]
+    return None
+
+
+def lut_feature(cell, bel_name, props):
+    """
+    EQN value of a LUT cell as record_device writes it when the INIT is given in hex, Ex.: "O6=0x8888888888888888"
+    """
+    lut_size = 6 if bel_name.endswith("6LUT") else 5
+    init = int(props["INIT"].split("'h")[-1], 16)
+    p2l = {str(e.getKey()): str(e.getValue()) for e in cell.getPinMappingsP2L().entrySet()}
+    table = lut_physical_table(init, p2l, lut_size)
+    return "O%d=0x%0*X" % (lut_size, (1 << lut_size) // 4, table)
+
+
+def pip_feature(pip):
+    """
+    ( tile name, pip name ) of a pip used by a net, bidirectional pips named in the direction they are used
+    """
+    tile_name, pip_name = str(pip).split("/")
+    if "<" in pip_name:
+        pip_name = pip_name.replace("<", "")
+        if pip.isReversed():
+            tile_type, wires = pip_name.split(".", 1)
+            start, end = wires.split("->>")
+            pip_name = tile_type + "." + end + "->>" + start
+    return tile_name, pip_name
+
+
+def record_checkpoint(dcp_name, ft_name, tile_type, tilegrid):
+    """
+    Write the .ft feature file of a checkpoint, for the tiles of a tile type
+
+    Writes the same kinds of lines as record_device: the configuration of the BELs of the cells placed in each site
+    of the tiles (see bel_config), the site pips that are used, and the tile pips used in the tiles.  The
+    configuration of routing BELs and of BELs without a cell isn't written, and the cells whose BEL configuration
+    isn't known are counted and reported.
+
+    Sites are numbered as record_device numbers them, by their position in get_sites -of_objects of the tile, which
+    get_db.tcl records in the SITES of the tile in tilegrid.json.
+
+    Returns
+    -------
+    { str : int }
+        Number of cells of each type whose BEL configuration wasn't written
+    """
+    design = Design.readCheckpoint(dcp_name)
+    device = design.getDevice()
+    skipped = {}
+    # Written under another name first, so an interrupted recording never leaves a partial .ft behind
+    tmp_name = ft_name + "." + str(os.getpid())
+    with open(tmp_name, "w") as f:
+        for T in device.getAllTiles():
+            if str(T.getTileTypeEnum()) != tile_type:
+                continue
+            site_indexes = {name: int(i) for i, name in tilegrid[str(T.getName())]["SITES"].items()}
+            for S in T.getSites():
+                si = design.getSiteInstFromSite(S)
+                if si is None or len(si.getCells()) == 0:
+                    continue
+                if str(S.getName()) not in site_indexes:
+                    raise ValueError("Site " + str(S.getName()) + " isn't in the tilegrid SITES of " + str(T.getName()))
+                site_index = site_indexes[str(S.getName())]
+                prefix = str(T.getName()) + ":" + str(site_index) + ":" + str(si.getSiteTypeEnum()) + ":"
+                for cell in sorted(si.getCells(), key=lambda c: str(c.getBELName())):
+                    bel_name = str(cell.getBELName())
+                    if cell.getEDIFCellInst() is None:
+                        continue
+                    config = bel_config(cell, bel_name, cell_properties(cell))
+                    if config is None:
+                        skipped[str(cell.getType())] = skipped.get(str(cell.getType()), 0) + 1
+                        continue
+                    for name, value in config:
+                        print(prefix + bel_name + ":" + name + ":" + value, file=f)
+                for SP in si.getUsedSitePIPs():
+                    print(prefix + str(SP.getBELName()) + ":" + str(SP.getInputPinName()), file=f)
+        for N in design.getNets():
+            for P in N.getPIPs():
+                if str(P.getTile().getName()).startswith(tile_type):
+                    tile_name, pip_name = pip_feature(P)
+                    print(tile_name + ":Tile_Pip:" + pip_name, file=f)
+    os.replace(tmp_name, ft_name)
+    return skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the .ft feature files of specimen checkpoints")
+    parser.add_argument("tile_type")                    # Tile type the specimens fuzz, e.g. DSP_L
+    parser.add_argument("checkpoints", nargs="+")       # x.rec.dcp checkpoints, x.ft is written for each
+    parser.add_argument("--keep", default=0, type=int)  # 1: Keep the checkpoints, 0: remove each once its .ft is written
+    parser.add_argument("--path_to_tilegrid", default="vivado_db/tilegrid.json")
+    args = parser.parse_args()
+
+    with open(args.path_to_tilegrid) as fj:
+        tilegrid = json.load(fj)
+    for dcp_name in args.checkpoints:
+        ft_name = dcp_name[:-len(RECORD_EXT)] + ".ft"
+        print("RECORDING", ft_name)
+        skipped = record_checkpoint(dcp_name, ft_name, args.tile_type, tilegrid)
+        for cell_type in sorted(skipped):
+            print("\tBEL CONFIGURATION NOT WRITTEN:", skipped[cell_type], cell_type, "cells")
+        if args.keep == 0:
+            os.remove(dcp_name)
+
+
+if __name__ == "__main__":
+    main()
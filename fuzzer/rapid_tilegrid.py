@@ -28,6 +28,7 @@ import os
 from jpype.types import *
 
 import data_generator as dg
+from bit_parser import decode_far, encode_far, far_mask
 #from data_analysis import parse_feature_file
 #jpype.startJVM(classpath=["rapidwright-2021.1.1-standalone-lin64.jar"])
 
@@ -166,10 +167,10 @@ def get_blocks():
                 address = hex(Block.getAddress())
                 # Tile.getRow() -> int
                 tile_row = T.getRow()
-                row_data[tile_row] = hex(0xFFFFFFFF0000 & int(address,16))
+                row_data[tile_row] = hex(int(address,16) & ~far_mask(args.family, "column", "minor"))
                 # Tile.getColumn() -> int
                 col = T.getColumn()
-                col_data[col] = hex(0xFFFF & int(address,16))
+                col_data[col] = hex(int(address,16) & far_mask(args.family, "column"))
                 x = str(T)
                 tilegrid[x]["bits"] = {"CLB_IO_CLK":{}}
                 tilegrid[x]["bits"]["CLB_IO_CLK"]["baseaddr"] = address
@@ -193,10 +194,10 @@ def get_blocks():
     prev = -1
     add_cols = {}
     for x in col_data:
-        cur = int(col_data[x],16)>>7
+        cur = decode_far(int(col_data[x],16), args.family)["column"]
         if cur != prev + 1:
             print("NOT",cur,prev,x,col_data[x])
-            add_cols[x-2] = hex((prev+1)<<7)  
+            add_cols[x-2] = hex(encode_far(args.family, column=prev+1))
         prev = cur
     for x in add_cols:
         col_data[x] = add_cols[x]
@@ -37,6 +37,8 @@ parser.add_argument('--basic',default="1")              # 1: Runs fuzzer on the
 parser.add_argument('--extended',default="0")           # 1: Runs fuzzer on the extended set of tiles 0: only runs on the basic tiles
 parser.add_argument('--pips',default="0")               # 1: Runs fuzzer on pips 0: dont run pip fuzzer
 parser.add_argument('--tile',default="NONE")            # NONE: Runs all tiles, or <TILE_NAME> Will run only the single tile
+parser.add_argument('--compress',default="0")           # 1: Specimen bitstreams are written compressed 0: uncompressed
+parser.add_argument('--artifact_codec',default="none")  # gzip, lzma or bz2: Finished .bit/.ft/.pkl/.tcl files are compressed none: left uncompressed
 
 
 
@@ -76,7 +78,7 @@ if part == "DEFAULT":
 
 run_string = [
             "python3 fuzzer.py ",
-            " --family=" + args.family + " --part=" + part,
+            " --family=" + args.family + " --part=" + part + " --compress=" + args.compress + " --artifact_codec=" + args.artifact_codec,
             " > /dev/null"
         ]
 
@@ -39,18 +39,17 @@
 
 import json
 import argparse
+from bit_parser import parse_bit_str
 #from types import NoneType
 
 
 def lsort(lst):
     tot = 0
-    for e in lst:
-        if e.startswith("!"):
-            for i in range(2):
-                tot -= int(e[1:].split('_')[i])
+    for b in map(parse_bit_str, lst):
+        if b < 0:
+            tot -= (~b >> 16) + (~b & 0xFFFF)
         else:
-            for i in range(2):
-                tot += int(e.split('_')[i])
+            tot += (b >> 16) + (b & 0xFFFF)
     return tot
 
 def processFile(file, prefix):
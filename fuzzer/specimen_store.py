@@ -0,0 +1,284 @@
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+import os
+import shutil
+
+import numpy as np
+
+
+##================================================================================##
+##                      COLUMNAR STORE OF PARSED SPECIMENS                        ##
+##================================================================================##
+
+
+# Bump whenever the layout or meaning of the specimen store changes
+SPECIMEN_STORE_VERSION = 1
+SPECIMEN_STORE_DIR = "specimen_store"
+
+# Columns of a store, each in its own file that is appended to and never rewritten: dtype of the binary columns
+# (name.bin), None for the text columns (name.txt, one entry per line)
+STORE_COLUMNS = {
+    "specimens": None,            # Bitstream file name of each specimen, Ex.: "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.bit"
+    "tiles": None,                # Key of each tile row, Ex.: "CLB.0005.0.DSP_R_X9Y195"
+    "feature_names": None,        # Vocabulary of the store, line i is the name of feature id i
+    "tile_specimen": np.int32,    # Specimen of each tile row
+    "feature_ptr": np.int64,      # Row i's features are feature_ids[feature_ptr[i]:feature_ptr[i+1]]
+    "feature_ids": np.int32,
+    "bit_ptr": np.int64,          # Row i's bits are bit_ids[bit_ptr[i]:bit_ptr[i+1]]
+    "bit_ids": np.int32,          # Bit ids, see bit_parser.bit_id
+}
+# Committed size in bytes of each column, in the order of STORE_COLUMNS, after the version.  Anything past the
+# committed size of a column is left over from an append that didn't finish, and is ignored and overwritten.
+STORE_SIZES = "sizes.npy"
+# What the rows of the store were parsed with, see prepare_specimen_store
+STORE_KEY = "key.npy"
+
+# Feature vocabulary of each store this process has read: ( committed size of feature_names.txt, { name : id } )
+_store_vocab = {}
+
+
+class SpecimenStore():
+    """
+    Parsed specimens of a fuzz run: the features and the bits of every tile of every specimen, in CSR form
+
+    The binary columns are memory-mapped, so opening a store reads nothing but the names.
+
+    Attributes
+    ----------
+    folder : str
+        Data folder of the run the store is in
+    specimens : [ str ]
+        Name of each specimen
+    tiles : [ str ]
+        Key of each tile row, the keys of parse_feature_file
+    feature_names : [ str ]
+        Name of each feature id
+    tile_specimen : np.ndarray (int32)
+        Specimen (index in specimens) of each tile row
+    feature_ptr, bit_ptr : np.ndarray (int64)
+        Start of the features and of the bits of each tile row, plus the end of the last row
+    feature_ids, bit_ids : np.ndarray (int32)
+        Features and bits of all the tile rows
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        store_dir = os.path.join(folder, SPECIMEN_STORE_DIR)
+        sizes = read_store_sizes(store_dir)
+        for (name, dtype), size in zip(STORE_COLUMNS.items(), sizes):
+            file_name = column_file_name(store_dir, name)
+            if dtype is None:
+                value = read_lines(file_name, 0, size)
+            elif size == 0:
+                value = np.zeros(0, dtype=dtype)
+            else:
+                value = np.memmap(file_name, dtype=dtype, mode="r", shape=(size // np.dtype(dtype).itemsize,))
+            setattr(self, name, value)
+        if len(self.feature_ptr) == 0:
+            self.feature_ptr = self.bit_ptr = np.zeros(1, dtype=np.int64)
+
+    def tile_features(self, row):
+        return self.feature_ids[self.feature_ptr[row]:self.feature_ptr[row+1]]
+
+    def tile_bits(self, row):
+        return self.bit_ids[self.bit_ptr[row]:self.bit_ptr[row+1]]
+
+
+def column_file_name(store_dir, name):
+    return os.path.join(store_dir, name + (".txt" if STORE_COLUMNS[name] is None else ".bin"))
+
+
+def read_lines(file_name, start, end):
+    """
+    Entries of a text column between two byte offsets
+    """
+    if end <= start:
+        return []
+    with open(file_name, "rb") as fh:
+        fh.seek(start)
+        return fh.read(end - start).decode().split("\n")[:-1]
+
+
+def read_store_sizes(store_dir):
+    """
+    Committed size of each column of a store, all zeros if there is no store
+    """
+    file_name = os.path.join(store_dir, STORE_SIZES)
+    if not os.path.exists(file_name):
+        return [0] * len(STORE_COLUMNS)
+    sizes = np.load(file_name)
+    if sizes[0] != SPECIMEN_STORE_VERSION:
+        raise ValueError(store_dir + " is not a specimen store of version " + str(SPECIMEN_STORE_VERSION) + ", see prepare_specimen_store")
+    return sizes[1:].tolist()
+
+
+def prepare_specimen_store(folder, key, rebuild=False):
+    """
+    Remove the store of a data folder if its rows weren't parsed with key, so that the specimens are parsed again
+
+    Rows parsed by another version of the store, or with another key (another bit decoder, tilegrid or ownership
+    map), would otherwise be used as they are.  The key is recorded when the store is started.
+
+    Parameters
+    ----------
+    folder : str
+        Data folder of the run
+    key : [ int ]
+        What the rows are parsed with, see data_analysis.specimen_store_key
+    rebuild : bool
+        Remove the store whatever its key (--full)
+
+    Returns
+    -------
+    bool
+        True if a store was removed
+    """
+    store_dir = os.path.join(folder, SPECIMEN_STORE_DIR)
+    key = np.array(key, dtype=np.int64)
+    removed = False
+    if os.path.isdir(store_dir):
+        reason = "--full" if rebuild else None
+        if reason is None:
+            try:
+                sizes_name = os.path.join(store_dir, STORE_SIZES)
+                if os.path.exists(sizes_name) and np.load(sizes_name)[0] != SPECIMEN_STORE_VERSION:
+                    reason = "store version changed"
+                elif not np.array_equal(np.load(os.path.join(store_dir, STORE_KEY)), key):
+                    reason = "parsed with another decoder or tilegrid"
+            except (OSError, ValueError):
+                reason = "no key"
+        if reason is not None:
+            print("REBUILDING SPECIMEN STORE (" + reason + "):", store_dir)
+            shutil.rmtree(store_dir)
+            _store_vocab.pop(store_dir, None)
+            removed = True
+    if not os.path.exists(os.path.join(store_dir, STORE_KEY)):
+        os.makedirs(store_dir, exist_ok=True)
+        tmp_name = os.path.join(store_dir, STORE_KEY + "." + str(os.getpid()))
+        with open(tmp_name, "wb") as fh:
+            np.save(fh, key)
+        os.replace(tmp_name, os.path.join(store_dir, STORE_KEY))
+    return removed
+
+
+def open_specimen_store(folder):
+    """
+    Open the specimen store of a data folder, an empty store if nothing was appended to it yet
+    """
+    return SpecimenStore(folder)
+
+
+def stored_specimens(folder):
+    """
+    Names of the specimens in the store of a data folder
+    """
+    return set(SpecimenStore(folder).specimens)
+
+
+def load_store_vocab(store_dir, committed):
+    """
+    Map from the name of each feature of a store to its id, reading only the names added since the last call
+    """
+    size, vocab = _store_vocab.get(store_dir, (0, {}))
+    if committed < size:
+        # The store was removed and started again
+        size, vocab = 0, {}
+    if committed > size:
+        for name in read_lines(column_file_name(store_dir, "feature_names"), size, committed):
+            vocab[name] = len(vocab)
+    _store_vocab[store_dir] = (committed, vocab)
+    return vocab
+
+
+def append_specimen(folder, specimen, tile_feature_dict, tile_bit_dict):
+    """
+    Append a parsed specimen to the store of a data folder
+
+    Every column is appended to past its committed size and the new sizes are committed last, so the data already
+    in the store is never rewritten and an append that is interrupted leaves the store as it was.  Only one process
+    may append to a store at a time.
+
+    Parameters
+    ----------
+    folder : str
+        Data folder of the run
+    specimen : str
+        Bitstream file name of the specimen, Ex.: "0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.bit"
+    tile_feature_dict : { str : [ str ] }
+        Features of each tile, as returned by parse_feature_file
+    tile_bit_dict : { str : [ int ] }
+        Bits of each tile, with the same keys.  Tiles without features aren't stored.
+    """
+    store_dir = os.path.join(folder, SPECIMEN_STORE_DIR)
+    os.makedirs(store_dir, exist_ok=True)
+    sizes = dict(zip(STORE_COLUMNS, read_store_sizes(store_dir)))
+    specimen_row = len(read_lines(column_file_name(store_dir, "specimens"), 0, sizes["specimens"]))
+    vocab = load_store_vocab(store_dir, sizes["feature_names"])
+
+    new_names = []
+    feature_ids, bit_ids, feature_ptr, bit_ptr = [], [], [], []
+    feature_end = sizes["feature_ids"] // 4
+    bit_end = sizes["bit_ids"] // 4
+    for T, features in tile_feature_dict.items():
+        for F in features:
+            if F not in vocab:
+                vocab[F] = len(vocab)
+                new_names.append(F)
+        feature_ids.extend(vocab[F] for F in features)
+        bits = tile_bit_dict.get(T, ())
+        bit_ids.extend(bits)
+        feature_end += len(features)
+        bit_end += len(bits)
+        feature_ptr.append(feature_end)
+        bit_ptr.append(bit_end)
+
+    if sizes["feature_ptr"] == 0:
+        feature_ptr.insert(0, 0)
+        bit_ptr.insert(0, 0)
+    data = {
+        "specimens": specimen + "\n",
+        "tiles": "".join(T + "\n" for T in tile_feature_dict),
+        "feature_names": "".join(F + "\n" for F in new_names),
+        "tile_specimen": [specimen_row] * len(tile_feature_dict),
+        "feature_ptr": feature_ptr,
+        "feature_ids": feature_ids,
+        "bit_ptr": bit_ptr,
+        "bit_ids": bit_ids,
+    }
+    for name, dtype in STORE_COLUMNS.items():
+        data[name] = data[name].encode() if dtype is None else np.array(data[name], dtype=dtype).tobytes()
+    try:
+        for name in STORE_COLUMNS:
+            with open(os.open(column_file_name(store_dir, name), os.O_RDWR | os.O_CREAT, 0o644), "r+b") as fs:
+                fs.truncate(sizes[name])
+                fs.seek(sizes[name])
+                fs.write(data[name])
+                sizes[name] += len(data[name])
+        tmp_name = os.path.join(store_dir, STORE_SIZES + "." + str(os.getpid()))
+        with open(tmp_name, "wb") as fh:
+            np.save(fh, np.array([SPECIMEN_STORE_VERSION] + list(sizes.values()), dtype=np.int64))
+        os.replace(tmp_name, os.path.join(store_dir, STORE_SIZES))
+    except BaseException:
+        # Forget the features that were never committed
+        for F in new_names:
+            del vocab[F]
+        raise
+    _store_vocab[store_dir] = (sizes["feature_names"], vocab)
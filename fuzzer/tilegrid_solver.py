@@ -26,8 +26,8 @@ import os
 import argparse
 import sys
 import random
-from bit_parser import print_frame
-from bit_parser import parse_bitstream
+from bit_parser import print_frame, decode_far, encode_far, column_base, far_mask
+from bit_diff import load_frame_set, changed_frames
 import numpy as np
 
 ##===============================================##
@@ -39,7 +39,7 @@ tilegrid = json.load(fj)
 fj.close()
 
 tilegrid_feature_dict = {}
-tilegrid_bit_dict = {}
+tilegrid_frame_set = None
 tilegrid_frame_dict = {}
 fuzz_path = ""
 tile_type = ""
@@ -49,22 +49,20 @@ tile_type = ""
 
 
 def parse_tilegrid_files(fileList):
+    global tilegrid_frame_set
     has_data = 0
     tilegrid_frame_dict = {}
+    bit_files = []
+    specimens = []
     for file in sorted(fileList):
         if ".tile" in file:
             print(file)
             if ".bit" in file and ".dcp" not in file:
                 has_data = 1
                 specimen,tile_type,site_index,site_type,bel,primitive,tile,ext = file.split(".")
-                tilegrid_bit_dict[specimen] = {}
                 tilegrid_feature_dict[specimen] = {}
-
-                f = open("data/" + fuzz_path + "/" + file,"rb")
-                tile_bits, tilegrid_frame_dict = parse_bitstream(f, args.family,None,tile_type,specimen)
-                for x in tile_bits:
-                    tilegrid_bit_dict[specimen][x] = tile_bits[x]
-                f.close()
+                bit_files.append("data/" + fuzz_path + "/" + file)
+                specimens.append(specimen)
                 ft_file = "data/" + fuzz_path + "/" + file
                 f = open(ft_file.replace(".bit",".ft"))
                 content = f.readlines()
@@ -78,19 +76,23 @@ def parse_tilegrid_files(fileList):
                     else:
                         tilegrid_feature_dict[specimen][vals[0]] = np.insert(tilegrid_feature_dict[specimen][vals[0]],0, vals[1])
 
+    # The specimens' frames are diffed against each other in get_column_address
+    tilegrid_frame_set = load_frame_set(bit_files, args.family, names=specimens)
+    # Highest minor address written in each column
+    bases, inverse = np.unique(column_base(tilegrid_frame_set.addrs, args.family), return_inverse=True)
+    max_minor = np.zeros(len(bases), dtype=np.int64)
+    np.maximum.at(max_minor, inverse, decode_far(tilegrid_frame_set.addrs, args.family)["minor"])
+    for base_addr, minor in zip(bases.tolist(), max_minor.tolist()):
+        tilegrid_frame_dict[base_addr] = max(tilegrid_frame_dict.get(base_addr, 0), minor)
+
     return tilegrid_feature_dict, has_data,tilegrid_frame_dict
 
 
 
 def get_column_address(tilegrid_feature_dict,tilegrid_frame_dict):
     tilegrid_diff = {}
-    if args.family in ["artix7","kintexu", "spartan7","kintex7","virtex7","virtexu","zynqu","zynq"]:
-        col_mask = 0xFF80
-        block_shift = 23
-    else:
-        col_mask = 0x1FF00
-        block_shift = 24
     key_list = list(sorted(tilegrid_feature_dict.keys()))
+    specimen_idx = {S: i for i, S in enumerate(tilegrid_frame_set.names)}
     for i in range(len(key_list)):
         print("NEW KEY",i,key_list[i])
         S1 = key_list[i]
@@ -113,29 +115,26 @@ def get_column_address(tilegrid_feature_dict,tilegrid_frame_dict):
             if len(diff_columns) == 1:
                 print("DIFF_TILES:",diff_tiles,diff_columns)
                 tile_col_name = diff_tiles[0].rsplit("Y",1)[0]
-                for B in tilegrid_bit_dict[S1].keys():
-                    diff_bit = set(tilegrid_bit_dict[S1][B]).symmetric_difference(tilegrid_bit_dict[S2][B])
-                    if diff_bit:
-                        print("DIFF_BITS:",diff_bit)
-                        col_addr = B & col_mask
-                        if B < (1<<block_shift):
-                            tilegrid_diff[tile_col_name] = {}
-                            tilegrid_diff[tile_col_name]["COL_ADDR"] = col_addr
-                            tilegrid_diff[tile_col_name]["FRAME_COUNT"] = tilegrid_frame_dict[B] + 1
+                # Columns (base addresses) with frames that differ between the two specimens
+                diff_addrs = changed_frames(tilegrid_frame_set, specimen_idx[S1], specimen_idx[S2])
+                diff_bases = column_base(diff_addrs, args.family)
+                for B in np.unique(diff_bases).tolist():
+                    print("DIFF_FRAMES:",[hex(x) for x in diff_addrs[diff_bases == B].tolist()])
+                    fields = decode_far(B, args.family)
+                    # Only CLB/IO/CLK (block type 0) columns of the first SLR
+                    if fields["block"] == 0 and fields["slr"] == 0:
+                        tilegrid_diff[tile_col_name] = {}
+                        tilegrid_diff[tile_col_name]["COL_ADDR"] = encode_far(args.family, column=fields["column"])
+                        tilegrid_diff[tile_col_name]["FRAME_COUNT"] = tilegrid_frame_dict[B] + 1
     print("DIFF TILE COLUMNS",tilegrid_diff)
     
     return tilegrid_diff
 
 
 def estimate_column_address(col_name):
-    if args.family in ["artix7","kintexu", "spartan7","kintex7","virtex7","virtexu","zynqu","zynq"]:
-        col_shift = 7
-        col_addr = int(col_name.rsplit("X")[-1]) << col_shift
-    else:
-        col_shift = 8
-        # This estimate is not correct for ultrascale/+, I think it is X_coord * 3 + index.(L,C,R)
-        col_addr = int(col_name.rsplit("X")[-1]) << col_shift
-    print(col_name,int(col_name.rsplit("X")[-1]),col_addr,col_shift)
+    # This estimate is not correct for ultrascale/+, I think it is X_coord * 3 + index.(L,C,R)
+    col_addr = encode_far(args.family, column=int(col_name.rsplit("X")[-1]))
+    print(col_name,int(col_name.rsplit("X")[-1]),col_addr)
     return col_addr
 
 def solve_tilegrid():
@@ -216,10 +215,7 @@ def solve_tilegrid():
                 offset = 50
             elif offset >= crc[0]:
                 offset += len(crc)
-            if args.family in ["kintexuplus", "zynquplus","virtexuplus"]:
-                base_addr = (top<<23) + (clock_col<<18) + (col_addr)
-            else:
-                base_addr = (top<<22) + (clock_col<<17) + (col_addr)
+            base_addr = encode_far(args.family, top=top, row=clock_col) | col_addr
             
             tilegrid[T]["bits"] = {}
             tilegrid[T]["bits"]["CLB_IO_CLK"] = {}
@@ -234,12 +230,8 @@ def solve_tilegrid():
             if tilegrid[T]["TYPE"] in ["BRAM_L","BRAM_R", "BRAM"]:
                 tilegrid[T]["bits"]["BLOCK_RAM"] = {}
                 col_addr = tile_dict["BRAM_COLUMNS"].index(tilegrid[T]["COL"])
-                if args.family in ["kintexuplus", "zynquplus","virtexuplus"]:
-                    base_addr = (1<<24) + (top<<23) + (clock_col<<18) + (col_addr << 8)
-                    frame_max = 256
-                else:
-                    base_addr = (1<<23) + (top<<22) + (clock_col<<17) + (col_addr << 7)
-                    frame_max = 128
+                base_addr = encode_far(args.family, block=1, top=top, row=clock_col, column=col_addr)
+                frame_max = far_mask(args.family, "minor") + 1
                 
                 tilegrid[T]["bits"]["BLOCK_RAM"]["baseaddr"] = hex(base_addr)
                 tilegrid[T]["bits"]["BLOCK_RAM"]["frames"] = frame_max
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+# Checks lut_equation.lut_init_from_equation against RapidWright's LUTTools.getLUTInitFromEquation on every distinct
+# LUT equation of the .ft files of the given data folders, and on lut_equation.LUT_EQUATION_CASES (operator precedence,
+# the operator aliases and 5 input LUTs).  Each equation that gets a different INIT is printed.
+
+# Typical usage:
+#    python3 validate_lut_equations.py artix7/xc7a100ticsg324-1L/data
+
+import argparse
+import os
+import sys
+
+import jpype
+import jpype.imports
+from jpype.types import *
+jpype.startJVM(classpath=["rapidwright-2021.2.0-standalone-lin64.jar"])
+
+from com.xilinx.rapidwright.design.tools import LUTTools
+
+from artifacts import list_artifacts, open_artifact
+from lut_equation import LUT_EQUATION_CASES, check_lut_equations, vivado_to_lut_equation
+
+
+def collect_equations(folder):
+    """
+    Distinct LUT equations ("O6=..." or "O5=...") of the EQN features of every .ft file under folder
+    """
+    eqns = set()
+    for root, dirs, files in os.walk(folder):
+        for file in list_artifacts(root):
+            if not file.endswith(".ft"):
+                continue
+            with open_artifact(os.path.join(root, file), "r") as f:
+                for line in f:
+                    if ":EQN:" in line:
+                        eqn = line.strip().rsplit(":", 1)[-1]
+                        if ("O6=" in eqn or "O5=" in eqn) and "0x" not in eqn:
+                            eqns.add(eqn)
+    return eqns
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare LUT equation INIT values with RapidWright's LUTTools")
+    parser.add_argument("folders", nargs="+")     # Data folders to read the .ft files of, e.g. artix7/xc7a100ticsg324-1L/data
+    args = parser.parse_args()
+
+    eqns = set()
+    for folder in args.folders:
+        eqns |= collect_equations(folder)
+    cases = [(vivado_to_lut_equation(eqn), 6 if "O6=" in eqn else 5) for eqn in sorted(eqns)] + LUT_EQUATION_CASES
+    mismatches = check_lut_equations(LUTTools(), cases)
+    for x in mismatches:
+        print(x)
+    print(len(eqns), "equations and", len(LUT_EQUATION_CASES), "test cases,", len(mismatches), "mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+
+# Copyright 2020-2022 BitRec Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# SPDX-License-Identifier: Apache-2.0
+
+# This material is based upon work supported  by the Office of Naval Research
+# under Contract No. N68335-20-C-0569. Any opinions, findings and conclusions
+# or recommendations expressed in this material are those of the author(s) and
+# do not necessarily reflect the views of the Office of Naval Research.
+
+# Checks rapid_record.py against the record_device Tcl proc on the same checkpoints.  For each checkpoint, Vivado
+# writes x.record_device.ft with record_device and rapid_record.py writes x.rapid_record.ft, and the lines of the two
+# are compared by kind of feature: tile pips, the used site pips of each site type, and each CONFIG property of each
+# BEL.  LUT equations are compared by the INIT they give, as the analysis does.  A kind with lines in only one of the
+# files is a MISMATCH, the lines that differ are printed with -v.
+
+# Typical usage (from the part folder, e.g. artix7/xc7a100ticsg324-1L, on checkpoints kept with --keep=1):
+#    python3 ../../validate_rapid_record.py DSP_L data/0000/0.DSP_L.0.DSP48E1.DSP48E1.DSP48E1.rec.dcp
+
+import argparse
+import json
+import os
+import sys
+
+from rapid_record import record_checkpoint
+from data_analysis import eqn_to_init
+
+
+def record_with_vivado(dcp_name, ft_name, tile_type):
+    """
+    Write the .ft file of a checkpoint with the record_device Tcl proc
+    """
+    tcl_name = ft_name + ".tcl"
+    with open(tcl_name, "w") as ft:
+        print("open_checkpoint " + dcp_name + " -ignore_timing", file=ft)
+        print("source " + os.path.join(os.path.dirname(os.path.abspath(__file__)), "record_device.tcl"), file=ft)
+        print("record_device " + ft_name + " " + tile_type, file=ft)
+    os.system("vivado -mode batch -source " + tcl_name + " -stack 2000")
+    os.remove(tcl_name)
+
+
+def feature_kind(line):
+    """
+    ( kind, feature ) of a .ft line, the kind being what the line configures without its tile and value
+
+    Ex.: "DSP_L_X6Y0:0:DSP48E1:DSP48E1:AREG:1" -> ("DSP48E1:DSP48E1:AREG", line)
+    """
+    data = line.split(":", 5)
+    if len(data) > 1 and data[1] == "Tile_Pip":
+        return "Tile_Pip", line
+    if len(data) < 5:
+        return "other", line
+    if len(data) == 5:
+        return data[2] + ":site pips", line
+    if len(data) == 6 and data[4] == "EQN":
+        # Compared by INIT, the equation of record_device and the truth table of rapid_record.py are spelled differently
+        return data[2] + ":" + data[3] + ":EQN", ":".join(data[:5]) + ":" + eqn_to_init(data[5]).split("'h")[-1].lstrip("0")
+    return ":".join(data[2:5]), line
+
+
+def read_features(ft_name):
+    """
+    { kind : set(feature) } of the lines of a .ft file
+    """
+    kinds = {}
+    with open(ft_name) as f:
+        for line in f:
+            line = line.strip()
+            if line != "":
+                kind, feature = feature_kind(line)
+                kinds.setdefault(kind, set()).add(feature)
+    return kinds
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the .ft files rapid_record.py writes with those of record_device")
+    parser.add_argument("tile_type")                    # Tile type the checkpoints fuzz, e.g. DSP_L
+    parser.add_argument("checkpoints", nargs="+")       # Checkpoints to record both ways
+    parser.add_argument("-v", action="store_true")      # Print the lines that differ
+    parser.add_argument("--path_to_tilegrid", default="vivado_db/tilegrid.json")
+    args = parser.parse_args()
+
+    with open(args.path_to_tilegrid) as fj:
+        tilegrid = json.load(fj)
+
+    expected, got = {}, {}
+    for dcp_name in args.checkpoints:
+        base = dcp_name[:-len(".dcp")]
+        record_with_vivado(dcp_name, base + ".record_device.ft", args.tile_type)
+        for cell_type, count in sorted(record_checkpoint(dcp_name, base + ".rapid_record.ft", args.tile_type, tilegrid).items()):
+            print("NOT WRITTEN", count, cell_type, "cells")
+        for kinds, ft_name in [(expected, base + ".record_device.ft"), (got, base + ".rapid_record.ft")]:
+            for kind, features in read_features(ft_name).items():
+                kinds.setdefault(kind, set()).update(features)
+
+    mismatches = 0
+    for kind in sorted(set(expected) | set(got)):
+        missing = expected.get(kind, set()) - got.get(kind, set())
+        extra = got.get(kind, set()) - expected.get(kind, set())
+        if missing or extra:
+            mismatches += 1
+            print("MISMATCH", kind, len(missing), "missing,", len(extra), "extra")
+            if args.v:
+                for x in sorted(missing):
+                    print("\tMISSING", x)
+                for x in sorted(extra):
+                    print("\tEXTRA", x)
+        else:
+            print("MATCH", kind, len(expected[kind]))
+    print(len(set(expected) | set(got)), "kinds of features,", mismatches, "mismatches")
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()